@@ -0,0 +1,84 @@
+from benchmarks.fakeAirtable import FakeAirtableServer, FakeBase
+from benchmarks.generateData import generate, write
+from benchmarks.runBenchmarks import ROOT, stage_env
+import subprocess
+import tempfile
+import argparse
+import shutil
+import time
+import json
+import sys
+import os
+
+
+COUNTERS = ["requests", "GET list", "POST create", "PATCH update", "PATCH upsert", "throttled", "records read",
+            "records written"]
+
+
+def run_command(server, workdir, client_rate, *arguments):
+
+    """
+    Args:
+        server (FakeAirtableServer): Stand-in the command talks to.
+        workdir (str): Working directory of the command.
+        client_rate (float): airtable_rate_limit of the command's client.
+        *arguments: bulkTransfer.py arguments, e.g. ('export', '--output', 'base.jsonl.gz').
+
+    Returns:
+        dict: Wall time and the requests the stand-in served for the command.
+    """
+
+    before = server.stats()
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "bulkTransfer.py"), *arguments], cwd=workdir, check=True,
+                   env=stage_env(server, workdir, client_rate), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.perf_counter() - started
+    after = server.stats()
+    result = {"wall_seconds": round(wall, 2)}
+    result.update({key: after.get(key, 0) - before.get(key, 0) for key in COUNTERS})
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Export a base with bulkTransfer.py, import it into an empty base and "
+                                                 "run the offline stages on the file, against local Airtable stand-ins.")
+    parser.add_argument("--size", type=int, default=1000, help="Applicants to generate")
+    parser.add_argument("--rate", type=float, default=5.0, help="Server rate limit in requests per second (0 disables it)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean Airtable latency in seconds")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory with the files and logs")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hireeasy-bulk-")
+    shutil.copy(os.path.join(ROOT, "config.yaml"), workdir)
+    dataset = generate(args.size, config_path=os.path.join(ROOT, "config.yaml"))
+    records = sum(len(table["records"]) for table in dataset["tables"])
+    client_rate = args.rate or 1000000
+
+    source = FakeAirtableServer(FakeBase.load(write(dataset, os.path.join(workdir, "base.json.gz"))),
+                                rate=args.rate, latency=args.latency).start()
+    try:
+        exported = run_command(source, workdir, client_rate, "export", "--output", "export.jsonl.gz")
+    finally:
+        source.stop()
+    exported["file_bytes"] = os.path.getsize(os.path.join(workdir, "export.jsonl.gz"))
+
+    target = FakeAirtableServer(FakeBase("appImportTarget"), rate=args.rate, latency=args.latency).start()
+    try:
+        imported = run_command(target, workdir, client_rate, "import", "--input", "export.jsonl.gz")
+        tables = {table.name: len(table.records) for table in target.base.tables.values()}
+    finally:
+        target.stop()
+
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "bulkTransfer.py"), "offline", "--input", "export.jsonl.gz",
+                    "--output", "offline.jsonl.gz"], cwd=workdir, check=True, env=stage_env(target, workdir, client_rate),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    offline = {"wall_seconds": round(time.perf_counter() - started, 2)}
+
+    print(json.dumps({"applicants": args.size, "records": records, "export": exported, "import": imported,
+                      "imported_tables": tables, "offline": offline}))
+    if args.keep:
+        print(f"Working directory: {workdir}", file=sys.stderr)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
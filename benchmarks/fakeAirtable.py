@@ -0,0 +1,1074 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl, unquote
+from datetime import datetime, timedelta, timezone
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from email.parser import BytesParser
+from email import policy
+import urllib.request
+import itertools
+import operator
+import threading
+import argparse
+import secrets
+import hashlib
+import base64
+import random
+import hmac
+import time
+import gzip
+import json
+import re
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def new_id(prefix):
+    return prefix + secrets.token_hex(7)
+
+
+class FormulaError(ValueError):
+    pass
+
+
+# Formulas: the subset of the Airtable formula language the helpers send
+
+TOKENS = re.compile(r"\s*(?:(\{[^}]*\})|('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|(-?\d+(?:\.\d+)?)|([A-Z_]+)|(!=|>=|<=|[=<>(),&]))")
+
+
+def _tokenize(formula):
+    tokens, position = [], 0
+    formula = formula.strip()
+    while position < len(formula):
+        match = TOKENS.match(formula, position)
+        if not match:
+            raise FormulaError(f"Unexpected input at {position}: {formula[position:position + 20]!r}")
+        field, string, number, name, symbol = match.groups()
+        if field is not None:
+            tokens.append(("field", field[1:-1]))
+        elif string is not None:
+            tokens.append(("value", string[1:-1].replace("\\'", "'").replace('\\"', '"')))
+        elif number is not None:
+            tokens.append(("value", float(number)))
+        elif name is not None:
+            tokens.append(("name", name))
+        else:
+            tokens.append(("symbol", symbol))
+        position = match.end()
+    return tokens
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    if isinstance(value, bool):
+        return "1" if value else ""
+    return value
+
+
+def _compare(op, left, right):
+    left, right = _text(left), _text(right)
+    if isinstance(left, (int, float)) != isinstance(right, (int, float)):
+        left, right = str(left), str(right)
+    return {"=": left == right, "!=": left != right, ">": left > right,
+            "<": left < right, ">=": left >= right, "<=": left <= right}[op]
+
+
+class Formula:
+
+    """
+    A compiled filterByFormula. Supports field references, string and number literals,
+    comparisons, AND/OR/NOT, RECORD_ID(), LAST_MODIFIED_TIME(...), DATETIME_PARSE, IS_AFTER
+    and IS_BEFORE. Anything else raises FormulaError, which the server turns into a 422.
+
+    When the whole formula is RECORD_ID()='...' or an OR of those, `ids` holds the IDs so the
+    table can look them up directly instead of scanning every record.
+    """
+
+    def __init__(self, formula):
+        self.tokens = _tokenize(formula)
+        self.position = 0
+        self.evaluate, self.ids = self._expression()
+        if self.position != len(self.tokens):
+            raise FormulaError(f"Unexpected token {self.tokens[self.position][1]!r}")
+
+    def _next(self):
+        if self.position >= len(self.tokens):
+            raise FormulaError("Unexpected end of formula")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _expect(self, symbol):
+        kind, value = self._next()
+        if (kind, value) != ("symbol", symbol):
+            raise FormulaError(f"Expected {symbol!r}, got {value!r}")
+
+    def _expression(self):
+        left, ids = self._term()
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == "symbol" \
+                and self.tokens[self.position][1] in ("=", "!=", ">", "<", ">=", "<="):
+            op = self._next()[1]
+            right, _ = self._term()
+            literal = self.tokens[self.position - 1]
+            is_record_id = ids == "RECORD_ID" and op == "=" and literal[0] == "value"
+            return (lambda record: _compare(op, left(record), right(record))), ([literal[1]] if is_record_id else None)
+        return left, None if ids == "RECORD_ID" else ids
+
+    def _arguments(self):
+        self._expect("(")
+        arguments = []
+        if self.tokens[self.position] == ("symbol", ")"):
+            self.position += 1
+            return arguments
+        while True:
+            arguments.append(self._expression())
+            kind, value = self._next()
+            if value == ")":
+                return arguments
+            if value != ",":
+                raise FormulaError(f"Expected ',' or ')', got {value!r}")
+
+    def _fieldArguments(self):
+        self._expect("(")
+        fields = []
+        while True:
+            kind, value = self._next()
+            if kind == "field":
+                fields.append(value)
+            elif value == ")":
+                return fields
+            elif value != ",":
+                raise FormulaError(f"Expected a field reference, got {value!r}")
+
+    def _term(self):
+        kind, value = self._next()
+        if kind == "field":
+            return (lambda record: record["fields"].get(value)), None
+        if kind == "value":
+            return (lambda record: value), None
+        if kind != "name":
+            raise FormulaError(f"Unexpected token {value!r}")
+
+        if value == "RECORD_ID":
+            self._arguments()
+            return (lambda record: record["id"]), "RECORD_ID"
+
+        if value == "LAST_MODIFIED_TIME":
+            fields = self._fieldArguments()
+            return (lambda record: max((record["modified"].get(f, record["created"]) for f in fields),
+                                       default=record["updated"])), None
+
+        arguments = self._arguments()
+        functions = [argument for argument, _ in arguments]
+        if value == "AND":
+            return (lambda record: all(f(record) for f in functions)), None
+        if value == "OR":
+            id_lists = [ids for _, ids in arguments]
+            ids = list(dict.fromkeys(itertools.chain(*id_lists))) if id_lists and None not in id_lists else None
+            return (lambda record: any(f(record) for f in functions)), ids
+        if value == "NOT" and len(functions) == 1:
+            return (lambda record: not functions[0](record)), None
+        if value == "DATETIME_PARSE" and functions:
+            return (lambda record: _parse_time(functions[0](record))), None
+        if value in ("IS_AFTER", "IS_BEFORE") and len(functions) == 2:
+            compare = operator.gt if value == "IS_AFTER" else operator.lt
+            return (lambda record: compare(functions[0](record), functions[1](record))), None
+        raise FormulaError(f"Unsupported function {value}()")
+
+
+@lru_cache(maxsize=256)
+def compile_formula(formula):
+    return Formula(formula)
+
+
+class FakeTable:
+
+    def __init__(self, table_id, name, description="", fields=()):
+        self.id = table_id
+        self.name = name
+        self.description = description
+        self.fields = []
+        self.records = OrderedDict()
+        self.indexes = {}
+        for field in fields:
+            self.addField(field)
+
+    def addField(self, field):
+        field = dict(field)
+        field.setdefault("id", new_id("fld"))
+        self.fields.append(field)
+        return field
+
+    @staticmethod
+    def _key(record, fields):
+        return tuple(_text(record["fields"].get(field)) for field in fields)
+
+    def index(self, fields):
+
+        """
+        Args:
+            fields (list): Merge fields of a performUpsert.
+
+        Returns:
+            dict: Merge field values -> IDs of the records holding them, kept up to date on writes.
+        """
+
+        fields = tuple(fields)
+        if fields not in self.indexes:
+            index = {}
+            for record in self.records.values():
+                index.setdefault(self._key(record, fields), []).append(record["id"])
+            self.indexes[fields] = index
+        return self.indexes[fields]
+
+    def unindex(self, record):
+        for fields, index in self.indexes.items():
+            ids = index.get(self._key(record, fields), [])
+            if record["id"] in ids:
+                ids.remove(record["id"])
+
+    def reindex(self, record):
+        for fields, index in self.indexes.items():
+            index.setdefault(self._key(record, fields), []).append(record["id"])
+
+    def fieldNames(self):
+        return {field["name"] for field in self.fields}
+
+    def meta(self):
+        primary = self.fields[0]["id"] if self.fields else None
+        return {"id": self.id, "name": self.name, "description": self.description,
+                "primaryFieldId": primary, "fields": self.fields}
+
+
+class FakeBase:
+
+    """
+    In-memory Airtable base. Records keep a created time and a per-field modified time, so
+    LAST_MODIFIED_TIME() formulas behave like they do in Airtable. Link fields
+    (multipleRecordLinks) keep their inverse field on the linked table in sync.
+
+    Every record change is passed to the `observers` (the server's webhooks) with the source
+    of the write: 'publicApi' for API requests, or whatever changeSource() sets, e.g. a form.
+    """
+
+    def __init__(self, base_id="appFakeBase"):
+        self.id = base_id
+        self.tables = OrderedDict()
+        self.lock = threading.RLock()
+        self.cursors = OrderedDict()
+        self.observers = []
+        self.sources = threading.local()
+
+    @contextmanager
+    def changeSource(self, source):
+
+        """
+        Args:
+            source (str): actionMetadata.source of the writes in the block, e.g. 'formSubmission'.
+
+        Yields:
+            None
+        """
+
+        previous = getattr(self.sources, "value", None)
+        self.sources.value = source
+        try:
+            yield
+        finally:
+            self.sources.value = previous
+
+    def _notify(self, table, record, kind, names):
+        source = getattr(self.sources, "value", None) or "publicApi"
+        for observer in self.observers:
+            observer(table, record, kind, names, source)
+
+    def table(self, name_or_id):
+        name_or_id = unquote(name_or_id)
+        for table in self.tables.values():
+            if name_or_id in (table.name, table.id):
+                return table
+        raise KeyError(name_or_id)
+
+    def createTable(self, name, description="", fields=(), table_id=None):
+        with self.lock:
+            if any(table.name == name for table in self.tables.values()):
+                raise ValueError(f"Table {name} already exists")
+            table = FakeTable(table_id or new_id("tbl"), name, description, fields)
+            self.tables[table.id] = table
+            for field in table.fields:
+                linked = self._linkedTable(field)
+                if linked and table.name not in linked.fieldNames():
+                    linked.addField({"name": table.name, "type": "multipleRecordLinks",
+                                     "options": {"linkedTableId": table.id}})
+            return table
+
+    def _linkedTable(self, field):
+        if field.get("type") != "multipleRecordLinks":
+            return None
+        return self.tables.get((field.get("options") or {}).get("linkedTableId"))
+
+    def _inverse(self, table, field):
+        linked = self._linkedTable(field)
+        if linked is None:
+            return None, None
+        for candidate in linked.fields:
+            if (candidate.get("options") or {}).get("linkedTableId") == table.id:
+                return linked, candidate["name"]
+        return None, None
+
+    def _write(self, table, record, fields, moment):
+        unknown = set(fields) - table.fieldNames()
+        if unknown:
+            raise ValueError(f"Unknown field names: {', '.join(sorted(unknown))}")
+
+        table.unindex(record)
+        try:
+            self._writeFields(table, record, fields, moment)
+        finally:
+            table.reindex(record)
+
+    def _writeFields(self, table, record, fields, moment):
+        links = {field["name"]: field for field in table.fields if field.get("type") == "multipleRecordLinks"}
+        for name, value in fields.items():
+            if name in links and not isinstance(value, (list, type(None))):
+                raise ValueError(f"Field {name} expects a list of record IDs")
+            if name in links:
+                linked, inverse = self._inverse(table, links[name])
+                before, after = set(record["fields"].get(name) or []), set(value or [])
+                if linked is not None:
+                    for linked_id in after - before:
+                        target = linked.records.get(linked_id)
+                        if target is None:
+                            raise ValueError(f"Record {linked_id} not found in {linked.name}")
+                        target["fields"].setdefault(inverse, []).append(record["id"])
+                        target["modified"][inverse] = target["updated"] = moment
+                        self._notify(linked, target, "changed", [inverse])
+                    for linked_id in before - after:
+                        target = linked.records.get(linked_id)
+                        if target is not None and record["id"] in target["fields"].get(inverse, []):
+                            target["fields"][inverse].remove(record["id"])
+                            target["modified"][inverse] = target["updated"] = moment
+                            self._notify(linked, target, "changed", [inverse])
+
+            if value in (None, "", []):
+                record["fields"].pop(name, None)
+            else:
+                record["fields"][name] = value
+            record["modified"][name] = moment
+        record["updated"] = moment
+
+    def insert(self, table_name, fields, record_id=None, created=None):
+        with self.lock:
+            table = self.table(table_name)
+            moment = created or _now()
+            record = {"id": record_id or new_id("rec"), "created": moment, "updated": moment,
+                      "modified": {}, "fields": {}}
+            table.records[record["id"]] = record
+            try:
+                self._write(table, record, fields, moment)
+            except Exception:
+                table.unindex(record)
+                del table.records[record["id"]]
+                raise
+            self._notify(table, record, "created", list(fields))
+            return self.view(record)
+
+    def update(self, table_name, record_id, fields):
+        with self.lock:
+            table = self.table(table_name)
+            record = table.records.get(record_id)
+            if record is None:
+                raise LookupError(record_id)
+            self._write(table, record, fields, _now())
+            self._notify(table, record, "changed", list(fields))
+            return self.view(record)
+
+    def upsert(self, table_name, fields, merge_on):
+
+        """
+        Args:
+            table_name (str): Table name or ID.
+            fields (dict): Fields of the record.
+            merge_on (list): fieldsToMergeOn of the performUpsert.
+
+        Returns:
+            tuple: (record, created). Like Airtable, the record whose merge fields match is
+                   updated, a new one is created if none does, and several matches are an error.
+        """
+
+        with self.lock:
+            table = self.table(table_name)
+            if not 1 <= len(merge_on) <= 3 or set(merge_on) - table.fieldNames():
+                raise ValueError(f"Invalid fieldsToMergeOn: {merge_on}")
+            key = tuple(_text(fields.get(field)) for field in merge_on)
+            if "" in key:
+                raise ValueError(f"Records must have a value for every field in fieldsToMergeOn: {merge_on}")
+            matches = table.index(merge_on).get(key, [])
+            if len(matches) > 1:
+                raise ValueError(f"{len(matches)} records in {table.name} match {dict(zip(merge_on, key))}")
+            if matches:
+                return self.update(table_name, matches[0], fields), False
+            return self.insert(table_name, fields), True
+
+    @staticmethod
+    def view(record, fields=None):
+        values = record["fields"] if fields is None else {k: v for k, v in record["fields"].items() if k in fields}
+        return {"id": record["id"], "createdTime": _iso(record["created"]), "fields": values}
+
+    def list(self, table_name, formula=None, fields=None, sort=None, page_size=100, offset=None):
+
+        """
+        Args:
+            table_name (str): Table name or ID.
+            formula (str): Optional filterByFormula.
+            fields (list): Optional fields[] projection.
+            sort (list): (field, direction) pairs.
+            page_size (int): Records per page (at most 100).
+            offset (str): Cursor returned with the previous page.
+
+        Returns:
+            dict: One page of records and, if more remain, the next offset. The matching IDs are
+                  snapshotted on the first page, so paging a large table is not quadratic.
+        """
+
+        with self.lock:
+            table = self.table(table_name)
+            if offset:
+                cursor, _, position = offset.partition("/")
+                if cursor not in self.cursors:
+                    raise LookupError("LIST_RECORDS_ITERATOR_NOT_AVAILABLE")
+                ids = self.cursors[cursor]
+                position = int(position)
+            else:
+                matcher = compile_formula(formula) if formula else None
+                if matcher is not None and matcher.ids is not None:
+                    ids = [i for i in matcher.ids if i in table.records]
+                elif matcher is not None:
+                    ids = [i for i, record in table.records.items() if matcher.evaluate(record)]
+                else:
+                    ids = list(table.records)
+                for field, direction in reversed(sort or []):
+                    ids.sort(key=lambda i: _text(table.records[i]["fields"].get(field)) or "",
+                             reverse=direction == "desc")
+                cursor, position = secrets.token_hex(8), 0
+                self.cursors[cursor] = ids
+                while len(self.cursors) > 1000:
+                    self.cursors.popitem(last=False)
+
+            page = [self.view(table.records[i], fields) for i in ids[position:position + page_size] if i in table.records]
+            result = {"records": page}
+            if position + page_size < len(ids):
+                result["offset"] = f"{cursor}/{position + page_size}"
+            else:
+                self.cursors.pop(cursor, None)
+            return result
+
+    def snapshot(self):
+        with self.lock:
+            return {"tables": [dict(table.meta(), records=[self.view(r) for r in table.records.values()])
+                               for table in self.tables.values()]}
+
+    @classmethod
+    def load(cls, path):
+
+        """
+        Args:
+            path (str): Dataset written by benchmarks/generateData.py (.json or .json.gz).
+
+        Returns:
+            FakeBase: A base holding the dataset's tables and records.
+        """
+
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as handle:
+            dataset = json.load(handle)
+
+        base = cls(dataset.get("base_id", "appFakeBase"))
+        for spec in dataset["tables"]:
+            table = FakeTable(spec["id"], spec["name"], spec.get("description", ""), spec["fields"])
+            base.tables[table.id] = table
+        created = _now()
+        for spec in dataset["tables"]:
+            table = base.tables[spec["id"]]
+            for record in spec.get("records", []):
+                table.records[record["id"]] = {"id": record["id"], "created": created, "updated": created,
+                                               "modified": {}, "fields": record["fields"]}
+        return base
+
+
+class RateLimit:
+
+    """
+    Per-base token bucket mirroring Airtable's limit of 5 requests per second. A request
+    over the limit gets a 429 and every request in the following `lockout` seconds gets one too.
+    `grace` seconds of arrival jitter are tolerated, since a client that paces itself exactly
+    at the limit still sees its requests arrive unevenly. A rate of 0 disables throttling.
+    """
+
+    def __init__(self, rate=5.0, lockout=30.0, grace=0.1):
+        self.rate = float(rate)
+        self.lockout = float(lockout)
+        self.grace = float(grace)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.locked_until = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            if now < self.locked_until:
+                return False
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1 - self.grace * self.rate:
+                self.tokens -= 1
+                return True
+            self.locked_until = now + self.lockout
+            return False
+
+
+def fake_evaluation(prompt):
+
+    """
+    Args:
+        prompt (str): Prompt sent to the fake chat completions endpoint.
+
+    Returns:
+        str: A deterministic evaluation in the shape summaryGeneration expects.
+    """
+
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    return json.dumps({
+        "LLM Summary": f"Candidate profile {digest % 100000:05d}",
+        "LLM Score": digest % 10 + 1,
+        "LLM Follow-Ups": ["Can you confirm your availability?", "Which project are you most proud of?"],
+    })
+
+
+class FakeAirtableHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def _error(self, status, error, message):
+        self._send(status, {"error": {"type": error, "message": message}})
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith("multipart/form-data"):
+            return self._form(raw)
+        return json.loads(raw or b"{}")
+
+    def _form(self, raw):
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("latin-1") + b"\r\n\r\n" + raw)
+        return {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                for part in message.iter_parts()}
+
+    def _sendBytes(self, status, body, content_type="application/octet-stream"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        server = self.server
+        url = urlparse(self.path)
+        # Read the body even when the request is rejected, so the keep-alive connection stays usable
+        body = self._body()
+        parts = [unquote(p) for p in url.path.split("/") if p]
+
+        if parts == ["__stats"]:
+            return self._send(200, server.stats())
+        if parts[-2:] == ["chat", "completions"] and method == "POST":
+            return self._chatCompletion(body)
+        if parts[:1] == ["v1"] and parts[1:2] in (["files"], ["batches"]):
+            return self._batchApi(method, parts[1:], body)
+        if not parts or parts[0] != "v0":
+            return self._error(404, "NOT_FOUND", "Unknown endpoint")
+
+        meta = len(parts) > 1 and parts[1] == "meta"
+        hooks = parts[1:2] == ["bases"] and parts[3:4] == ["webhooks"]
+        kind = "meta" if meta else "webhook" if hooks else {("GET", 3): "list", ("GET", 4): "get", ("POST", 3): "create",
+                                    ("PATCH", 3): "update", ("PATCH", 4): "update"}.get((method, len(parts)), "other")
+        if kind == "update" and "performUpsert" in body:
+            kind = "upsert"
+        server.count(f"{method} {kind}")
+
+        if not server.limit.allow():
+            server.count("throttled")
+            return self._send(429, {"errors": [{"error": "RATE_LIMIT_REACHED",
+                                                "message": "Rate limit exceeded. Please try again later"}]},
+                              {"Retry-After": str(int(server.limit.lockout))})
+        if server.latency:
+            time.sleep(random.uniform(0.5, 1.5) * server.latency)
+
+        try:
+            if meta:
+                return self._meta(method, parts, body)
+            if hooks:
+                if parts[2] != server.base.id:
+                    return self._error(404, "NOT_FOUND", f"Base {parts[2]} not found")
+                return self._webhooks(method, parts[4:], dict(parse_qsl(url.query)), body)
+            if parts[1] != server.base.id:
+                return self._error(404, "NOT_FOUND", f"Base {parts[1]} not found")
+            table = parts[2]
+            if method == "GET" and len(parts) == 3:
+                return self._list(table, url.query)
+            if method == "GET" and len(parts) == 4:
+                record = server.base.table(table).records.get(parts[3])
+                if record is None:
+                    return self._error(404, "NOT_FOUND", "Could not find what you are looking for")
+                return self._send(200, server.base.view(record))
+            if method == "POST" and len(parts) == 3:
+                return self._create(table, body)
+            if method == "PATCH":
+                return self._update(table, parts[3] if len(parts) == 4 else None, body)
+            return self._error(404, "NOT_FOUND", "Unknown endpoint")
+        except KeyError as e:
+            return self._error(404, "TABLE_NOT_FOUND", f"Could not find table {e}")
+        except LookupError as e:
+            return self._error(404 if str(e).startswith("rec") else 422, "NOT_FOUND", str(e))
+        except FormulaError as e:
+            return self._error(422, "INVALID_FILTER_BY_FORMULA", str(e))
+        except ValueError as e:
+            return self._error(422, "INVALID_REQUEST", str(e))
+
+    def _meta(self, method, parts, body):
+        base = self.server.base
+        if parts[2:] != ["bases", base.id, "tables"]:
+            return self._error(404, "NOT_FOUND", "Unknown meta endpoint")
+        if method == "GET":
+            with base.lock:
+                return self._send(200, {"tables": [table.meta() for table in base.tables.values()]})
+        table = base.createTable(body["name"], body.get("description", ""), body.get("fields", []))
+        return self._send(200, table.meta())
+
+    def _webhooks(self, method, parts, query, body):
+        server = self.server
+        if not parts and method == "POST":
+            return self._send(200, server.createWebhook(body))
+        if not parts and method == "GET":
+            return self._send(200, {"webhooks": server.listWebhooks()})
+        if not parts or parts[0] not in server.webhooks:
+            return self._error(404, "NOT_FOUND", "Could not find webhook")
+        webhook_id = parts[0]
+        if parts[1:] == ["payloads"] and method == "GET":
+            return self._send(200, server.webhookPayloads(webhook_id, int(query.get("cursor", 1)),
+                                                          int(query.get("limit", 50))))
+        if parts[1:] == ["refresh"] and method == "POST":
+            return self._send(200, {"expirationTime": server.refreshWebhook(webhook_id)})
+        if len(parts) == 1 and method == "DELETE":
+            with server.webhooks_lock:
+                del server.webhooks[webhook_id]
+            return self._send(200, {})
+        return self._error(404, "NOT_FOUND", "Unknown webhook endpoint")
+
+    def _list(self, table, query):
+        params = parse_qsl(query, keep_blank_values=True)
+        fields = [value for key, value in params if key == "fields[]"] or None
+        single = dict(params)
+        page_size = int(single.get("pageSize", 100))
+        if not 1 <= page_size <= 100:
+            raise ValueError("pageSize must be between 1 and 100")
+        sort = []
+        for index in itertools.count():
+            if f"sort[{index}][field]" not in single:
+                break
+            sort.append((single[f"sort[{index}][field]"], single.get(f"sort[{index}][direction]", "asc")))
+        by_id = single.get("returnFieldsByFieldId") in ("true", "1")
+        if fields or by_id:
+            # fields[] takes names or IDs; an unknown one is a 422 like in Airtable
+            known = {field["id"]: field["name"] for field in self.server.base.table(table).fields}
+            names = set(known.values())
+            unknown = [field for field in fields or [] if field not in known and field not in names]
+            if unknown:
+                return self._error(422, "UNKNOWN_FIELD_NAME", f"Unknown field name: {unknown[0]!r}")
+            fields = [known.get(field, field) for field in fields] if fields else None
+        page = self.server.base.list(table, single.get("filterByFormula"), fields, sort, page_size, single.get("offset"))
+        if by_id:
+            ids = {name: field_id for field_id, name in known.items()}
+            for record in page["records"]:
+                record["fields"] = {ids.get(name, name): value for name, value in record["fields"].items()}
+        self.server.count("records read", len(page["records"]))
+        self.server.count("bytes read", self._send(200, page))
+
+    def _create(self, table, body):
+        base = self.server.base
+        if "records" not in body:
+            self.server.count("records written")
+            return self._send(200, base.insert(table, body.get("fields", {})))
+        if len(body["records"]) > 10:
+            raise ValueError("At most 10 records can be created per request")
+        with base.lock:
+            created = [base.insert(table, record.get("fields", {})) for record in body["records"]]
+        self.server.count("records written", len(created))
+        return self._send(200, {"records": created})
+
+    def _update(self, table, record_id, body):
+        base = self.server.base
+        if record_id:
+            self.server.count("records written")
+            return self._send(200, base.update(table, record_id, body.get("fields", {})))
+        if len(body.get("records", [])) > 10:
+            raise ValueError("At most 10 records can be updated per request")
+        if "performUpsert" in body:
+            return self._upsert(table, body)
+        with base.lock:
+            updated = [base.update(table, record["id"], record.get("fields", {})) for record in body["records"]]
+        self.server.count("records written", len(updated))
+        return self._send(200, {"records": updated})
+
+    def _upsert(self, table, body):
+        base = self.server.base
+        merge_on = body["performUpsert"].get("fieldsToMergeOn") or []
+        records, created, updated = [], [], []
+        with base.lock:
+            for record in body["records"]:
+                result, new = base.upsert(table, record.get("fields", {}), merge_on)
+                records.append(result)
+                (created if new else updated).append(result["id"])
+        self.server.count("records written", len(records))
+        return self._send(200, {"records": records, "createdRecords": created, "updatedRecords": updated})
+
+    def _chatCompletion(self, body):
+        server = self.server
+        server.count("llm calls")
+        if server.llm_latency:
+            time.sleep(random.uniform(0.5, 1.5) * server.llm_latency)
+        return self._send(200, completion(server, body))
+
+    def _batchApi(self, method, parts, body):
+        server = self.server
+        if parts == ["files"] and method == "POST":
+            return self._send(200, server.addFile(body["file"], body.get("purpose", b"").decode() or "batch"))
+        if parts == ["batches"] and method == "POST":
+            if body.get("input_file_id") not in server.files:
+                return self._error(404, "invalid_request_error", "No such file")
+            return self._send(200, server.createBatch(body))
+        if len(parts) == 3 and parts[0] == "files" and parts[2] == "content" and parts[1] in server.files:
+            return self._sendBytes(200, server.files[parts[1]]["content"])
+        if len(parts) >= 2 and parts[0] == "batches" and parts[1] in server.batches:
+            batch = server.batches[parts[1]]
+            if len(parts) == 3 and parts[2] == "cancel" and method == "POST":
+                batch["cancel"] = True
+            with server.counters_lock:
+                return self._send(200, {key: value for key, value in batch.items() if key != "cancel"})
+        return self._error(404, "invalid_request_error", "Unknown endpoint")
+
+
+def completion(server, body):
+
+    """
+    Args:
+        server (FakeAirtableServer): Counts the tokens.
+        body (dict): chat.completions.create arguments.
+
+    Returns:
+        dict: A chat completion holding fake_evaluation() of the prompt, or of every candidate
+              of a packed request.
+    """
+
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    schema = ((body.get("response_format") or {}).get("json_schema") or {}).get("name")
+    if schema == "candidate_evaluations":
+        # Packed request: one "<id>: <candidate>" line per candidate in the last message
+        candidates = [line.split(":", 1) for line in str(body["messages"][-1].get("content", "")).splitlines() if ":" in line]
+        content = json.dumps({"results": [dict(json.loads(fake_evaluation(candidate)), id=number.strip())
+                                          for number, candidate in candidates]})
+    else:
+        content = fake_evaluation(prompt)
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+    server.count("llm prompt tokens", prompt_tokens)
+    server.count("llm completion tokens", completion_tokens)
+    return {
+        "id": new_id("chatcmpl-"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                     "message": {"role": "assistant", "content": content, "refusal": None}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class FakeAirtableServer(ThreadingHTTPServer):
+
+    """
+    Local stand-in for the Airtable REST API (list with filterByFormula/offset/fields[]/sort/
+    returnFieldsByFieldId, get, batched create, update and performUpsert, meta tables, webhooks)
+    plus OpenAI-compatible /v1/chat/completions, /v1/files and /v1/batches endpoints, for
+    benchmarks and offline runs.
+
+    Webhooks record a payload for every record change their filters match and POST a signed
+    ping (X-Airtable-Content-MAC) to their notificationUrl, at most one per `ping_interval`
+    seconds per webhook, like Airtable does.
+
+    Usage:
+        server = FakeAirtableServer(FakeBase.load("benchmarks/data/applicants_1000.json.gz"))
+        server.start()
+        # airtable_api_url=server.url, airtable_base_id=server.base.id, openai_base_url=server.url + "/v1"
+        ...
+        server.stop()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, base, host="127.0.0.1", port=0, rate=5.0, lockout=30.0, latency=0.0, llm_latency=0.0,
+                 ping_interval=0.1):
+        super().__init__((host, port), FakeAirtableHandler)
+        self.base = base
+        self.limit = RateLimit(rate, lockout)
+        self.latency = latency
+        self.llm_latency = llm_latency
+        self.counters = Counter()
+        self.counters_lock = threading.Lock()
+        self.files = {}
+        self.batches = {}
+        self.thread = None
+        self.webhooks = OrderedDict()
+        self.webhooks_lock = threading.Condition()
+        self.ping_interval = ping_interval
+        self.pinger = None
+        base.observers.append(self._recordChange)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key, amount=1):
+        with self.counters_lock:
+            self.counters[key] += amount
+
+    def stats(self):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        counters["requests"] = sum(v for k, v in counters.items() if k.split(" ")[0] in ("GET", "POST", "PATCH", "DELETE"))
+        return counters
+
+    def addFile(self, content, purpose):
+        file_id = new_id("file-")
+        self.files[file_id] = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                               "filename": f"{file_id}.jsonl", "purpose": purpose, "status": "processed",
+                               "content": content}
+        return {key: value for key, value in self.files[file_id].items() if key != "content"}
+
+    def createBatch(self, body):
+
+        """
+        Args:
+            body (dict): batches.create arguments.
+
+        Returns:
+            dict: The new batch. It is worked off in a background thread, one request per
+                  llm_latency / 10 seconds, and ends up with output and error files like the real API.
+        """
+
+        batch_id = new_id("batch_")
+        lines = [json.loads(line) for line in self.files[body["input_file_id"]]["content"].splitlines() if line.strip()]
+        batch = self.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"), "errors": None,
+            "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+            "status": "validating", "output_file_id": None, "error_file_id": None, "created_at": int(time.time()),
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0}, "metadata": body.get("metadata"),
+        }
+        threading.Thread(target=self._runBatch, args=(batch, lines), daemon=True).start()
+        return dict(batch)
+
+    def _runBatch(self, batch, lines):
+        outputs, errors = [], []
+        batch["status"] = "in_progress"
+        for line in lines:
+            if batch.get("cancel"):
+                break
+            if self.llm_latency:
+                time.sleep(self.llm_latency / 10)
+            self.count("llm batch requests")
+            if line.get("url") != batch["endpoint"]:
+                errors.append({"id": new_id("batch_req_"), "custom_id": line.get("custom_id"), "response": None,
+                               "error": {"code": "invalid_url", "message": f"Unsupported url {line.get('url')}"}})
+                with self.counters_lock:
+                    batch["request_counts"]["failed"] += 1
+                continue
+            outputs.append({"id": new_id("batch_req_"), "custom_id": line["custom_id"], "error": None,
+                            "response": {"status_code": 200, "request_id": new_id("req_"),
+                                         "body": completion(self, line.get("body", {}))}})
+            with self.counters_lock:
+                batch["request_counts"]["completed"] += 1
+        for key, results in (("output_file_id", outputs), ("error_file_id", errors)):
+            if results:
+                content = "".join(json.dumps(result) + "\n" for result in results).encode("utf-8")
+                batch[key] = self.addFile(content, "batch_output")["id"]
+        batch["status"] = "cancelled" if batch.get("cancel") else "completed"
+
+    def createWebhook(self, body):
+
+        """
+        Args:
+            body (dict): notificationUrl and specification, as sent to POST /v0/bases/{base}/webhooks.
+
+        Returns:
+            dict: The webhook's id, macSecretBase64 and expirationTime.
+        """
+
+        filters = ((body.get("specification") or {}).get("options") or {}).get("filters") or {}
+        if "tableData" not in (filters.get("dataTypes") or []):
+            raise ValueError("specification.options.filters.dataTypes must include tableData")
+        webhook = {"id": new_id("ach"), "notificationUrl": body.get("notificationUrl"), "filters": filters,
+                   "secret": secrets.token_bytes(32), "payloads": [], "ping": False, "pinged": 0.0,
+                   "expirationTime": _iso(_now() + timedelta(days=7))}
+        with self.webhooks_lock:
+            self.webhooks[webhook["id"]] = webhook
+            if self.pinger is None:
+                self.pinger = threading.Thread(target=self._ping, daemon=True)
+                self.pinger.start()
+        return {"id": webhook["id"], "macSecretBase64": base64.b64encode(webhook["secret"]).decode("ascii"),
+                "expirationTime": webhook["expirationTime"]}
+
+    def listWebhooks(self):
+        with self.webhooks_lock:
+            return [{"id": webhook["id"], "type": "client", "isHookEnabled": True,
+                     "notificationUrl": webhook["notificationUrl"],
+                     "cursorForNextPayload": len(webhook["payloads"]) + 1,
+                     "specification": {"options": {"filters": webhook["filters"]}},
+                     "expirationTime": webhook["expirationTime"]} for webhook in self.webhooks.values()]
+
+    def refreshWebhook(self, webhook_id):
+        with self.webhooks_lock:
+            self.webhooks[webhook_id]["expirationTime"] = _iso(_now() + timedelta(days=7))
+            return self.webhooks[webhook_id]["expirationTime"]
+
+    def webhookPayloads(self, webhook_id, cursor=1, limit=50):
+        with self.webhooks_lock:
+            payloads = self.webhooks[webhook_id]["payloads"]
+            cursor = max(int(cursor), 1)
+            page = payloads[cursor - 1:cursor - 1 + min(max(limit, 1), 50)]
+            return {"payloads": page, "cursor": cursor + len(page), "mightHaveMore": cursor - 1 + len(page) < len(payloads)}
+
+    def _recordChange(self, table, record, kind, names, source):
+        with self.webhooks_lock:
+            if not self.webhooks:
+                return
+            fields = {field["name"]: field for field in table.fields}
+            values = {}
+            for name in names:
+                if name in fields:
+                    value = record["fields"].get(name)
+                    if fields[name].get("type") == "multipleRecordLinks":
+                        value = [{"id": linked_id} for linked_id in value or []]
+                    values[fields[name]["id"]] = value
+            if kind == "created":
+                change = {"createdRecordsById": {record["id"]: {"createdTime": _iso(record["created"]),
+                                                                "cellValuesByFieldId": values}}}
+            else:
+                change = {"changedRecordsById": {record["id"]: {"current": {"cellValuesByFieldId": values}}}}
+            for webhook in self.webhooks.values():
+                filters = webhook["filters"]
+                if filters.get("recordChangeScope") not in (None, table.id):
+                    continue
+                if filters.get("fromSources") and source not in filters["fromSources"]:
+                    continue
+                webhook["payloads"].append({
+                    "timestamp": _iso(_now()), "baseTransactionNumber": len(webhook["payloads"]) + 1,
+                    "actionMetadata": {"source": source, "sourceMetadata": {}}, "payloadFormat": "v0",
+                    "changedTablesById": {table.id: change},
+                })
+                webhook["ping"] = True
+            self.webhooks_lock.notify_all()
+
+    def _ping(self):
+        while True:
+            with self.webhooks_lock:
+                self.webhooks_lock.wait_for(lambda: any(webhook["ping"] for webhook in self.webhooks.values()))
+                due = [webhook for webhook in self.webhooks.values()
+                       if webhook["ping"] and time.monotonic() - webhook["pinged"] >= self.ping_interval]
+                for webhook in due:
+                    webhook["ping"], webhook["pinged"] = False, time.monotonic()
+            for webhook in due:
+                body = json.dumps({"base": {"id": self.base.id}, "webhook": {"id": webhook["id"]},
+                                   "timestamp": _iso(_now())}).encode("utf-8")
+                mac = hmac.new(webhook["secret"], body, hashlib.sha256).hexdigest()
+                request = urllib.request.Request(webhook["notificationUrl"], body, method="POST", headers={
+                    "Content-Type": "application/json", "X-Airtable-Content-MAC": f"hmac-sha256={mac}"})
+                try:
+                    with urllib.request.urlopen(request, timeout=5):
+                        self.count("webhook pings")
+                except OSError:
+                    self.count("webhook pings failed")
+            if not due:
+                time.sleep(self.ping_interval / 4)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Serve a fake Airtable base and OpenAI endpoint locally.")
+    parser.add_argument("--data", required=True, help="Dataset from benchmarks/generateData.py")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests per second per base (0 disables throttling)")
+    parser.add_argument("--lockout", type=float, default=30.0, help="Seconds a base stays locked after a 429")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean Airtable latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean chat completion latency in seconds")
+    args = parser.parse_args()
+
+    server = FakeAirtableServer(FakeBase.load(args.data), port=args.port, rate=args.rate,
+                                lockout=args.lockout, latency=args.latency, llm_latency=args.llm_latency)
+    print(f"airtable_api_url={server.url}\nairtable_base_id={server.base.id}\nopenai_base_url={server.url}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,149 @@
+from utils.dbModel import table_models
+from datetime import date, timedelta
+import argparse
+import random
+import gzip
+import json
+import yaml
+import os
+
+
+FIRST_NAMES = ["Alex", "Sam", "Priya", "Wei", "Maria", "Omar", "Lena", "Kofi", "Yuki", "Diego", "Aisha", "Noah"]
+LAST_NAMES = ["Smith", "Patel", "Chen", "Garcia", "Okafor", "Kim", "Müller", "Silva", "Haddad", "Novak", "Ito", "Brown"]
+LOCATIONS = ["US", "Canada", "UK", "Germany", "India", "Brazil", "Nigeria", "Japan", "Mexico", "Australia"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella LLC", "Hooli", "Stark Industries", "Wayne Enterprises",
+             "Soylent Inc.", "Vandelay Industries", "Cyberdyne Systems"]
+TITLES = ["Software Engineer", "Senior Software Engineer", "Data Scientist", "ML Engineer", "Backend Developer",
+          "Frontend Developer", "DevOps Engineer", "Engineering Manager", "Product Engineer", "QA Engineer"]
+TECHNOLOGIES = ["Python", "Go", "Java", "TypeScript", "React", "PostgreSQL", "AWS", "Kubernetes", "PyTorch",
+                "Spark", "Airflow", "Terraform", "Rust", "Django", "Kafka"]
+CURRENCIES = ["USD", "USD", "USD", "CAD", "EUR", "GBP", "INR"]
+
+
+def _table_id(name):
+    return "tbl" + "".join(c for c in name.title() if c.isalnum())[:14]
+
+
+def _record_id(prefix, index):
+    return f"rec{prefix}{index:09d}"
+
+
+def schema():
+
+    """
+    Returns:
+        list: Table definitions of utils/dbModel.py with stable table IDs, link fields pointing
+              at the Applicants table and the inverse link fields Airtable adds to it.
+    """
+
+    tables = []
+    for model in table_models():
+        tables.append({"id": _table_id(model.name), "name": model.name, "description": model.description,
+                       "fields": [dict(field) for field in model.fields], "records": []})
+
+    applicants = tables[0]
+    for table in tables[1:]:
+        for field in table["fields"]:
+            if field["type"] == "multipleRecordLinks":
+                field["options"] = {"linkedTableId": applicants["id"]}
+        applicants["fields"].append({"name": table["name"], "type": "multipleRecordLinks",
+                                     "options": {"linkedTableId": table["id"]}})
+    return tables
+
+
+def generate(count, seed=0, unlinked=0.2, config_path="config.yaml"):
+
+    """
+    Args:
+        count (int): Number of applicants.
+        seed (int): Random seed; the same seed always produces the same dataset.
+        unlinked (float): Share of applicants that only have Compressed JSON and no child records,
+                          which is the input decompress.py backfills.
+        config_path (str): config.yaml, so that some applicants pass the shortlist criteria.
+
+    Returns:
+        dict: Dataset with every table of the base and its records, loadable by
+              benchmarks/fakeAirtable.FakeBase.load.
+
+    Function:
+        This function generates applicants with personal details, salary preferences and one to
+        four work experiences each, plus the Compressed JSON compress.py would build for them.
+    """
+
+    rng = random.Random(seed)
+    with open(config_path) as handle:
+        config = yaml.safe_load(handle)
+    companies = COMPANIES + list(config.get("tier_one_companies", []))
+    locations = LOCATIONS + list(config.get("location", []))
+
+    tables = schema()
+    applicants, personal, work, salary = (tables[0], tables[1], tables[2], tables[3])
+    today = date.today()
+    experience_number = 0
+
+    for index in range(count):
+        applicant_id = _record_id("A", index)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        email = f"{name.lower().replace(' ', '.')}.{index}@example.com"
+
+        details = {"Full Name": name, "Applicant ID": [applicant_id], "Email": email,
+                   "Location": rng.choice(locations), "LinkedIn Profile": f"https://linkedin.com/in/applicant-{index}"}
+        preferences = {"Salary Preference ID": index + 1, "Applicant ID": [applicant_id],
+                       "Preferred Rate": rng.randrange(40, 140), "Minimum Rate": rng.randrange(30, 100),
+                       "Currency": rng.choice(CURRENCIES), "Availability": str(rng.choice([10, 20, 25, 30, 40]))}
+
+        experiences = []
+        end = today - timedelta(days=rng.randrange(0, 400))
+        for _ in range(rng.randint(1, 4)):
+            start = end - timedelta(days=rng.randrange(120, 1600))
+            experience_number += 1
+            experiences.append({"Experience ID": experience_number, "Applicant ID": [applicant_id],
+                                "Company": rng.choice(companies), "Title": rng.choice(TITLES),
+                                "Start": start.isoformat(), "End": end.isoformat() if experiences else None,
+                                "Technologies": ", ".join(rng.sample(TECHNOLOGIES, rng.randint(2, 5)))})
+            end = start - timedelta(days=rng.randrange(-90, 200))
+        for experience in experiences:
+            if experience["End"] is None:
+                del experience["End"]
+
+        compressed = {
+            "Applicant ID": email,
+            personal["name"]: dict(details),
+            salary["name"]: {k: v for k, v in preferences.items() if k != "Salary Preference ID"},
+            work["name"]: [{k: v for k, v in e.items() if k != "Experience ID"} for e in experiences],
+        }
+        fields = {"Applicant ID": email, "Compressed JSON": json.dumps(compressed)}
+
+        if rng.random() >= unlinked:
+            personal_id, salary_id = _record_id("P", index), _record_id("S", index)
+            work_ids = [_record_id("W", e["Experience ID"]) for e in experiences]
+            personal["records"].append({"id": personal_id, "fields": details})
+            salary["records"].append({"id": salary_id, "fields": preferences})
+            work["records"].extend({"id": work_id, "fields": e} for work_id, e in zip(work_ids, experiences))
+            fields.update({personal["name"]: [personal_id], salary["name"]: [salary_id], work["name"]: work_ids})
+
+        applicants["records"].append({"id": applicant_id, "fields": fields})
+
+    return {"base_id": "appFakeBase", "seed": seed, "applicants": count, "tables": tables}
+
+
+def write(dataset, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as handle:
+        json.dump(dataset, handle)
+    return path
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic Airtable base for benchmarks.")
+    parser.add_argument("--size", type=int, nargs="+", default=[1000, 10000, 100000], help="Applicant counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unlinked", type=float, default=0.2, help="Share of applicants without child records")
+    parser.add_argument("--out", default=os.path.join("benchmarks", "data"), help="Output directory")
+    args = parser.parse_args()
+
+    for size in args.size:
+        path = write(generate(size, args.seed, args.unlinked), os.path.join(args.out, f"applicants_{size}.json.gz"))
+        print(f"{size} applicants -> {path}")
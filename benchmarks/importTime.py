@@ -0,0 +1,106 @@
+import subprocess
+import tempfile
+import argparse
+import shutil
+import json
+import sys
+import os
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed per module, in milliseconds. numpy (shortlisting, experience) is
+# the largest import that is still paid up front; openai, requests, yaml, dotenv and tiktoken are
+# imported on first use.
+BUDGETS = {
+    "loggerConfig": 50,
+    "utils.airTableHelpers": 100,
+    "compress": 150,
+    "decompress": 150,
+    "shortlist": 300,
+    "summaryGeneration": 300,
+    "pipeline": 300,
+    "worker": 300,
+    "webhookReceiver": 300,
+    "bulkTransfer": 150,
+}
+
+# Modules that importing any of the above must not load
+DEFERRED = ["openai", "requests", "yaml", "dotenv", "tiktoken", "logging.handlers"]
+
+
+def measure(module, workdir):
+
+    """
+    Args:
+        module (str): Module to import, e.g. 'summaryGeneration'.
+        workdir (str): Empty directory the import runs in.
+
+    Returns:
+        dict: {'module', 'ms', 'loaded'}: cumulative import time from python -X importtime and
+              the DEFERRED modules the import loaded anyway.
+    """
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    imported, total = set(), None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        imported.add(name.strip())
+        if name.strip() == module:
+            total = int(cumulative) / 1000
+    return {"module": module, "ms": total, "loaded": [name for name in DEFERRED if name in imported]}
+
+
+def check(modules, repeat=3, scale=1.0):
+
+    """
+    Args:
+        modules (list): Modules to check (keys of BUDGETS).
+        repeat (int): Imports per module; the fastest counts, as the others mostly measure noise.
+        scale (float): Multiplies every budget, e.g. 2 on a slow CI machine.
+
+    Returns:
+        list: One row per module with its time, budget, deferred modules it loaded, the files it
+              created in its working directory and whether it passed.
+    """
+
+    rows = []
+    for module in modules:
+        workdir = tempfile.mkdtemp(prefix="hireeasy-import-")
+        try:
+            runs = [measure(module, workdir) for _ in range(repeat)]
+            created = sorted(os.listdir(workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        best = min(runs, key=lambda run: run["ms"])
+        budget = BUDGETS[module] * scale
+        rows.append({"module": module, "ms": round(best["ms"], 1), "budget_ms": budget, "loaded": best["loaded"],
+                     "created": created,
+                     "ok": best["ms"] <= budget and not best["loaded"] and not created})
+    return rows
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Check that importing the entry points stays fast and has no side effects.")
+    parser.add_argument("--modules", nargs="+", choices=list(BUDGETS), default=list(BUDGETS))
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module; the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget by this factor")
+    args = parser.parse_args()
+
+    rows = check(args.modules, args.repeat, args.scale)
+    for row in rows:
+        print(json.dumps(row))
+    failed = [row["module"] for row in rows if not row["ok"]]
+    if failed:
+        print(f"Over budget or with import-time side effects: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,49 @@
+from benchmarks.generateData import generate
+from utils.preRanker import PreRanker
+from utils.jsonCodec import decode_json
+from utils.settings import config
+import numpy as np
+import argparse
+import time
+import json
+import os
+
+
+def measure(input_texts, ranker, cutoffs):
+
+    """
+    Args:
+        input_texts (list): Compressed JSON of the applicants.
+        ranker (PreRanker): Ranker to time, e.g. from config.yaml.
+        cutoffs (list): min_score values to report the number of selected applicants for.
+
+    Returns:
+        dict: Seconds spent decoding and scoring, the percentiles of the score min_score is
+              compared with and, per cut-off, how many applicants would be sent to the LLM.
+    """
+
+    started = time.perf_counter()
+    data = [decode_json(text) for text in input_texts]
+    decoded = time.perf_counter()
+    scores = ranker.score(data)
+    scored = time.perf_counter()
+    return {
+        "applicants": len(data),
+        "decode_seconds": round(decoded - started, 2),
+        "score_seconds": round(scored - decoded, 2),
+        "percentiles": dict(zip(["p10", "p50", "p90", "max"], np.percentile(scores["absolute"], [10, 50, 90, 100]).round(3).tolist())),
+        "selected": {str(cutoff): int((scores["absolute"] >= cutoff).sum()) for cutoff in cutoffs},
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time the local pre-ranking and show how many applicants each cut-off keeps.")
+    parser.add_argument("--size", type=int, default=100000, help="Synthetic applicants to rank")
+    parser.add_argument("--min-score", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7], help="Cut-offs to report")
+    args = parser.parse_args()
+
+    dataset = generate(args.size, config_path="config.yaml")
+    applicants = next(table for table in dataset["tables"] if table["name"] == os.getenv("applicants_table_name", "Applicants"))
+    input_texts = [record["fields"]["Compressed JSON"] for record in applicants["records"]]
+    print(json.dumps(measure(input_texts, PreRanker(config()), args.min_score)))
@@ -0,0 +1,47 @@
+from benchmarks.generateData import generate
+from utils.promptBuilder import build_messages, count_message_tokens, count_tokens, load_tiktoken
+import summaryGeneration
+import argparse
+import json
+import os
+
+
+def measure(input_texts, pack_sizes):
+
+    """
+    Args:
+        input_texts (list): Candidates as JSON text.
+        pack_sizes (list): Candidates per request to measure for the compact prompt.
+
+    Returns:
+        list: One row per prompt variant with the prompt tokens per candidate and the share of
+              them in the request's fixed prefix (the system message).
+    """
+
+    rows = []
+    full = [summaryGeneration.llm_request(summaryGeneration.build_prompt(text))["messages"] for text in input_texts]
+    rows.append({"prompt": "full", "pack": 1, "tokens_per_candidate": sum(map(count_message_tokens, full)) / len(full),
+                 "prefix_tokens": count_tokens(full[0][0]["content"])})
+    for pack in pack_sizes:
+        packs = [input_texts[start:start + pack] for start in range(0, len(input_texts), pack)]
+        messages = [build_messages(texts) for texts in packs]
+        rows.append({"prompt": "compact", "pack": pack,
+                     "tokens_per_candidate": sum(map(count_message_tokens, messages)) / len(input_texts),
+                     "prefix_tokens": count_tokens(messages[0][0]["content"])})
+    return rows
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare prompt tokens per candidate of the full and compact prompts.")
+    parser.add_argument("--size", type=int, default=200, help="Synthetic applicants to build prompts for")
+    parser.add_argument("--pack", type=int, nargs="+", default=[1, 5, 10, 20], help="Candidates per request")
+    args = parser.parse_args()
+
+    dataset = generate(args.size)
+    applicants = next(table for table in dataset["tables"] if table["name"] == os.getenv("applicants_table_name", "Applicants"))
+    input_texts = [record["fields"]["Compressed JSON"] for record in applicants["records"]]
+
+    print(f"Token counts from {'tiktoken' if load_tiktoken() else 'an estimate of 4 characters per token'}")
+    for row in measure(input_texts, args.pack):
+        print(json.dumps(row))
@@ -0,0 +1,152 @@
+from benchmarks.fakeAirtable import FakeAirtableServer, FakeBase
+from benchmarks.generateData import generate, write
+from utils.dbModel import table_models
+import subprocess
+import tempfile
+import argparse
+import shutil
+import time
+import json
+import sys
+import os
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pipeline order: backfill child tables first, so compress sees every applicant's links
+STAGES = {
+    "decompress": ["decompress.py"],
+    "compress": ["compress.py"],
+    "shortlist": ["shortlist.py"],
+    "summaryGeneration": ["summaryGeneration.py"],
+    "pipeline": ["pipeline.py"],
+}
+
+COUNTERS = ["requests", "GET list", "GET get", "POST create", "PATCH update", "PATCH upsert", "throttled", "bytes read",
+            "records read", "records written", "llm calls", "llm batch requests"]
+
+
+def stage_env(server, workdir, client_rate):
+
+    """
+    Args:
+        server (FakeAirtableServer): The running stand-in.
+        workdir (str): Directory for the stage's checkpoints, caches and logs.
+        client_rate (float): airtable_rate_limit for the stage's Airtable client.
+
+    Returns:
+        dict: Environment that points a stage at the stand-in instead of Airtable and OpenAI.
+    """
+
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "airtable_api_url": server.url,
+        "airtable_base_id": server.base.id,
+        "airtable_token": "fake-token",
+        "airtable_rate_limit": str(client_rate),
+        "openai_api_key": "fake-key",
+        "openai_base_url": server.url + "/v1",
+        "checkpoint_path": os.path.join(workdir, "checkpoints.sqlite"),
+        "llm_cache_path": os.path.join(workdir, "llm_cache.sqlite"),
+        "replica_path": os.path.join(workdir, "replica.sqlite"),
+    })
+    for model, variable in zip(table_models(), ["applicants_table_name", "personal_details_table_name",
+                                                 "work_experience_table_name", "salary_preferences_table_name",
+                                                 "shortlisted_leads_table_name"]):
+        env.setdefault(variable, model.name)
+    return env
+
+
+def run_stage(stage, args, env, workdir, server):
+
+    """
+    Args:
+        stage (str): Stage name.
+        args (list): Extra command line arguments for the stage.
+        env (dict): Environment from stage_env.
+        workdir (str): Working directory of the stage process.
+        server (FakeAirtableServer): The running stand-in, whose counters are diffed.
+
+    Returns:
+        dict: Wall time, peak RSS, exit code and the stand-in's counters for this stage.
+
+    Function:
+        This function runs the stage's script in its own process, so the peak RSS reported by
+        wait4() belongs to that stage alone.
+    """
+
+    before = server.stats()
+    started = time.perf_counter()
+    with open(os.path.join(workdir, f"{stage}.out"), "ab") as output:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, *STAGES[stage])] + args,
+                                   cwd=workdir, env=env, stdout=output, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - started
+    after = server.stats()
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    result = {"stage": stage, "wall_seconds": round(wall, 3), "peak_rss_mb": round(peak_rss, 1),
+              "exit_code": process.returncode}
+    result.update({key: after.get(key, 0) - before.get(key, 0) for key in COUNTERS})
+    return result
+
+
+def print_report(results):
+    columns = ["stage", "run", "wall_seconds", "peak_rss_mb"] + COUNTERS
+    widths = [max(len(column), *(len(str(r.get(column, ""))) for r in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result.get(column, "")).ljust(width) for column, width in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages against a local Airtable stand-in.")
+    parser.add_argument("--size", type=int, default=1000, help="Applicants to generate (ignored with --data)")
+    parser.add_argument("--data", help="Dataset from benchmarks/generateData.py")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=[stage for stage in STAGES if stage != "pipeline"])
+    parser.add_argument("--runs", type=int, default=1, help="Runs per stage; runs after the first are incremental")
+    parser.add_argument("--rate", type=float, default=5.0, help="Server rate limit in requests per second (0 disables it)")
+    parser.add_argument("--lockout", type=float, default=30.0, help="Seconds the base stays locked after a 429")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean Airtable latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean chat completion latency in seconds")
+    parser.add_argument("--pause", type=float, default=1.0,
+                        help="Seconds between stages; each process starts with a full client rate bucket, so "
+                             "without a pause it can overrun the budget the previous stage just used up")
+    parser.add_argument("--stage-args", default="", help="Extra arguments passed to every stage, e.g. '--replica'")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory with logs and checkpoints")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hireeasy-bench-")
+    shutil.copy(os.path.join(ROOT, "config.yaml"), workdir)
+    data = args.data or write(generate(args.size, config_path=os.path.join(ROOT, "config.yaml")),
+                              os.path.join(workdir, f"applicants_{args.size}.json.gz"))
+
+    server = FakeAirtableServer(FakeBase.load(data), rate=args.rate, lockout=args.lockout,
+                                latency=args.latency, llm_latency=args.llm_latency).start()
+    env = stage_env(server, workdir, args.rate or 1000000)
+    results = []
+    try:
+        for run in range(1, args.runs + 1):
+            for stage in args.stages:
+                time.sleep(args.pause)
+                result = run_stage(stage, args.stage_args.split(), env, workdir, server)
+                result["run"] = run
+                results.append(result)
+                print(f"{stage} (run {run}): {result['wall_seconds']}s, {result['requests']} requests, "
+                      f"{result['peak_rss_mb']} MB peak RSS", file=sys.stderr)
+    finally:
+        server.stop()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"data": data, "settings": vars(args), "results": results}, handle, indent=2)
+    if args.keep:
+        print(f"Working directory: {workdir}", file=sys.stderr)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,186 @@
+from benchmarks.fakeAirtable import FakeAirtableServer, FakeBase
+from benchmarks.generateData import generate, write
+from benchmarks.runBenchmarks import ROOT, stage_env
+import subprocess
+import tempfile
+import argparse
+import signal
+import shutil
+import socket
+import time
+import json
+import sys
+import os
+
+
+COUNTERS = ["requests", "GET list", "PATCH update", "PATCH upsert", "GET webhook", "throttled", "records read",
+            "records written", "llm calls", "webhook pings"]
+
+
+def split_dataset(dataset, existing):
+
+    """
+    Args:
+        dataset (dict): From benchmarks/generateData.generate.
+        existing (int): Applicants that are already in the base.
+
+    Returns:
+        list: The other applicants as form submissions, taken out of the dataset: (record ID,
+              applicant fields, [(child table, fields), ...]). Like a real form they carry
+              no Compressed JSON; the child records link to the applicant.
+    """
+
+    applicants, children = dataset["tables"][0], dataset["tables"][1:]
+    submitted = {record["id"]: (record["id"], {"Applicant ID": record["fields"]["Applicant ID"]}, [])
+                 for record in applicants["records"][existing:]}
+    applicants["records"] = applicants["records"][:existing]
+    for table in children:
+        kept = []
+        for record in table["records"]:
+            links = record["fields"].get("Applicant ID") or []
+            if links and links[0] in submitted:
+                submitted[links[0]][2].append((table["name"], record["fields"]))
+            else:
+                kept.append(record)
+        table["records"] = kept
+    return list(submitted.values())
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The receiver exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"The receiver did not listen on port {port} within {timeout}s")
+
+
+def send(base, submissions, rate, applicants_table):
+
+    """
+    Args:
+        base (FakeBase): The stand-in's base.
+        submissions (list): From split_dataset.
+        rate (float): Applicants submitted per second.
+        applicants_table (str): Name of the Applicants table.
+
+    Returns:
+        dict: Record ID -> time it was submitted (epoch seconds).
+
+    Function:
+        This function writes the applicants and their child records straight into the base as
+        'formSubmission' changes, so the stand-in pings the receiver like Airtable would.
+    """
+
+    submitted, started = {}, time.time()
+    for index, (record_id, fields, children) in enumerate(submissions):
+        with base.changeSource("formSubmission"):
+            submitted[record_id] = time.time()
+            base.insert(applicants_table, fields, record_id=record_id)
+            for table, child in children:
+                base.insert(table, child)
+        if rate > 0:
+            time.sleep(max(0.0, (index + 1) / rate - (time.time() - started)))
+    return submitted
+
+
+def wait_for_scores(base, submitted, applicants_table, timeout):
+
+    """
+    Returns:
+        dict: Record ID -> seconds from submission until its LLM Score was written, for every
+              applicant scored before the timeout.
+    """
+
+    latencies, deadline = {}, time.monotonic() + timeout
+    table = base.table(applicants_table)
+    while len(latencies) < len(submitted) and time.monotonic() < deadline:
+        with base.lock:
+            for record_id, started in submitted.items():
+                record = table.records.get(record_id)
+                if record_id not in latencies and record and record["fields"].get("LLM Score") is not None:
+                    latencies[record_id] = record["updated"].timestamp() - started
+        time.sleep(0.05)
+    return latencies
+
+
+def quantile(values, q):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2) if ordered else None
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Measure how fast the webhook receiver scores new applicants, "
+                                                 "with a local Airtable stand-in sending the notifications.")
+    parser.add_argument("--existing", type=int, default=1000, help="Applicants already in the base")
+    parser.add_argument("--count", type=int, default=50, help="Applicants submitted while the receiver runs")
+    parser.add_argument("--send-rate", type=float, default=5.0, help="Applicants submitted per second (0 = all at once)")
+    parser.add_argument("--window", type=float, default=2.0, help="Receiver batching window in seconds")
+    parser.add_argument("--max-batch", type=int, default=25, help="Receiver batch size")
+    parser.add_argument("--rate", type=float, default=5.0, help="Server rate limit in requests per second (0 disables it)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean Airtable latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean chat completion latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM requests in flight in the receiver")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for every applicant to be scored")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory with logs and checkpoints")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hireeasy-webhook-")
+    shutil.copy(os.path.join(ROOT, "config.yaml"), workdir)
+    dataset = generate(args.existing + args.count, unlinked=0, config_path=os.path.join(ROOT, "config.yaml"))
+    submissions = split_dataset(dataset, args.existing)
+    base = FakeBase.load(write(dataset, os.path.join(workdir, "base.json.gz")))
+    applicants_table = dataset["tables"][0]["name"]
+
+    server = FakeAirtableServer(base, rate=args.rate, latency=args.latency, llm_latency=args.llm_latency).start()
+    env = stage_env(server, workdir, args.rate or 1000000)
+    port = free_port()
+    receiver = None
+    try:
+        registered = subprocess.run([sys.executable, os.path.join(ROOT, "webhookReceiver.py"), "register",
+                                     "--url", f"http://127.0.0.1:{port}/"],
+                                    cwd=workdir, env=env, capture_output=True, text=True, check=True)
+        env.update(line.split("=", 1) for line in registered.stdout.splitlines() if "=" in line)
+
+        with open(os.path.join(workdir, "webhookReceiver.out"), "ab") as output:
+            receiver = subprocess.Popen([sys.executable, os.path.join(ROOT, "webhookReceiver.py"), "serve",
+                                         "--host", "127.0.0.1", "--port", str(port), "--poll", "5",
+                                         "--window", str(args.window), "--max-batch", str(args.max_batch),
+                                         "--concurrency", str(args.concurrency)],
+                                        cwd=workdir, env=env, stdout=output, stderr=subprocess.STDOUT)
+        wait_for_port(port, receiver)
+
+        before = server.stats()
+        started = time.perf_counter()
+        submitted = send(base, submissions, args.send_rate, applicants_table)
+        latencies = wait_for_scores(base, submitted, applicants_table, args.timeout)
+        wall = time.perf_counter() - started
+        after = server.stats()
+    finally:
+        if receiver and receiver.poll() is None:
+            receiver.send_signal(signal.SIGINT)
+            receiver.wait(30)
+        server.stop()
+
+    values = list(latencies.values())
+    result = {"existing": args.existing, "submitted": len(submitted), "scored": len(values),
+              "wall_seconds": round(wall, 2), "latency_p50": quantile(values, 0.5),
+              "latency_p95": quantile(values, 0.95), "latency_max": quantile(values, 1.0)}
+    result.update({key: after.get(key, 0) - before.get(key, 0) for key in COUNTERS})
+    result["requests_per_applicant"] = round(result["requests"] / max(len(submitted), 1), 2)
+    print(json.dumps(result))
+    if args.keep:
+        print(f"Working directory: {workdir}", file=sys.stderr)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
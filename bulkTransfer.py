@@ -0,0 +1,486 @@
+from utils.airTableHelpers import RecordBuffer, add_records, upsert_records, logRequestStats, batch_limit
+from utils.checkpoints import CheckpointStore
+from utils.dbModel import createMissingTables, table_models
+from utils.metrics import metrics, runMetrics
+from utils.recordFile import RecordWriter, iterRecordFile
+from utils.replica import Replica, ReplicaBuffer
+import utils.airTableHelpers as airTableHelpers
+from loggerConfig import setup_logger
+from utils.settings import config, loadEnv
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import threading
+import argparse
+import tempfile
+import sqlite3
+import shutil
+import time
+import os
+
+logger = setup_logger()
+
+OFFLINE_STAGES = ["compress", "shortlist"]
+
+
+def merge_keys():
+
+    """
+    Returns:
+        dict: Table name -> fields its imported records are upserted on, so repeating an import
+              updates the records it already created. Records missing a merge value are created.
+    """
+
+    import decompress
+    return {os.getenv('applicants_table_name'): ['Applicant ID'], **decompress.merge_fields(),
+            os.getenv('shortlisted_leads_table_name'): ['Lead ID']}
+
+
+def batched(records, size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IdMap:
+
+    """
+    Source record ID -> ID of the record the import wrote for it, per table, kept in the
+    import's state file. Every chunk's IDs are saved as soon as Airtable returns them, so a
+    rerun after a crash only writes what is still missing.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS imported (
+                table_name TEXT NOT NULL,
+                source_id TEXT NOT NULL,
+                target_id TEXT NOT NULL,
+                PRIMARY KEY (table_name, source_id)
+            )""")
+        self.conn.commit()
+
+
+    def lookup(self, table_name, source_ids):
+        ids, found = list(dict.fromkeys(source_ids)), {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            with self.lock:
+                found.update(self.conn.execute(f"SELECT source_id, target_id FROM imported WHERE table_name = ? AND "
+                                               f"source_id IN ({', '.join('?' for _ in chunk)})", [table_name] + chunk))
+        return found
+
+
+    def save(self, table_name, pairs):
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO imported (table_name, source_id, target_id) VALUES (?, ?, ?)",
+                                  [(table_name, source_id, target_id) for source_id, target_id in pairs])
+            self.conn.commit()
+
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def exportBase(path, tables = None, source = None):
+
+    """
+    Args:
+        path (str): File to write; .jsonl or .jsonl.gz (see utils/recordFile.py).
+        tables (list): Tables to export (every table of utils/dbModel.py by default).
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+
+    Returns:
+        dict: Table name -> number of records exported.
+
+    Function:
+        This function streams every table page by page into the file, so memory stays flat
+        however large the base is. Tables the base does not have are skipped.
+    """
+
+    tables = tables or [model.name for model in table_models()]
+    if source is None:
+        existing = {table["name"] for table in airTableHelpers.refreshSchema()}
+        for table in [table for table in tables if table not in existing]:
+            logger.warning(f"{table} is not in the base; not exported")
+        tables = [table for table in tables if table in existing]
+
+    with RecordWriter(path) as writer:
+        for table in tables:
+            started = time.perf_counter()
+            for record in (source or airTableHelpers).iterRecords(table):
+                writer.write(table, record)
+            logger.info(f"Exported {writer.counts.get(table, 0)} {table} records in {time.perf_counter() - started:.1f}s")
+    metrics.inc("bulk_records_total", sum(writer.counts.values()), outcome="exported")
+    return writer.counts
+
+
+def childLinks(replica, app, tables):
+
+    """
+    Args:
+        replica (Replica): Where the applicant was loaded.
+        app (dict): Applicants record.
+        tables (list): Child table names.
+
+    Returns:
+        dict: Child table -> IDs of the applicant's child records. The applicant's own link fields
+              are used; a file without them (e.g. exported without the inverse links) falls back
+              to the child records linking to the applicant.
+    """
+
+    links = {table: list(app['fields'].get(table) or []) for table in tables}
+    if not any(links.values()):
+        for table_name, record_id, field in replica.linkedFrom(app['id']):
+            if table_name in links and field == 'Applicant ID':
+                links[table_name].append(record_id)
+    return links
+
+
+def compressionBatch(replica, page, tables, ids = None):
+
+    """
+    Args:
+        replica (Replica): Holds the applicants and their child records.
+        page (list): Applicants records of the replica.
+        tables (list): Child table names (compress.child_tables()).
+        ids (IdMap): For an import, the IDs the applicants were written under. The batch is then
+                     keyed by those, and the child records link to them, like compress.py would
+                     read them back from the base. Applicants not imported yet are left out.
+
+    Returns:
+        tuple: (batch, index) for compress.compressBatch: Applicants records with only the
+               fields compress reads, and the child index for the batch.
+    """
+
+    import compress
+    targets = ids.lookup(os.getenv('applicants_table_name'), [app['id'] for app in page]) if ids else None
+    batch = []
+    for app in page:
+        if targets is not None and app['id'] not in targets:
+            continue
+        links = childLinks(replica, app, tables)
+        # Keep the applicant's field order, since it is the order of the compressed JSON
+        fields = {key: value for key, value in app['fields'].items() if key == 'Applicant ID' or key in tables}
+        fields.update({table: value for table, value in links.items() if value})
+        batch.append({"id": targets[app['id']] if targets else app['id'], "fields": fields})
+
+    index = compress.prefetchChildren(batch, tables, replica)
+    for app in batch:
+        for table in tables:
+            # Links to records missing from the file would otherwise be fetched from Airtable
+            if app['fields'].get(table):
+                app['fields'][table] = [record_id for record_id in app['fields'][table] if record_id in index[table]]
+
+    if targets is not None:
+        linked = [source_id for table in tables for fields in index[table].values() for source_id in fields.get('Applicant ID') or []]
+        parents = ids.lookup(os.getenv('applicants_table_name'), linked)
+        for table in tables:
+            for fields in index[table].values():
+                if fields.get('Applicant ID'):
+                    fields['Applicant ID'] = [parents[source_id] for source_id in fields['Applicant ID'] if source_id in parents]
+    return batch, index
+
+
+def writeChunk(table_name, chunk, merge_on, ids):
+
+    """
+    Args:
+        table_name (str): Table to write to.
+        chunk (list): Up to 10 (source record ID, fields) pairs.
+        merge_on (list): Fields to upsert on; without them, or if a record lacks one, the chunk
+                         is created instead.
+        ids (IdMap): Receives the IDs of the written records.
+
+    Returns:
+        int: Number of records written (0 if the request failed).
+    """
+
+    values = [fields for _, fields in chunk]
+    try:
+        if merge_on and all(fields.get(field) not in (None, "") for fields in values for field in merge_on):
+            written = upsert_records(table_name, values, merge_on)
+        else:
+            written = add_records(table_name, values)
+    except Exception as e:
+        logger.error(f"Importing {len(chunk)} records into {table_name} failed: {e}")
+        written = []
+    if len(written) != len(chunk):
+        # Airtable writes a chunk as a whole, so a short answer means nothing can be matched up
+        metrics.inc("bulk_records_total", len(chunk), table=table_name, outcome="failed")
+        return 0
+    ids.save(table_name, [(source_id, record["id"]) for (source_id, _), record in zip(chunk, written)])
+    metrics.inc("bulk_records_total", len(chunk), table=table_name, outcome="imported")
+    return len(chunk)
+
+
+def importTable(replica, ids, model, merge_on, executor, omit_compressed = False, page_size = 500):
+
+    """
+    Args:
+        replica (Replica): Holds the records loaded from the file.
+        ids (IdMap): Source -> written record IDs.
+        model: Table class of utils/dbModel.py; only its fields are written, since the others
+               (inverse links, formulas, Created By, ...) are maintained by Airtable.
+        merge_on (list): Fields to upsert on.
+        executor (ThreadPoolExecutor): Sends the chunks; the shared client keeps the combined
+                                       request rate under the per-base limit.
+        omit_compressed (bool): Leave out the Compressed JSON of applicants with child records,
+                                because compressImported() rebuilds it.
+        page_size (int): Records read from the replica and sent per round.
+
+    Returns:
+        dict: Counts of records 'imported', 'failed', 'skipped' (imported by an earlier run) and
+              'unlinked' (their applicant is not imported yet; a rerun imports them).
+    """
+
+    import compress
+    applicants = os.getenv('applicants_table_name')
+    links = {field["name"] for field in model.fields if field["type"] == "multipleRecordLinks"}
+    writable = {field["name"] for field in model.fields}
+    counts = {"imported": 0, "failed": 0, "skipped": 0, "unlinked": 0}
+    started = time.perf_counter()
+
+    for page in batched(replica.iterRecords(model.name), page_size):
+        done = ids.lookup(model.name, [record['id'] for record in page])
+        page = [record for record in page if record['id'] not in done]
+        counts["skipped"] += len(done)
+        parents = ids.lookup(applicants, [source_id for record in page for link in links
+                                          for source_id in record['fields'].get(link) or []]) if links else {}
+
+        pending = []
+        for record in page:
+            fields, unlinked = {}, False
+            for key, value in record['fields'].items():
+                if key in links:
+                    mapped = [parents[source_id] for source_id in value or [] if source_id in parents]
+                    unlinked = unlinked or bool(value and not mapped)
+                    if mapped:
+                        fields[key] = mapped
+                elif key in writable:
+                    fields[key] = value
+            if omit_compressed and any(childLinks(replica, record, compress.child_tables()).values()):
+                fields.pop('Compressed JSON', None)
+            if unlinked:
+                counts["unlinked"] += 1
+                metrics.inc("bulk_records_total", table=model.name, outcome="unlinked")
+            else:
+                pending.append((record['id'], fields))
+
+        chunks = [pending[start:start + batch_limit] for start in range(0, len(pending), batch_limit)]
+        written = sum(executor.map(lambda chunk: writeChunk(model.name, chunk, merge_on, ids), chunks))
+        counts["imported"] += written
+        counts["failed"] += len(pending) - written
+        logger.info(f"{model.name}: {counts['imported']} imported, {counts['failed']} failed, {counts['skipped']} already imported "
+                    f"({time.perf_counter() - started:.1f}s)")
+
+    if counts["unlinked"]:
+        logger.warning(f"{model.name}: {counts['unlinked']} records link to applicants that are not imported yet; "
+                       f"run the import again once they are")
+    return counts
+
+
+def compressImported(replica, ids, store = None, batch_size = 100):
+
+    """
+    Args:
+        replica (Replica): Holds the records loaded from the file.
+        ids (IdMap): Source -> written record IDs.
+        store (CheckpointStore): Optional checkpoint store. compress.py's input hashes are saved
+                                 for the imported applicants (without moving its watermark), so
+                                 its next run does not write the same Compressed JSON again.
+        batch_size (int): Applicants per batch.
+
+    Returns:
+        int: Applicants whose Compressed JSON was written.
+
+    Function:
+        This function builds the Compressed JSON of every imported applicant from the file with
+        compress.compressBatch, as updateCompressedJSONforRecords would from the base, and
+        writes it 10 applicants per request. Nothing is read from Airtable.
+    """
+
+    import compress
+    tables = compress.child_tables()
+    run = store.begin("compress", watermark=False) if store else None
+    written = 0
+
+    with RecordBuffer(os.getenv('applicants_table_name')) as buffer:
+        for page in batched(replica.iterRecords(os.getenv('applicants_table_name')), batch_size):
+            batch, index = compressionBatch(replica, page, tables, ids)
+            failed = buffer.failed
+            compress.compressBatch(batch, buffer, index, run, replica)
+            buffer.flush()
+            if run and buffer.failed > failed:
+                for app in batch:
+                    run.forget(app['id'])
+            elif run:
+                run.checkpoint()
+        written = buffer.written
+
+    if run:
+        run.commit()
+    return written
+
+
+def importFile(path, state_path = "import_state.sqlite", store = None, concurrency = 4, build_compressed = True):
+
+    """
+    Args:
+        path (str): File written by exportBase() (.jsonl or .jsonl.gz).
+        state_path (str): SQLite file holding the loaded records and the IDs written so far.
+                          Keep it until the import is complete; rerunning with the same file
+                          and state resumes where the last run stopped.
+        store (CheckpointStore): Optional checkpoint store for compress.py's input hashes.
+        concurrency (int): Write requests in flight.
+        build_compressed (bool): Build the applicants' Compressed JSON from the file.
+
+    Returns:
+        dict: Table name -> counts from importTable().
+
+    Function:
+        This function loads the file into a local replica (one line at a time), creates the
+        tables the base is missing, and then writes the applicants, their child records and the
+        shortlisted leads, 10 records per request. Links are rewritten to the new applicant IDs.
+        Finally the Compressed JSON is built offline and written.
+    """
+
+    replica = Replica(state_path)
+    ids = IdMap(state_path)
+    try:
+        started = time.perf_counter()
+        loaded = replica.loadRecords(iterRecordFile(path))
+        logger.info(f"Loaded {path} in {time.perf_counter() - started:.1f}s ({sum(loaded.values())} records new or changed)")
+        createMissingTables()
+
+        models = {model.name: model for model in table_models()}
+        keys = merge_keys()
+        applicants = os.getenv('applicants_table_name')
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            # Applicants first: the other tables link to the IDs they get
+            results[applicants] = importTable(replica, ids, models[applicants], keys.get(applicants), executor,
+                                              omit_compressed=build_compressed)
+            # Then the others in the order of the applicants' link fields, which Airtable adds to
+            # Applicants as the first link of each table arrives, so the Compressed JSON keeps its key order
+            first = next(iter(replica.iterRecords(applicants)), {"fields": {}})
+            order = [name for name in first["fields"] if name in models]
+            for name in sorted([name for name in models if name != applicants],
+                               key=lambda name: order.index(name) if name in order else len(order)):
+                results[name] = importTable(replica, ids, models[name], keys.get(name), executor)
+
+        if build_compressed:
+            logger.info(f"Compressed JSON written for {compressImported(replica, ids, store)} applicants")
+        return results
+    finally:
+        ids.close()
+        replica.close()
+
+
+def runOffline(replica, stages, batch_size = 1000):
+
+    """
+    Args:
+        replica (Replica): Holds a base loaded from a file; results are written back to it.
+        stages (list): Stages to run, in pipeline order (OFFLINE_STAGES).
+        batch_size (int): Applicants per batch.
+
+    Returns:
+        None
+
+    Function:
+        This function runs compress and/or shortlist with the replica as both their source and,
+        through ReplicaBuffer, their write target, so nothing reaches Airtable. compress builds
+        the Compressed JSON of every applicant with child records; shortlist adds or updates
+        Shortlisted Leads for the applicants passing the rules of config.yaml.
+    """
+
+    applicants = os.getenv('applicants_table_name')
+    if "compress" in stages:
+        import compress
+        tables = compress.child_tables()
+        with ReplicaBuffer(replica, applicants) as buffer:
+            for page in batched(replica.iterRecords(applicants), batch_size):
+                batch, index = compressionBatch(replica, page, tables)
+                compress.compressBatch(batch, buffer, index, source=replica)
+
+    if "shortlist" in stages:
+        import shortlist
+        from utils.rulesEngine import RulesEngine
+        engine = RulesEngine(config(), shortlist.table_names())
+        shortlisted = shortlist.existingLeads(replica)
+        with ReplicaBuffer(replica, os.getenv('shortlisted_leads_table_name')) as leads:
+            for batch in batched(replica.getAllEntries(filled=True)['records'], batch_size):
+                shortlist.shortlistBatch(batch, engine, shortlisted, leads)
+
+
+if __name__ == "__main__":
+
+    loadEnv()
+    parser = argparse.ArgumentParser(description="Export the base to JSON lines, import such a file, or run stages on it offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Stream every table to a .jsonl or .jsonl.gz file")
+    export.add_argument("--output", required=True, help="File to write, e.g. backup.jsonl.gz")
+    export.add_argument("--tables", nargs="+", help="Tables to export (all by default)")
+    export.add_argument("--replica", action="store_true", help="Delta-sync the local SQLite replica and export from it")
+
+    load = commands.add_parser("import", help="Write the records of an exported file into the base")
+    load.add_argument("--input", required=True, help="File written by export")
+    load.add_argument("--state", default=os.getenv("import_state_path", "import_state.sqlite"),
+                      help="Progress file; rerun with the same one to resume an interrupted import")
+    load.add_argument("--concurrency", type=int, default=4, help="Write requests in flight")
+    load.add_argument("--no-compress", action="store_true", help="Keep the file's Compressed JSON instead of building it")
+
+    offline = commands.add_parser("offline", help="Run compress and/or shortlist on an exported file, without Airtable")
+    offline.add_argument("--input", required=True, help="File written by export")
+    offline.add_argument("--output", required=True, help="File to write the results to (the whole base)")
+    offline.add_argument("--stages", nargs="+", choices=OFFLINE_STAGES, default=OFFLINE_STAGES)
+    offline.add_argument("--state", help="SQLite file to load the base into (a temporary one by default)")
+
+    for command in (export, load, offline):
+        command.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                             help="Profile this run with cProfile and/or tracemalloc (results go to the metrics report)")
+    args = parser.parse_args()
+
+    with runMetrics(f"bulkTransfer-{args.command}", args.profile):
+        try:
+            if args.command == "export":
+                source = None
+                if args.replica:
+                    source = Replica(os.getenv("replica_path", "replica.sqlite"))
+                    source.sync()
+                counts = exportBase(args.output, args.tables, source)
+                logger.info(f"Exported {sum(counts.values())} records to {args.output}")
+
+            elif args.command == "import":
+                store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
+                try:
+                    importFile(args.input, args.state, store, args.concurrency, not args.no_compress)
+                finally:
+                    store.close()
+                logger.info(f"Imported {args.input}")
+
+            elif args.command == "offline":
+                workdir = None if args.state else tempfile.mkdtemp(prefix="hireeasy-offline-")
+                replica = Replica(args.state or os.path.join(workdir, "offline.sqlite"))
+                try:
+                    replica.loadRecords(iterRecordFile(args.input))
+                    runOffline(replica, [stage for stage in OFFLINE_STAGES if stage in args.stages])
+                    counts = exportBase(args.output, source=replica)
+                    logger.info(f"Wrote {sum(counts.values())} records to {args.output}")
+                finally:
+                    replica.close()
+                    if workdir:
+                        shutil.rmtree(workdir, ignore_errors=True)
+
+        except Exception as e:
+            logger.error(f"Error during {args.command}: {e}")
+        finally:
+            logRequestStats()
@@ -1,68 +1,251 @@
-from loggerConfig import setup_logger
+from loggerConfig import setup_logger, logContext
 from utils.airTableHelpers import *
+from utils.checkpoints import CheckpointStore
+from utils.jsonCodec import encode_json
+from utils.metrics import metrics, runMetrics
+from utils.replica import Replica
+from utils.settings import loadEnv
+import utils.airTableHelpers as airTableHelpers
+from itertools import islice
+import argparse
+import time
 import os
-from dotenv import load_dotenv
-load_dotenv()
 
 logger = setup_logger()
 
-def updateCompressedJSONforRecords(records):
+def child_tables():
+    return [os.getenv('personal_details_table_name'), os.getenv('salary_preferences_table_name'), os.getenv('work_experience_table_name')]
+
+
+def applicant_fields():
+    # Only the links are read; the Compressed JSON being replaced is the largest field of a row
+    return ['Applicant ID'] + child_tables()
+
+
+def buildCompressedJSON(fields, index, source = None):
 
     '''
     Args:
-        records (dict): Dictionary containing all records from the Applicants table.
-        
+        fields (dict): Fields of one Applicants record.
+        index (dict): Child table name -> {record ID -> fields} for the linked records.
+        source: Where missing records are read from (utils.airTableHelpers or a Replica).
+
     Returns:
-        None
-        
+        dict: The compressed JSON for the applicant.
+
     Function:
-        This function iterates through each record in the Applicants table, retrieves the relevant fields,
-        and compresses them into a JSON format. It then updates the 'Compressed JSON' field for each record.
+        This function assembles the compressed JSON of one applicant from already fetched child
+        records. Linked records missing from the index are fetched one by one as a fallback.
+    '''
+
+    compressed_json = {}
+
+    def child(record_id, table):
+        if record_id not in index.get(table, {}):
+            index.setdefault(table, {})[record_id] = (source or airTableHelpers).getRecordsById(record_id, table)['fields']
+        return index[table][record_id]
+
+    for key, value in fields.items():
+        if (key == 'Applicant ID'):
+            compressed_json[key] = value
+
+        elif (key == os.getenv('personal_details_table_name') or key == os.getenv('salary_preferences_table_name')):
+            personal_details = {}
+            for field, entry in child(value[0], key).items():
+                if field not in ['Salary Preference ID', 'Created By']:
+                    personal_details[field] = entry
+
+            compressed_json[key] = personal_details
+
+        elif (key == os.getenv('work_experience_table_name')):
+            work_experience = []
+            for id in value:
+                current_exp = {}
+                for field, entry in child(id, key).items():
+                    if field not in ['Experience ID', 'Created By']:
+                        current_exp[field] = entry
+
+                work_experience.append(current_exp)
+            compressed_json[key] = work_experience
+
+    return compressed_json
+
+
+def prefetchChildren(applicants, tables, source = None):
+
+    '''
+    Args:
+        applicants (list): A batch of Applicants records.
+        tables (list): Child table names whose linked records should be fetched.
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+
+    Returns:
+        dict: Child table name -> {record ID -> fields} for every record linked from the batch.
+
+    Function:
+        This function collects the linked IDs of a batch of applicants and fetches them with
+        chunked OR(RECORD_ID()=...) list requests.
+    '''
+
+    index = {}
+    for table in tables:
+        ids = [record_id for app in applicants for record_id in app['fields'].get(table, [])]
+        index[table] = (source or airTableHelpers).getRecordsByIds(ids, table) if ids else {}
+    return index
+
+
+def getChangedApplicants(since = None, source = None, fields = None):
+
+    '''
+    Args:
+        since (str): ISO 8601 watermark of the last successful run, or None for a full scan.
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+        fields (list): Applicants fields to return, e.g. applicant_fields(); all if None.
+
+    Returns:
+        dict: {'records': iterator} over the Applicants records to compress.
+
+    Function:
+        Without a watermark this returns the same records as before (Compressed JSON filled out).
+        With one, it returns applicants whose Applicant ID or child links were modified since the
+        watermark plus the parents of every child record modified since then, since editing a
+        child does not touch the parent row.
     '''
-    
-    for i in records['records']:
 
-        compressed_json = {}
-        logger.info(i['id'], i['fields'].get('Applicant ID', 'No ID'))
+    source = source or airTableHelpers
+    if since is None:
+        return source.getAllEntries(filled=True, fields=fields)
+
+    applicants_table = os.getenv('applicants_table_name')
+    # Only the inputs count: compress's own Compressed JSON writes and the LLM fields must not
+    # make an applicant look changed again
+    changed = {r['id'] for r in source.iterModified(applicants_table, since, fields=['Applicant ID'],
+                                                      watched=applicant_fields())}
+    for table in child_tables():
+        for child in source.iterModified(table, since, fields=['Applicant ID']):
+            changed.update(child['fields'].get('Applicant ID', []))
+
+    logger.info(f"{len(changed)} applicants changed since {since}")
+    return {"records": source.iterRecordsByIds(changed, applicants_table, fields)}
+
+
+def compressBatch(batch, buffer, index = None, run = None, source = None):
+
+    '''
+    Args:
+        batch (list): Applicants records.
+        buffer (RecordBuffer): Write buffer for the Applicants table.
+        index (dict): Optional child table index covering the whole base ('table' prefetch);
+                      without it the batch's linked child records are fetched.
+        run (StageRun): Optional checkpoint run; unchanged applicants are not written again.
+        source: Where child records are read from (utils.airTableHelpers or a Replica).
+
+    Returns:
+        list: The batch. Each compressed applicant's 'Compressed JSON' field holds the value that
+              was queued for writing, so later stages can use it without fetching it again.
+
+    Function:
+        Applicants without any linked child record are left alone, since rebuilding their JSON
+        would erase it; decompress.py backfills their child rows first.
+    '''
 
-        for key, value in i['fields'].items():
-            work = []
-            if (key == 'Applicant ID'):
-                compressed_json[key] = value
+    started = time.perf_counter()
+    tables = child_tables()
+    batch_index = index if index is not None else prefetchChildren(batch, tables, source)
 
-            elif (key == os.getenv('personal_details_table_name') or key == os.getenv('salary_preferences_table_name')):
-                details = getRecordsById(value[0], key)
-                personal_details = {}
-                for field, entry in details['fields'].items():
-                    if field not in ['Salary Preference ID', 'Created By']:
-                        personal_details[field] = entry
+    for i in batch:
+        if not any(i['fields'].get(table) for table in tables):
+            metrics.inc("stage_records_total", stage="compress", outcome="unlinked")
+            logger.debug("Skipping %s (%s): no linked child records", i['id'], i['fields'].get('Applicant ID', 'No ID'))
+            continue
+        with logContext(applicant=i['id']):
+            logger.debug("Compressing %s (%s)", i['id'], i['fields'].get('Applicant ID', 'No ID'))
+            data = buildCompressedJSON(i['fields'], batch_index, source)
+        with metrics.timer("json_encode_seconds"):
+            compressed_json = encode_json(data)
+        i['fields']['Compressed JSON'] = compressed_json
+        if run and not run.changed(i['id'], compressed_json):
+            metrics.inc("stage_records_total", stage="compress", outcome="unchanged")
+            continue
+        metrics.inc("stage_records_total", stage="compress", outcome="compressed")
+        buffer.update(i['id'], {'Compressed JSON': compressed_json})
 
-                compressed_json[key] = personal_details
-                
+    metrics.observe("stage_batch_seconds", time.perf_counter() - started, stage="compress")
+    return batch
 
-            elif (key == os.getenv('work_experience_table_name')):
-                work_experience = []
-                for id in value:
-                    work = getRecordsById(id, key)
 
-                    current_exp = {}
-                    for field, entry in work['fields'].items():
-                        if field not in ['Experience ID', 'Created By']:
-                            current_exp[field] = entry
+def finishRun(run, buffer):
+    if run and buffer.failed:
+        run.rollback(f"{buffer.failed} writes failed")
+    elif run:
+        run.commit()
 
-                    work_experience.append(current_exp)
-                compressed_json[key] = work_experience
-                
-        update_record(i['id'], os.getenv('applicants_table_name'), 'Compressed JSON', compressed_json)
+
+def updateCompressedJSONforRecords(records, prefetch = 'chunked', batch_size = 100, run = None, source = None):
+
+    '''
+    Args:
+        records (dict): Dictionary containing all records from the Applicants table.
+        prefetch (str): 'chunked' fetches the linked child records of each batch of applicants with
+                        OR(RECORD_ID()=...) formulas, so memory is bounded by the batch size.
+                        'table' lists every child table once up front, which is cheapest when the
+                        whole base fits in memory.
+        batch_size (int): Number of applicants per batch in 'chunked' mode.
+        run (StageRun): Optional checkpoint run; applicants whose compressed JSON is unchanged
+                        since the last committed run are not written again.
+        source: Where child records are read from (utils.airTableHelpers or a Replica).
+
+    Returns:
+        None
+
+    Function:
+        This function iterates through each record in the Applicants table, retrieves the relevant fields,
+        and compresses them into a JSON format. It then updates the 'Compressed JSON' field for each record,
+        encoded with utils/jsonCodec.py (compressed_json_format, zlib with a key dictionary by default).
+        Child records are fetched in bulk and assembled from an in-memory index rather than one GET
+        per linked record.
+    '''
+
+    index = {table: (source or airTableHelpers).getTableIndex(table) for table in child_tables()} if prefetch == 'table' else None
+    records = iter(records['records'])
+
+    with RecordBuffer(os.getenv('applicants_table_name')) as buffer:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            compressBatch(batch, buffer, index, run, source)
+
+    finishRun(run, buffer)
 
 
 if __name__ == "__main__":
 
+    loadEnv()
+    parser = argparse.ArgumentParser(description="Build the Compressed JSON field of Applicants.")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and rescan every applicant")
+    parser.add_argument("--replica", action="store_true", help="Delta-sync the local SQLite replica and read from it")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                        help="Profile this run with cProfile and/or tracemalloc (results go to the metrics report)")
+    args = parser.parse_args()
+
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
     logger.info("Starting compression of JSON for records...")
-    try:
-        records = getAllEntries(filled=True)
-        updateCompressedJSONforRecords(records)
-        logger.info("Compression completed successfully.")
+    with runMetrics("compress", args.profile):
+        try:
+            source = None
+            if args.replica:
+                source = Replica(os.getenv("replica_path", "replica.sqlite"))
+                source.sync()
+            run = store.begin("compress", full=args.full)
+            records = getChangedApplicants(run.since, source, applicant_fields())['records']
+            records = run.withRetries(records, lambda ids: (source or airTableHelpers).iterRecordsByIds(
+                ids, os.getenv('applicants_table_name'), applicant_fields()))
+            updateCompressedJSONforRecords({"records": records}, run=run, source=source)
+            logger.info("Compression completed successfully.")
 
-    except Exception as e:
-        logger.error(f"Error during compression: {e}")
\ No newline at end of file
+        except Exception as e:
+            logger.error(f"Error during compression: {e}")
+        finally:
+            store.close()
+            logRequestStats()
\ No newline at end of file
@@ -1,72 +1,228 @@
-from utils.airTableHelpers import getAllEntries, add_record
-from loggerConfig import setup_logger
-import json
+from utils.airTableHelpers import getAllEntries, getRecordsByIds, RecordBuffer, logRequestStats
+from utils.checkpoints import CheckpointStore
+from utils.jsonCodec import decode_json
+from utils.metrics import metrics, runMetrics
+from loggerConfig import setup_logger, logContext
+from utils.settings import loadEnv
+import argparse
+import hashlib
 import os
-from dotenv import load_dotenv
-load_dotenv()
 
 logger = setup_logger()
 
+
+def applicant_fields():
+    return ['Applicant ID', 'Compressed JSON', os.getenv('personal_details_table_name'),
+            os.getenv('salary_preferences_table_name'), os.getenv('work_experience_table_name')]
+
 def decompress_json(data):
 
     """
     Args:
-        data (str): Compressed JSON string.
+        data (str): Compressed JSON string, in any format of utils/jsonCodec.py.
 
     Returns:
         dict: Decompressed JSON object.
 
     Function:
         This function attempts to decompress a JSON string into a Python dictionary.
+        The format is detected from the value, so plain JSON written before the codec still works.
 
     """
     
     try:
-        return json.loads(data)
+        with metrics.timer("json_decode_seconds"):
+            return decode_json(data)
     
     except Exception as e:
-        logger.info("Decompression failed:", e)
+        metrics.inc("json_decode_failures_total")
+        logger.info(f"Decompression failed: {e}")
         return data
     
-def fillChildTables():
+def stable_id(*parts):
+
+    """
+    Args:
+        parts: Values identifying a child row, e.g. the applicant's record ID and a position.
+
+    Returns:
+        int: A 48-bit number derived from parts. It stands in for Salary Preference ID or
+             Experience ID when the compressed JSON has none, so a rerun upserts the same row.
+    """
+
+    digest = hashlib.sha256("/".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return int(digest[:12], 16)
+
+
+def merge_fields():
+
+    """
+    Returns:
+        dict: Child table name -> fields its rows are upserted on.
+    """
+
+    return {
+        os.getenv('personal_details_table_name'): ['Email'],
+        os.getenv('salary_preferences_table_name'): ['Salary Preference ID'],
+        os.getenv('work_experience_table_name'): ['Experience ID'],
+    }
+
+
+def missingChildRows(app, data):
+
+    """
+    Args:
+        app (dict): Applicants record.
+        data (dict): Its decompressed JSON.
+
+    Returns:
+        dict: Child table name -> rows still to be written, each linked to the applicant.
+              When fewer Work Experience rows are linked than the JSON lists (e.g. after a crash
+              halfway through an applicant), the linked rows are fetched and only the entries
+              without a row of the same Company, Title and Start are returned.
+    """
+
+    personal_details = os.getenv('personal_details_table_name')
+    salary_preferences = os.getenv('salary_preferences_table_name')
+    work_experience = os.getenv('work_experience_table_name')
+    link = {'Applicant ID': [app['id']]}
+
+    rows = {}
+    if data.get(personal_details) and personal_details not in app['fields']:
+        rows[personal_details] = [dict(data[personal_details], **link)]
+
+    if data.get(salary_preferences) and salary_preferences not in app['fields']:
+        row = dict(data[salary_preferences], **link)
+        row.setdefault('Salary Preference ID', stable_id(app['id'], salary_preferences))
+        rows[salary_preferences] = [row]
+
+    experiences = data.get(work_experience) or []
+    linked = app['fields'].get(work_experience, [])
+    if len(linked) < len(experiences):
+        identity = lambda we: (we.get('Company'), we.get('Title'), we.get('Start'))
+        existing = {identity(we) for we in getRecordsByIds(linked, work_experience).values()} if linked else set()
+        rows[work_experience] = []
+        for index, we in enumerate(experiences):
+            if identity(we) in existing:
+                continue
+            row = dict(we, **link)
+            row.setdefault('Experience ID', stable_id(app['id'], work_experience, index))
+            rows[work_experience].append(row)
+
+    return rows
+
+
+def backfillApplicant(app, buffers, merge_on, run = None):
 
     '''
     Args:
-        None
+        app (dict): Applicants record.
+        buffers (dict): Child table name -> RecordBuffer created with that table's merge fields.
+        merge_on (dict): Child table name -> merge fields, from merge_fields().
+        run (StageRun): Optional checkpoint run; applicants with unchanged inputs are skipped.
 
     Returns:
         None
 
     Function:
-        This function retrieves all applicants, decompresses their compressed JSON data,
-        and adds the relevant fields to the respective child tables if they do not exist.
+        This function queues an upsert for every child row of the applicant that is not linked yet.
+        Rows without a value for their merge fields (e.g. no Email) are added instead.
     '''
 
-    try:
-        applicants = getAllEntries(filled = True)
-        for app in applicants['records']:
-                compressed_data = app["fields"].get("Compressed JSON")
-                logger.info(f"Processing Applicant: {app['fields'].get('Applicant ID')}")
+    compressed_data = app["fields"].get("Compressed JSON")
+    linked = {table: len(app['fields'].get(table, [])) for table in buffers}
+    if run and not run.changed(app['id'], [compressed_data, linked]):
+        metrics.inc("stage_records_total", stage="decompress", outcome="unchanged")
+        return
+    with logContext(applicant=app['id']), metrics.timer("stage_record_seconds", stage="decompress"):
+        logger.debug("Processing Applicant: %s", app['fields'].get('Applicant ID'))
+        data = decompress_json(compressed_data)
+        missing = missingChildRows(app, data)
+        for table, rows in missing.items():
+            for row in rows:
+                if all(row.get(field) for field in merge_on[table]):
+                    buffers[table].upsert(row)
+                else:
+                    buffers[table].add(row)
+            linked[table] += len(rows)
+    metrics.inc("stage_records_total", stage="decompress", outcome="backfilled" if any(missing.values()) else "complete")
+    if run:
+        run.expect(app['id'], [compressed_data, linked])
+
+
+def fillChildTables(run = None, checkpoint_every = 500):
 
-                data = decompress_json(compressed_data)
+    '''
+    Args:
+        run (StageRun): Optional checkpoint run. Only applicants whose Compressed JSON was modified
+                        since the last committed run are listed, and applicants whose inputs are
+                        unchanged are skipped.
+        checkpoint_every (int): Applicants between partial checkpoints. The buffers are flushed
+                                and, if no write failed, the applicants so far are saved, so a
+                                crashed run resumes where it stopped.
 
-                if os.getenv('personal_details_table_name') not in app['fields']:
-                    add_record(os.getenv('personal_details_table_name'), data[os.getenv('personal_details_table_name')])
+    Returns:
+        None
 
-                if os.getenv('salary_preferences_table_name') not in app['fields']:
-                    add_record(os.getenv('salary_preferences_table_name'), data[os.getenv('salary_preferences_table_name')])
+    Function:
+        This function retrieves all applicants, decompresses their compressed JSON data,
+        and upserts the missing child rows into the respective child tables, linked to the
+        applicant through 'Applicant ID'. Rows are upserted 10 per request on merge_fields(),
+        so rerunning after a partial run does not create duplicates.
+    '''
 
-                if os.getenv('work_experience_table_name') not in app['fields']:
-                    for we in data[os.getenv('work_experience_table_name')]:
-                        add_record(os.getenv('work_experience_table_name'), we)
+    merge_on = merge_fields()
+    buffers = {table: RecordBuffer(table, merge_on=fields) for table, fields in merge_on.items()}
+
+    failed = False
+    checkpointed_failures = 0
+    try:
+        applicants = getAllEntries(filled = True, fields = applicant_fields(), modified_since = run.since if run else None,
+                                   modified_fields = ['Compressed JSON'])
+        for position, app in enumerate(applicants['records'], start=1):
+                backfillApplicant(app, buffers, merge_on, run)
+
+                if run and position % checkpoint_every == 0:
+                    for buffer in buffers.values():
+                        buffer.flush()
+                    write_failures = sum(buffer.failed for buffer in buffers.values())
+                    if write_failures == checkpointed_failures:
+                        run.checkpoint()
+                    else:
+                        # Which applicants failed is unknown, so none since the last checkpoint are saved
+                        run.rollback(f"{write_failures - checkpointed_failures} writes failed since the last checkpoint")
+                        checkpointed_failures = write_failures
 
     except Exception as e:
+        failed = True
         logger.info(f"Error processing applicants: {e}")
 
+    finally:
+        for buffer in buffers.values():
+            buffer.close()
+
+        write_failures = sum(buffer.failed for buffer in buffers.values())
+        if run and (failed or write_failures):
+            run.rollback(f"{write_failures} writes failed" if write_failures else "run aborted")
+        elif run:
+            run.commit()
+
 if __name__ == "__main__":
+    loadEnv()
+    parser = argparse.ArgumentParser(description="Backfill child tables from Compressed JSON.")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and rescan every applicant")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                        help="Profile this run with cProfile and/or tracemalloc (results go to the metrics report)")
+    args = parser.parse_args()
+
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
     logger.info("Starting to backfill child tables...")
-    try:
-        fillChildTables()
-        logger.info("Child tables filled successfully.")
-    except Exception as e:
-        logger.error(f"Error during filling child tables: {e}")
\ No newline at end of file
+    with runMetrics("decompress", args.profile):
+        try:
+            fillChildTables(store.begin("decompress", full=args.full))
+            logger.info("Child tables filled successfully.")
+        except Exception as e:
+            logger.error(f"Error during filling child tables: {e}")
+        finally:
+            store.close()
+            logRequestStats()
\ No newline at end of file
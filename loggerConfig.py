@@ -1,27 +1,250 @@
+from utils.settings import setting
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import threading
 import logging
+import atexit
+import queue
+import copy
+import json
+import os
+
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Fields attached to every record logged in the current thread / asyncio task, see logContext()
+_context = ContextVar("log_context", default={})
+_listeners = {}
+_setup_lock = threading.Lock()
+
+
+class ContextFilter(logging.Filter):
+
+    """
+    Copies the current logContext() fields onto the record. It runs on the QueueHandler, i.e. in
+    the thread or task that logged, before the record is handed to the listener thread.
+    """
+
+    def filter(self, record):
+        record.context = _context.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+
+    """
+    One JSON object per line: time, level, message, thread and process, plus the context fields
+    (e.g. stage, applicant) and the traceback if there is one.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "thread": record.threadName,
+            "process": record.process,
+        }
+        entry.update(getattr(record, "context", None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextQueueHandler(logging.Handler):
+
+    """
+    Queue handler that only merges the message arguments in the calling thread. The stock
+    QueueHandler runs the full formatter there and folds the traceback into the message; here the
+    traceback is kept in exc_text so the listener's formatters (text or JSON) lay it out.
+    """
+
+    def __init__(self, records):
+        super().__init__()
+        self.queue = records
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+@contextmanager
+def logContext(**fields):
+
+    """
+    Args:
+        **fields: Context fields, e.g. stage='shortlist', applicant='recXXXX'.
+
+    Yields:
+        None
+
+    Function:
+        Records logged inside the block carry these fields (in the JSON lines output). The fields
+        are kept in a ContextVar, so they follow the current thread or asyncio task and nest.
+    """
+
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _level(value, default):
+    if value is None or value == "":
+        return default
+    return int(value) if str(value).isdigit() else str(value).upper()
+
+
+class DeferredHandler(logging.Handler):
+
+    """
+    Placeholder installed by setup_logger(). The first record that reaches it reads the settings,
+    replaces it with the real queue handler and listener, and is then logged (or dropped if it
+    is below log_level). Importing a module therefore opens no file and starts no thread.
+    """
+
+    def __init__(self, name, log_file, level):
+        super().__init__()
+        self.logger_name = name
+        self.log_file = log_file
+        self.level_override = level
+
+    def handle(self, record):
+        logger = _configure(self.logger_name, self.log_file, self.level_override)
+        if record.levelno >= logger.getEffectiveLevel():
+            logger.handle(record)
+        return True
+
+
+def _fileHandler(log_file):
+
+    """
+    Args:
+        log_file (str): Log file path; '{pid}' is replaced by the process ID.
+
+    Returns:
+        logging.Handler: A time-based rotating handler if log_rotate_when is set (e.g. 'midnight'),
+                         otherwise a size-based one (log_max_bytes, 0 disables rotation).
+    """
+
+    from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+
+    log_file = log_file.format(pid=os.getpid())
+    if os.path.dirname(log_file):
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    backups = int(setting("log_backup_count", 5))
+    when = setting("log_rotate_when")
+    if when:
+        return TimedRotatingFileHandler(log_file, when=when, backupCount=backups, encoding="utf-8")
+    return RotatingFileHandler(log_file, maxBytes=int(setting("log_max_bytes", 10 * 1024 * 1024)),
+                               backupCount=backups, encoding="utf-8")
+
+
+def _stopListeners():
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
+
+
+def _configure(name, log_file, level):
+
+    """
+    Args:
+        name (str): Logger name.
+        log_file (str): Log file, or None for the log_file setting.
+        level: Level, or None for the log_level setting.
+
+    Returns:
+        logging.Logger: The logger, with the queue handler and a running listener in place of
+                        its DeferredHandler (done once, by the first record).
+    """
+
+    from logging.handlers import QueueListener
+
+    with _setup_lock:
+        logger = logging.getLogger(name)
+        if name in _listeners:
+            return logger
+
+        log_file = setting("log_file", "app.log") if log_file is None else log_file
+        formatter = logging.Formatter(TEXT_FORMAT)
 
-def setup_logger(name='my_logger', log_file='app.log', level=logging.INFO):
-    logger = logging.getLogger(name)
-    
-    if not logger.handlers:  # Only add handlers once
-        # File handler
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(level)
-        
         # Console handler
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(level)
-        
-        # Formatter
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
+        console_handler.setLevel(_level(setting("log_console_level"), logging.NOTSET))
         console_handler.setFormatter(formatter)
-        
-        # Add handlers
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    
-    logger.setLevel(level)
-    return logger
+        handlers = [console_handler]
+
+        # File handler
+        if log_file:
+            file_handler = _fileHandler(log_file)
+            file_handler.setFormatter(JsonFormatter() if setting("log_format", "text").lower() == "json" else formatter)
+            handlers.append(file_handler)
+
+        records = queue.SimpleQueue()
+        queue_handler = ContextQueueHandler(records)
+        queue_handler.addFilter(ContextFilter())
+        for handler in list(logger.handlers):
+            if isinstance(handler, DeferredHandler):
+                logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+
+        listener = QueueListener(records, *handlers, respect_handler_level=True)
+        listener.start()
+        if not _listeners:
+            atexit.register(_stopListeners)
+        _listeners[name] = listener
+
+        logger.setLevel(_level(setting("log_level") if level is None else level, logging.INFO))
+        return logger
+
 
-logger = setup_logger()
\ No newline at end of file
+def setup_logger(name='my_logger', log_file=None, level=None):
+
+    """
+    Args:
+        name (str): Logger name.
+        log_file (str): Log file (log_file, default 'app.log'; empty logs to the console only).
+        level: Minimum level (log_level, default INFO). Calls below it return before any
+               formatting, so use %-style arguments for per-record debug lines.
+
+    Returns:
+        logging.Logger: A logger whose only handler is a QueueHandler.
+
+    Function:
+        Logging calls only put the record on an in-memory queue; a QueueListener thread formats
+        it and writes it to the console and the rotating log file, so worker threads and async
+        tasks never wait on the handler lock or on disk. The file gets JSON lines with
+        log_format=json. The listener is stopped (and the queue drained) at exit.
+
+        Nothing is set up at import time: the handlers, the file and the listener thread are
+        created when the first record is logged, from the settings at that moment.
+    """
+
+    logger = logging.getLogger(name)
+    with _setup_lock:
+        if not logger.handlers:  # Only add handlers once
+            logger.addHandler(DeferredHandler(name, log_file, level))
+            # Let records through until the first one configures the real level
+            logger.setLevel(logging.DEBUG if level is None else _level(level, logging.INFO))
+            # Avoid logger message duplication via root propagation
+            logger.propagate = False
+        elif level is not None:
+            logger.setLevel(_level(level, logging.INFO))
+    return logger
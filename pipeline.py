@@ -0,0 +1,406 @@
+from utils.airTableHelpers import RecordBuffer, logRequestStats
+from utils.checkpoints import CheckpointStore
+from utils.llmCache import LLMCache
+from utils.replica import Replica
+from utils.rulesEngine import RulesEngine
+from utils.metrics import runMetrics, profiled
+import utils.airTableHelpers as airTableHelpers
+from loggerConfig import setup_logger, logContext
+from utils.settings import config, loadEnv
+from itertools import islice
+import threading
+import argparse
+import asyncio
+import queue
+import time
+import os
+
+logger = setup_logger()
+
+STAGES = ["decompress", "compress", "shortlist", "summaryGeneration"]
+DONE = object()
+
+
+class StageStats:
+
+    """
+    Throughput counters of one pipeline stage. busy is the time spent working on batches;
+    the rest of the stage's wall time was spent waiting for input or for room downstream.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.records = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    def summary(self):
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        rate = self.records / wall if wall > 0 else 0.0
+        status = f", failed: {self.error}" if self.error else ""
+        return (f"{self.name}: {self.records} records in {self.batches} batches, {wall:.1f}s wall, "
+                f"{self.busy:.1f}s busy, {rate:.1f} records/s{status}")
+
+
+def applicantFields(stages):
+
+    """
+    Args:
+        stages (list): Selected stage names.
+
+    Returns:
+        list: The Applicants fields the stages read (each stage module's applicant_fields()).
+              Records flow through every selected stage, so the projection is their union.
+    """
+
+    import importlib
+    fields = []
+    for stage in stages:
+        fields += [field for field in importlib.import_module(stage).applicant_fields() if field not in fields]
+    return fields
+
+
+def listApplicants(runs, source = None):
+
+    """
+    Args:
+        runs (dict): Stage name -> StageRun (or None) of the selected stages.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
+
+    Returns:
+        iterator: The Applicants records, listed once for every stage. The oldest watermark of
+                  the selected stages is used (none if any stage has none), plus the retry sets
+                  of their runs; each stage then skips applicants whose inputs it has already processed.
+    """
+
+    source = source or airTableHelpers
+    watermarks = [run.since if run else None for run in runs.values()]
+    since = None if None in watermarks else min(watermarks)
+    fields = applicantFields(runs)
+    if "compress" in runs:
+        import compress
+        records = compress.getChangedApplicants(since, source, fields)['records']
+    else:
+        records = source.getAllEntries(filled = True, fields = fields, modified_since = since,
+                                       modified_fields = ['Compressed JSON'])['records']
+
+    def fetch(ids):
+        for app in source.iterRecordsByIds(ids, os.getenv('applicants_table_name'), fields):
+            if "compress" in runs or app['fields'].get('Compressed JSON'):
+                yield app
+
+    # Applicants a stage gave up on in an earlier run are listed again, whatever the watermark
+    for run in runs.values():
+        if run:
+            records = run.withRetries(records, fetch)
+    return records
+
+
+def finishStage(run, buffers, aborted = False):
+
+    """
+    Args:
+        run (StageRun): The stage's checkpoint run, or None.
+        buffers (list): The stage's RecordBuffers.
+        aborted (bool): True if the pipeline stopped early.
+
+    Returns:
+        None
+
+    Function:
+        This function flushes the stage's writes and commits its run. A stage that saw failed writes,
+        or did not see every applicant because the pipeline stopped early, is rolled back instead.
+    """
+
+    for buffer in buffers:
+        buffer.close()
+    failed = sum(buffer.failed for buffer in buffers)
+    if run and aborted:
+        run.rollback("pipeline stopped early")
+    elif run and failed:
+        run.rollback(f"{failed} writes failed")
+    elif run:
+        run.commit()
+
+
+def stageWorkers(stages, runs, source = None, concurrency = 1, timeout = 60, cache = None, refresh = False, ranker = None):
+
+    """
+    Args:
+        stages (list): Selected stage names, in pipeline order.
+        runs (dict): Stage name -> StageRun (or None).
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+        concurrency (int): LLM requests in flight; above 1 the asyncio evaluator is used.
+        timeout (float): Seconds allowed per LLM attempt in async mode.
+        cache (LLMCache): Optional LLM evaluation cache.
+        refresh (bool): Ignore cached LLM evaluations.
+        ranker (PreRanker): Optional local pre-ranking in front of the LLM. It needs every applicant
+                            to rank them together, so summaryGeneration then starts once the
+                            upstream stages are done.
+
+    Returns:
+        dict: Stage name -> (work, buffers). work(batch) processes a batch and returns it for the
+              next stage; buffers are the RecordBuffers finishStage flushes. summaryGeneration
+              instead gets consume(records), which evaluates a stream of records and finishes its own run.
+    """
+
+    # Stage modules are imported only for the selected stages, e.g. openai only with summaryGeneration
+    workers = {}
+
+    if "decompress" in stages:
+        import decompress
+        merge_on = decompress.merge_fields()
+        child_buffers = {table: RecordBuffer(table, merge_on=fields) for table, fields in merge_on.items()}
+
+        def backfill(batch):
+            for app in batch:
+                decompress.backfillApplicant(app, child_buffers, merge_on, runs["decompress"])
+            return batch
+
+        workers["decompress"] = (backfill, list(child_buffers.values()))
+
+    if "compress" in stages:
+        import compress
+        applicants_buffer = RecordBuffer(os.getenv('applicants_table_name'))
+        workers["compress"] = (
+            lambda batch: compress.compressBatch(batch, applicants_buffer, None, runs["compress"], source),
+            [applicants_buffer],
+        )
+
+    if "shortlist" in stages:
+        import shortlist
+        engine = RulesEngine(config(), shortlist.table_names())
+        shortlisted = {}
+        leads = RecordBuffer(os.getenv('shortlisted_leads_table_name'))
+        workers["shortlist"] = (
+            lambda batch: shortlist.shortlistBatch(batch, engine, shortlisted, leads, runs["shortlist"]),
+            [leads],
+        )
+
+    if "summaryGeneration" in stages:
+        import summaryGeneration
+        run = runs["summaryGeneration"]
+
+        def consume(records):
+            if concurrency > 1:
+                return asyncio.run(summaryGeneration.updateLLMFieldsForRecordsAsync(
+                    concurrency, timeout, cache, refresh, run, source, records, ranker=ranker))
+            return summaryGeneration.updateLLMFieldsForRecords(cache, refresh, run, source, records, ranker=ranker)
+
+        workers["summaryGeneration"] = consume
+
+    return workers
+
+
+def runStage(stats, work, inbox, outbox, abort):
+
+    """
+    Args:
+        stats (StageStats): Counters of this stage.
+        work: Function processing one batch and returning it.
+        inbox (queue.Queue): Batches from the previous stage, ended by DONE.
+        outbox (queue.Queue): Queue of the next stage, or None for the last stage.
+        abort (threading.Event): Set when any stage fails; the source stops listing and the
+                                 other stages stop working on the batches still queued.
+
+    Returns:
+        None
+
+    Function:
+        This function is the body of a stage thread. After an error it keeps draining its inbox,
+        so the stages before it never block on a full queue.
+    """
+
+    stats.started = time.perf_counter()
+    try:
+        for batch in iter(inbox.get, DONE):
+            if stats.error or abort.is_set():
+                continue
+            started = time.perf_counter()
+            try:
+                with logContext(stage=stats.name):
+                    batch = work(batch)
+            except Exception as e:
+                stats.error = str(e)
+                abort.set()
+                logger.error(f"Pipeline stage {stats.name} failed: {e}")
+                continue
+            stats.busy += time.perf_counter() - started
+            stats.records += len(batch)
+            stats.batches += 1
+            if outbox is not None:
+                outbox.put(batch)
+    finally:
+        stats.finished = time.perf_counter()
+        if outbox is not None:
+            outbox.put(DONE)
+
+
+def runPipeline(stages, store, source = None, full = False, batch_size = 100, queue_size = 4,
+                concurrency = 1, timeout = 60, cache = None, refresh = False, ranker = None):
+
+    """
+    Args:
+        stages (list): Stage names to run; they always run in the order of STAGES.
+        store (CheckpointStore): Checkpoints shared with the standalone scripts.
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+        full (bool): Ignore the watermarks and rescan every applicant.
+        batch_size (int): Applicants per batch flowing between stages.
+        queue_size (int): Batches a stage may have waiting before the previous stage blocks.
+        concurrency (int): LLM requests in flight for summaryGeneration.
+        timeout (float): Seconds allowed per LLM attempt in async mode.
+        cache (LLMCache): Optional LLM evaluation cache.
+        refresh (bool): Ignore cached LLM evaluations (and the summaryGeneration checkpoint).
+        ranker (PreRanker): Optional local pre-ranking; only the applicants it selects reach the LLM.
+
+    Returns:
+        list: StageStats of the source and of every stage.
+
+    Function:
+        This function lists the applicants once and streams them through the selected stages,
+        each running in its own thread and connected by bounded queues. A stage passes each
+        batch on as soon as it is done with it, with the fields it changed (e.g. the new
+        Compressed JSON) updated in place, so no stage fetches the applicants again.
+    """
+
+    stages = [stage for stage in STAGES if stage in stages]
+    runs = {stage: None if (stage == "summaryGeneration" and refresh) else store.begin(stage, full=full)
+            for stage in stages}
+    workers = stageWorkers(stages, runs, source, concurrency, timeout, cache, refresh, ranker)
+
+    abort = threading.Event()
+    source_stats = StageStats("fetch")
+    all_stats = [source_stats]
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    threads = []
+
+    for position, stage in enumerate(stages):
+        stats = StageStats(stage)
+        all_stats.append(stats)
+        inbox = queues[position]
+        outbox = queues[position + 1] if position + 1 < len(stages) else None
+
+        if stage == "summaryGeneration":
+            def consume(stats=stats, inbox=inbox):
+                stats.started = time.perf_counter()
+                exhausted = threading.Event()
+
+                def records():
+                    for batch in iter(inbox.get, DONE):
+                        stats.batches += 1
+                        for app in batch:
+                            stats.records += 1
+                            yield app
+                    exhausted.set()
+                    if abort.is_set():
+                        # Raising keeps the evaluator from committing a run that missed applicants
+                        raise RuntimeError("pipeline stopped early")
+                try:
+                    with logContext(stage=stats.name):
+                        workers["summaryGeneration"](records())
+                except Exception as e:
+                    stats.error = str(e)
+                    logger.error(f"Pipeline stage {stats.name} failed: {e}")
+                    abort.set()
+                    if not exhausted.is_set():
+                        for _ in iter(inbox.get, DONE):
+                            pass
+                finally:
+                    stats.finished = time.perf_counter()
+                    stats.busy = stats.finished - stats.started
+            target, args = consume, ()
+        else:
+            target, args = runStage, (stats, workers[stage][0], inbox, outbox, abort)
+        threads.append(threading.Thread(target=profiled(target), args=args, name=f"pipeline-{stage}", daemon=True))
+
+    for thread in threads:
+        thread.start()
+
+    source_stats.started = time.perf_counter()
+    try:
+        records = iter(listApplicants(runs, source))
+        while not abort.is_set():
+            started = time.perf_counter()
+            batch = list(islice(records, batch_size))
+            source_stats.busy += time.perf_counter() - started
+            if not batch:
+                break
+            source_stats.records += len(batch)
+            source_stats.batches += 1
+            queues[0].put(batch)
+    except Exception as e:
+        source_stats.error = str(e)
+        abort.set()
+        logger.error(f"Listing applicants failed: {e}")
+    finally:
+        source_stats.finished = time.perf_counter()
+        queues[0].put(DONE)
+        for thread in threads:
+            thread.join()
+
+    for stage in stages:
+        if stage != "summaryGeneration":
+            finishStage(runs[stage], workers[stage][1], abort.is_set())
+
+    logger.info("Pipeline throughput:")
+    for stats in all_stats:
+        logger.info("  " + stats.summary())
+    return all_stats
+
+
+if __name__ == "__main__":
+
+    loadEnv()
+    parser = argparse.ArgumentParser(description="Run the pipeline stages in one process, streaming each applicant through them.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=["compress", "shortlist", "summaryGeneration"],
+                        help="Stages to run (always in pipeline order)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Applicants per batch flowing between stages")
+    parser.add_argument("--queue-size", type=int, default=4, help="Batches buffered between two stages")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("llm_concurrency", 1)),
+                        help="LLM requests in flight; above 1 uses the asyncio evaluator")
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("llm_timeout", 60)),
+                        help="Seconds allowed per LLM attempt in async mode")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Only evaluate the K best pre-ranked applicants (overrides pre_rank.top_k in config.yaml)")
+    parser.add_argument("--min-score", type=float, default=None,
+                        help="Only evaluate applicants with at least this pre-rank score (overrides pre_rank.min_score)")
+    parser.add_argument("--no-prerank", action="store_true", help="Send every changed applicant to the LLM")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached LLM evaluations")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM cache")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermarks and rescan every applicant")
+    parser.add_argument("--replica", action="store_true", help="Delta-sync the local SQLite replica and read from it")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                        help="Profile this run with cProfile and/or tracemalloc (results go to the metrics report)")
+    args = parser.parse_args()
+
+    cache = None
+    if "summaryGeneration" in args.stages and not args.no_cache:
+        cache = LLMCache(os.getenv("llm_cache_path", "llm_cache.sqlite"),
+                         max_entries=int(os.getenv("llm_cache_max_entries", 100000)),
+                         max_age_days=float(os.getenv("llm_cache_max_age_days", 30)))
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
+    ranker = None
+    if "summaryGeneration" in args.stages and not args.no_prerank:
+        import summaryGeneration
+        ranker = summaryGeneration.configuredRanker(args.top_k, args.min_score)
+
+    logger.info(f"Starting pipeline: {' -> '.join(stage for stage in STAGES if stage in args.stages)}")
+    with runMetrics("pipeline", args.profile):
+        try:
+            source = None
+            if args.replica:
+                source = Replica(os.getenv("replica_path", "replica.sqlite"))
+                source.sync()
+            runPipeline(args.stages, store, source, args.full, args.batch_size, args.queue_size,
+                        args.concurrency, args.timeout, cache, args.refresh, ranker)
+            logger.info("Pipeline completed.")
+        except Exception as e:
+            logger.error(f"Error during pipeline run: {e}")
+        finally:
+            store.close()
+            if cache:
+                cache.close()
+            logRequestStats()
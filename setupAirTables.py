@@ -1,8 +1,8 @@
-from utils.dbModel import Applicants, PersonalDetails, WorkExperience, SalaryPreferences
+from utils.dbModel import createMissingTables
+from utils.airTableHelpers import refreshSchema
 from loggerConfig import setup_logger
-import os
-from dotenv import load_dotenv
-load_dotenv()
+from utils.settings import loadEnv
+import argparse
 logger = setup_logger()
 
 
@@ -13,43 +13,41 @@ def setup_airtables():
         None
     
     Returns:
-        None
+        dict: Table name -> table ID of every table of the application.
 
     Function:
-        This function sets up the Airtable structure for the application by creating the necessary tables:
+        This function sets up the Airtable structure for the application by creating the tables that are missing:
         - Applicants: Main table for applicants with fields for ID, compressed JSON, shortlist status, LLM summary, score, and follow-ups.
         - Personal Details: Linked to Applicants, contains full name, email, location, and LinkedIn profile.
         - Work Experience: Linked to Applicants, contains experience ID, company, title, start and end dates, and technologies.
         - Salary Preferences: Linked to Applicants, contains salary preference ID, preferred rate, and availability
+        - Shortlisted Leads: Linked to Applicants, holds the applicants that pass the shortlisting rules.
+        The base schema is read once, and the table/field IDs are cached locally (schema_cache_path).
     """
     
     try:
-        # Create Applicants table
-        applicants = Applicants()
-        logger.info(f"Created Applicants table with ID: {applicants.parent_id}")
-
-        # Create Personal Details table
-        PersonalDetails(applicants.parent_id)
-        logger.info(f"Created Personal Details table")
-
-        # Create Work Experience table
-        WorkExperience(applicants.parent_id)
-        logger.info(f"Created Work Experience table")
-
-        # Create Salary Preferences table
-        SalaryPreferences(applicants.parent_id)
-        logger.info(f"Created Salary Preferences table")
+        return createMissingTables()
 
     except Exception as e:
         logger.error(f"Error setting up Airtables: {e}")
+        return {}
 
 
 if __name__ == "__main__":
 
-    logger.info("Starting Airtable setup...")
+    loadEnv()
+    parser = argparse.ArgumentParser(description="Create the missing Airtable tables and cache the base schema.")
+    parser.add_argument("--schema-only", action="store_true",
+                        help="Only refresh the local table/field-ID cache, e.g. after editing fields in Airtable")
+    args = parser.parse_args()
+
     try:
-        setup_airtables()
-        logger.info("Airtable setup completed successfully.")
+        if args.schema_only:
+            logger.info(f"Cached the IDs of {len(refreshSchema())} tables")
+        else:
+            logger.info("Starting Airtable setup...")
+            setup_airtables()
+            logger.info("Airtable setup completed successfully.")
 
     except Exception as e:
-        logger.error(f"Error during Airtable setup: {e}")
\ No newline at end of file
+        logger.error(f"Error during Airtable setup: {e}")
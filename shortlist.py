@@ -1,50 +1,130 @@
-from utils.airTableHelpers import getAllEntries, add_record
+from utils.airTableHelpers import RecordBuffer, logRequestStats
+from utils.checkpoints import CheckpointStore
+from utils.rulesEngine import RulesEngine
+from utils.replica import Replica
+import utils.airTableHelpers as airTableHelpers
+from utils.experience import calculate_experience, batch_experience
 from decompress import decompress_json
-from loggerConfig import setup_logger
-from datetime import datetime
+from utils.metrics import metrics, runMetrics
+from loggerConfig import setup_logger, logContext
+from utils.settings import config, loadEnv
+from itertools import islice
 logger = setup_logger()
+import argparse
+import time
 import os
-from dotenv import load_dotenv
-load_dotenv()
-import yaml
+import numpy as np
 
-with open("config.yaml", "r") as f:
-    config = yaml.safe_load(f)
 
+def table_names():
+    return {
+        "work_experience": os.getenv('work_experience_table_name'),
+        "salary_preferences": os.getenv('salary_preferences_table_name'),
+        "personal_details": os.getenv('personal_details_table_name'),
+    }
 
-def calculate_experience(work_experiences):
+
+def applicant_fields():
+    return ['Applicant ID', 'Compressed JSON', os.getenv('shortlisted_leads_table_name')]
+
+
+def existingLeads(source = None):
 
     """
     Args:
-        work_experiences (list): List of work experience dictionaries.
-        
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+
     Returns:
-        float: Total years of experience rounded to 2 decimal places.
-        
+        dict: Applicants record ID -> Shortlisted Leads record ID.
+
     Function:
-        This function calculates the total years of experience from a list of work experience entries.
-        It sums the days between start and end dates for each entry and converts it to years.
+        This function lists the Applicant ID links of the whole Shortlisted Leads table. Applicants
+        records read from Airtable carry their lead in the inverse Shortlisted Leads link, which
+        shortlistBatch() uses; this scan is only for a local replica whose leads were added by
+        ReplicaBuffer, which does not maintain inverse links (bulkTransfer.py offline).
     """
 
-    total_days = 0
-    for exp in work_experiences:
-        start_str = exp.get("Start")
-        end_str = exp.get("End") or datetime.today().strftime("%Y-%m-%d") 
-        
-        if start_str and end_str:
-            start_date = datetime.strptime(start_str, "%Y-%m-%d")
-            end_date = datetime.strptime(end_str, "%Y-%m-%d")
-            total_days += (end_date - start_date).days
-    
-    total_years = total_days / 365
-    return round(total_years, 2)
+    leads = {}
+    for lead in (source or airTableHelpers).iterRecords(os.getenv('shortlisted_leads_table_name'), fields=['Applicant ID']):
+        for applicant_id in lead['fields'].get('Applicant ID', []):
+            leads[applicant_id] = lead['id']
+    return leads
 
 
-def shortlist_applicants():
+def shortlistBatch(batch, engine, shortlisted, leads, run = None):
 
     """
     Args:
-        None
+        batch (list): Applicants records.
+        engine (RulesEngine): Compiled shortlisting rules.
+        shortlisted (dict): Applicant record ID -> existing lead record ID, filled from the
+                            applicants' inverse Shortlisted Leads links; start from existingLeads()
+                            where those links are missing (offline replica), else from {}.
+        leads (RecordBuffer): Write buffer for the Shortlisted Leads table.
+        run (StageRun): Optional checkpoint run; applicants with unchanged inputs are skipped.
+
+    Returns:
+        list: The batch, unchanged, so it can be passed on to the next stage.
+
+    Function:
+        This function decompresses the batch, evaluates the rules on it as one columnar batch and
+        queues a lead for every applicant that passes.
+    """
+
+    started = time.perf_counter()
+    parsed = []
+    for app in batch:
+        # An applicant that is already shortlisted links to its lead, so no lookup of the leads table is needed
+        lead_ids = app["fields"].get(os.getenv('shortlisted_leads_table_name'))
+        if lead_ids:
+            shortlisted.setdefault(app['id'], lead_ids[0])
+        compressed_data = app["fields"].get("Compressed JSON")
+        if run and not run.changed(app['id'], [compressed_data, engine.config]):
+            metrics.inc("stage_records_total", stage="shortlist", outcome="unchanged")
+            continue
+        with logContext(applicant=app['id']):
+            logger.debug("Processing Applicant: %s", app['fields'].get('Applicant ID'))
+            parsed.append((app, decompress_json(compressed_data)))
+
+    if not parsed:
+        return batch
+
+    years = batch_experience([data.get(os.getenv('work_experience_table_name'), []) for _, data in parsed])
+    rows = [(app, engine.extract(data, float(total))) for (app, data), total in zip(parsed, years)]
+
+    with metrics.timer("rules_evaluate_seconds"):
+        passed, rule_masks = engine.evaluate(engine.columns([row for _, row in rows]))
+    metrics.inc("stage_records_total", int(passed.sum()), stage="shortlist", outcome="shortlisted")
+    metrics.inc("stage_records_total", len(rows) - int(passed.sum()), stage="shortlist", outcome="rejected")
+
+    for index in np.flatnonzero(passed):
+        app, row = rows[index]
+        logger.debug("Shortlisting Applicant: %s", app['fields'].get('Applicant ID'))
+
+        shortlisted_lead = {
+            "Applicant ID": [app['id']],
+            "Compressed JSON": app["fields"].get("Compressed JSON"),
+            "Score Reason": "; ".join(engine.explain(row, rule_masks, index)),
+        }
+        if app['id'] in shortlisted:
+            # The link is already in place; update_records would serialize the list
+            shortlisted_lead.pop("Applicant ID")
+            leads.update(shortlisted[app['id']], shortlisted_lead)
+        else:
+            leads.add(shortlisted_lead)
+
+    metrics.observe("stage_batch_seconds", time.perf_counter() - started, stage="shortlist")
+    return batch
+
+
+def shortlist_applicants(run = None, batch_size = 1000, source = None):
+
+    """
+    Args:
+        run (StageRun): Optional checkpoint run. Only applicants whose Compressed JSON changed since
+                        the last committed run are listed, and unchanged inputs are skipped.
+        batch_size (int): Number of applicants evaluated together as one columnar batch.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
         
     Returns:
         None
@@ -52,39 +132,53 @@ def shortlist_applicants():
     Function:
         This function retrieves all applicants from the Airtable, decompresses their JSON data,
         and checks if they meet the criteria for shortlisting based on experience, preferred rate,
-        availability, and location. If they do, it adds them to the 'Shortlisted Leads' table.
+        availability, and location. If they do, it adds them to the 'Shortlisted Leads' table,
+        or updates their existing lead if they were shortlisted before. The criteria are compiled
+        from config.yaml by RulesEngine and the rule-by-rule explanation becomes the Score Reason.
     """
     
-    applicants = getAllEntries(filled = True)
+    source = source or airTableHelpers
+    applicants = source.getAllEntries(filled = True, fields = applicant_fields(), modified_since = run.since if run else None,
+                                      modified_fields = ['Compressed JSON'])
+    shortlisted = {}
+    engine = RulesEngine(config(), table_names())
+    records = iter(applicants['records'])
 
-    for app in applicants['records']:
+    with RecordBuffer(os.getenv('shortlisted_leads_table_name')) as leads:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            shortlistBatch(batch, engine, shortlisted, leads, run)
 
-            compressed_data = app["fields"].get("Compressed JSON")
-            logger.info(f"Processing Applicant: {app['fields'].get('Applicant ID')}")
-            data = decompress_json(compressed_data)
-            work_experience = data.get(os.getenv('work_experience_table_name'), [])
-        
-            years = calculate_experience(work_experience)
-            
-            companies_worked = [we.get("Company") for we in work_experience]
-            if (years >= config['min_experience_years'] or any(company in config["tier_one_companies"] for company in companies_worked)):
-                if (data.get(os.getenv('salary_preferences_table_name'))['Preferred Rate']<= config['max_preferred_rate'] and data.get(os.getenv('salary_preferences_table_name'))['Availability'] >= config['min_hours_available']):
-                    if(data.get(os.getenv('personal_details_table_name'))['Location'] in config['location']):
-                            logger.info(f"Shortlisting Applicant: {app['fields'].get('Applicant ID')}")
-
-                            shortlisted_lead = {
-                                "Applicant ID": [app['id']],
-                                "Compressed JSON": compressed_data,
-                                "Score Reason": f"Location: {data.get(os.getenv('personal_details_table_name'))['Location']}, Total Experience: {years} years, Companies: {companies_worked}, Preferred Rate: {data.get(os.getenv('salary_preferences_table_name'))['Preferred Rate']}, Availability: {data.get(os.getenv('salary_preferences_table_name'))['Availability']}",
-                            }
-                            add_record(os.getenv('shortlisted_leads_table_name'), shortlisted_lead)
+    if run and leads.failed:
+        run.rollback(f"{leads.failed} writes failed")
+    elif run:
+        run.commit()
 
 
 if __name__ == "__main__":
+    loadEnv()
+
+    parser = argparse.ArgumentParser(description="Shortlist applicants into Shortlisted Leads.")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and rescan every applicant")
+    parser.add_argument("--replica", action="store_true", help="Delta-sync the local SQLite replica and read from it")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                        help="Profile this run with cProfile and/or tracemalloc (results go to the metrics report)")
+    args = parser.parse_args()
 
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
     logger.info("Starting applicant shortlisting...")
-    try:
-        shortlist_applicants()
-        logger.info("Shortlisting completed successfully.")
-    except Exception as e:
-        logger.error(f"Error during shortlisting: {e}")
\ No newline at end of file
+    with runMetrics("shortlist", args.profile):
+        try:
+            source = None
+            if args.replica:
+                source = Replica(os.getenv("replica_path", "replica.sqlite"))
+                source.sync()
+            shortlist_applicants(store.begin("shortlist", full=args.full), source=source)
+            logger.info("Shortlisting completed successfully.")
+        except Exception as e:
+            logger.error(f"Error during shortlisting: {e}")
+        finally:
+            store.close()
+            logRequestStats()
\ No newline at end of file
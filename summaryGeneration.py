@@ -1,29 +1,83 @@
-from openai import OpenAI
-from utils.airTableHelpers import getAllEntries, update_record
-from loggerConfig import setup_logger
+from utils.airTableHelpers import RecordBuffer, logRequestStats
+from utils.airTableClient import budgetLimiter
+from utils.metrics import metrics, runMetrics
+from utils.llmCache import LLMCache
+from utils.promptBuilder import build_messages, response_format, split_results
+from utils.llmBatch import OpenAIBatchClient, BatchWriter, waitForBatches, iterBatchResults
+from utils.jsonCodec import json_text, decode_json
+from utils.preRanker import PreRanker
+from utils.checkpoints import CheckpointStore
+from utils.replica import Replica
+from utils.settings import cached, setting, loadEnv, config, openai_client, async_openai_client
+import utils.airTableHelpers as airTableHelpers
+from loggerConfig import setup_logger, logContext
+from collections import deque
+import argparse
+import asyncio
+import sqlite3
 import time
 import json
 import os
-from dotenv import load_dotenv
-load_dotenv()
 
 logger = setup_logger()
 
 
-client = OpenAI(api_key= os.getenv("openai_api_key"))
+MODEL = "gpt-4o-mini"   # You can swap with "gpt-4o" or "gpt-3.5-turbo"
 
-def get_llm_output(input_text: str, max_retries: int) -> dict:
+
+def prompt_style():
+    # 'compact' sends only the scoring fields in short form after a fixed instruction prefix
+    # (utils/promptBuilder.py); 'full' sends build_prompt() with the whole Compressed JSON
+    return setting("llm_prompt", "compact")
+
+
+def pack_size_setting():
+    # Candidates evaluated per request; packed requests always use the compact form
+    return max(1, int(setting("llm_pack_size", 1)))
+
+
+@cached
+def llm_limiter():
+
+    """
+    Returns:
+        RateLimiter or None: The optional requests-per-second budget for the LLM (llm_rate_limit),
+                             shared by all workers through rate_budget_path. Built on first use.
+    """
+
+    llm_rate_limit = float(setting("llm_rate_limit", 0))
+    return budgetLimiter("openai", llm_rate_limit) if llm_rate_limit else None
+
+LLM_FIELDS = ['LLM Summary', 'LLM Score', 'LLM Follow-Ups']
+
+# Structured output schema; OpenAI enforces it when response_format is passed
+LLM_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "candidate_evaluation",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "LLM Summary": {"type": "string"},
+                "LLM Score": {"type": "integer"},
+                "LLM Follow-Ups": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": LLM_FIELDS,
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def build_prompt(input_text: str) -> str:
 
     """
     Args:
         input_text (str): Candidate text.
 
     Returns:
-        dict: Structured JSON with summary, score, and follow-ups.
-
-    Function:
-        This function queries the LLM with the input text and returns a structured JSON response.
-        It retries on failure up to max_retries times with exponential backoff.
+        str: The evaluation prompt sent to the LLM.
     """
 
     prompt = f"""
@@ -46,73 +100,951 @@ def get_llm_output(input_text: str, max_retries: int) -> dict:
       ]
     }}
     """
+    return prompt
+
+
+def validate_llm_output(payload) -> list:
+
+    """
+    Args:
+        payload: Parsed LLM output.
+
+    Returns:
+        list: Human-readable schema violations; empty when the payload is valid.
+
+    Function:
+        This function checks the payload against LLM_RESPONSE_FORMAT plus the ranges the
+        prompt asks for (score 1-10, a short list of follow-ups), which strict mode cannot express.
+    """
+
+    if not isinstance(payload, dict):
+        return ["response is not a JSON object"]
+
+    problems = []
+    summary = payload.get("LLM Summary")
+    if not isinstance(summary, str) or not summary.strip():
+        problems.append("'LLM Summary' must be a non-empty string")
+
+    score = payload.get("LLM Score")
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 1 <= score <= 10:
+        problems.append("'LLM Score' must be a number from 1 to 10")
+
+    follow_ups = payload.get("LLM Follow-Ups")
+    if not isinstance(follow_ups, list) or not 1 <= len(follow_ups) <= 5 or not all(isinstance(q, str) for q in follow_ups):
+        problems.append("'LLM Follow-Ups' must be a list of questions")
+
+    return problems
+
+
+def parse_llm_output(output_text: str):
+
+    """
+    Args:
+        output_text (str): Raw message content returned by the model.
+
+    Returns:
+        tuple: (payload, error). payload is the validated dict, or None with error describing why.
+    """
+
+    try:
+        payload = json.loads(output_text)
+    except Exception:
+        return None, "Invalid JSON from model"
+
+    problems = validate_llm_output(payload)
+    if problems:
+        return None, "Response does not match schema: " + "; ".join(problems)
+    return payload, None
+
+
+def parse_llm_outputs(output_text: str, count: int) -> list:
+
+    """
+    Args:
+        output_text (str): Raw message content of a request evaluating count candidates.
+        count (int): Candidates in the request.
+
+    Returns:
+        list: One (payload, error) tuple per candidate, in request order, as in parse_llm_output.
+    """
+
+    if count == 1:
+        return [parse_llm_output(output_text)]
+    try:
+        results = split_results(output_text, count)
+    except Exception:
+        return [(None, "Invalid JSON from model")] * count
+
+    parsed = []
+    for result in results:
+        problems = ["candidate missing from the results"] if result is None else validate_llm_output(result)
+        parsed.append((None, "Response does not match schema: " + "; ".join(problems)) if problems else (result, None))
+    return parsed
+
+
+def llm_request(prompt: str) -> dict:
+
+    """
+    Args:
+        prompt (str): The evaluation prompt.
+
+    Returns:
+        dict: Keyword arguments for chat.completions.create, shared by the sync and async paths.
+    """
+
+    return dict(
+        model = MODEL,
+        messages = [
+            {"role": "system", "content": "You are a helpful evaluator that outputs only JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature = 0.3,
+        max_tokens = 500,
+        response_format = LLM_RESPONSE_FORMAT,
+    )
+
+
+def evaluation_request(input_texts: list) -> dict:
+
+    """
+    Args:
+        input_texts (list): Candidates as JSON text; more than one packs them into one request.
+
+    Returns:
+        dict: Keyword arguments for chat.completions.create, shared by the sync, async and batch paths.
+    """
+
+    if prompt_style() == "full" and len(input_texts) == 1:
+        return llm_request(build_prompt(input_texts[0]))
+    return dict(
+        model = MODEL,
+        messages = build_messages(input_texts),
+        temperature = 0.3,
+        max_tokens = 500 if len(input_texts) == 1 else 300 * len(input_texts),
+        response_format = response_format(len(input_texts)),
+    )
+
+
+def recordUsage(response, elapsed: float, mode: str, candidates: int = 1):
+
+    """
+    Args:
+        response: A chat completion response.
+        elapsed (float): Seconds the request took.
+        mode (str): 'sync' or 'async'.
+        candidates (int): Candidates evaluated by the request.
+
+    Returns:
+        None
+
+    Function:
+        This function records the request latency and the prompt/completion tokens it used, in
+        total and per candidate, plus the prompt tokens served from the provider's prompt cache.
+    """
+
+    metrics.observe("llm_request_seconds", elapsed, model=MODEL, mode=mode)
+    metrics.inc("llm_candidates_total", candidates, model=MODEL, mode=mode)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.inc("llm_tokens_total", usage.prompt_tokens or 0, model=MODEL, kind="prompt")
+        metrics.inc("llm_tokens_total", usage.completion_tokens or 0, model=MODEL, kind="completion")
+        metrics.observe("llm_tokens_per_candidate", (usage.prompt_tokens or 0) / candidates, model=MODEL, kind="prompt")
+        metrics.observe("llm_tokens_per_candidate", (usage.completion_tokens or 0) / candidates, model=MODEL, kind="completion")
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if cached_tokens:
+            metrics.inc("llm_tokens_total", cached_tokens, model=MODEL, kind="cached_prompt")
+
+
+@cached
+def prompt_fingerprint() -> str:
+
+    """
+    Returns:
+        str: The request with a placeholder instead of the candidate, used in LLM cache keys so
+             that editing the prompt, schema or parameters invalidates cached evaluations.
+    """
+
+    # Packing is left out: how many candidates share a request does not change their evaluation
+    return json.dumps(evaluation_request(["{input_text}"]), sort_keys=True)
+
+
+def lookupCache(cache, app, refresh = False):
+
+    """
+    Args:
+        cache (LLMCache): The evaluation cache, or None when caching is disabled.
+        app (dict): Applicants record.
+        refresh (bool): If True, the cached payload is ignored (but the key is still returned).
+
+    Returns:
+        tuple: (key, payload). key is None without a cache; payload is None on a miss.
+    """
+
+    if cache is None:
+        return None, None
+    key = cache.key(app["fields"].get("Compressed JSON"), prompt_fingerprint(), MODEL)
+    if refresh:
+        return key, None
+    try:
+        return key, cache.get(key)
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache lookup failed, evaluating {app['id']} again: {e}")
+        return key, None
+
+
+def storeCache(cache, key, payload):
+
+    """
+    Args:
+        cache (LLMCache): The evaluation cache.
+        key (str): Cache key from lookupCache, or None when caching is disabled.
+        payload (dict): A validated LLM payload.
+
+    Returns:
+        None
+
+    Function:
+        This function saves an evaluation in the cache. A failing cache (e.g. a locked file) is
+        only logged, so the evaluation that was already paid for is still written to Airtable.
+    """
+
+    if not key:
+        return
+    try:
+        cache.put(key, payload)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not save LLM evaluation in the cache: {e}")
+
+
+def absorb_outputs(output_text: str, pending: list, outputs: list, errors: dict):
+
+    """
+    Args:
+        output_text (str): Raw message content of a request for the candidates in pending.
+        pending (list): Indexes of the candidates still without a valid payload; updated in place.
+        outputs (list): Payload per candidate; updated in place.
+        errors (dict): Last error per candidate index; updated in place.
+
+    Returns:
+        None
+    """
+
+    for index, (payload, error) in zip(list(pending), parse_llm_outputs(output_text, len(pending))):
+        if payload is not None:
+            outputs[index] = payload
+            pending.remove(index)
+        else:
+            errors[index] = error
+
+
+def get_llm_outputs(input_texts: list, max_retries: int) -> list:
+
+    """
+    Args:
+        input_texts (list): Candidates as JSON text, evaluated in one request.
+        max_retries (int): Maximum number of attempts.
+
+    Returns:
+        list: One dict per candidate, in order: the structured JSON with summary, score, and
+              follow-ups, or {"error": ..., "raw_output": ...} if no attempt produced a valid payload.
+
+    Function:
+        This function queries the LLM with all candidates in one request and returns on the first
+        attempt that yields a valid payload for each of them. Attempts are only repeated after a
+        transport error (with exponential backoff) or for the candidates whose output failed
+        schema validation; a transport error on the last attempt is raised unless some candidates
+        were already evaluated.
+    """
 
+    outputs = [None] * len(input_texts)
+    errors = {}
+    pending = list(range(len(input_texts)))
     output_text = ""
     for attempt in range(max_retries):
+        request = evaluation_request([input_texts[index] for index in pending])
+        limiter = llm_limiter()
         try:
-            response = client.chat.completions.create(
-            model = "gpt-4o-mini",   # You can swap with "gpt-4o" or "gpt-3.5-turbo"
-            messages = [
-                {"role": "system", "content": "You are a helpful evaluator that outputs only JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature = 0.3,
-            max_tokens = 500,
-            )
-
-            # Extract and parse response
-            output_text = response.choices[0].message.content.strip() # type: ignore
-            # return response.choices[0].message.content
+            if limiter:
+                limiter.acquire()
+            started = time.perf_counter()
+            response = openai_client().chat.completions.create(**request)
+            recordUsage(response, time.perf_counter() - started, "sync", len(pending))
+            output_text = (response.choices[0].message.content or "").strip()
+
         except Exception as e:
             logger.error(f"LLM call failed (attempt {attempt+1}): {e}")
+            metrics.inc("llm_retries_total" if attempt < max_retries - 1 else "llm_errors_total", reason="request")
             if attempt < max_retries - 1:
                 sleep_time = 2 ** attempt
+                if limiter and getattr(e, "status_code", None) == 429:
+                    limiter.block(sleep_time)
                 logger.info(f"Retrying in {sleep_time} seconds...")
                 time.sleep(sleep_time)
-            else:
+                continue
+            if len(pending) == len(input_texts):
                 raise e
+            errors.update({index: str(e) for index in pending})
+            break
 
+        absorb_outputs(output_text, pending, outputs, errors)
+        if not pending:
+            return outputs
+        logger.warning(f"{errors[pending[0]]} (attempt {attempt+1}, {len(pending)} of {len(input_texts)} candidates)")
+        metrics.inc("llm_retries_total" if attempt < max_retries - 1 else "llm_errors_total", reason="invalid_output")
 
-    try:
-        
-        return json.loads(output_text)
-    
-    except Exception as e:
-        return {"error": "Invalid JSON from model", "raw_output": output_text}
-    
+    for index in pending:
+        outputs[index] = {"error": errors.get(index) or "No response from model", "raw_output": output_text}
+    return outputs
 
-def updateLLMFieldsForRecords():
 
-    '''Update LLM fields for all records with Compressed JSON filled out.
+def get_llm_output(input_text: str, max_retries: int) -> dict:
+
+    """
     Args:
-        None
+        input_text (str): Candidate text.
+        max_retries (int): Maximum number of attempts.
+
+    Returns:
+        dict: Structured JSON with summary, score, and follow-ups, or
+              {"error": ..., "raw_output": ...} if no attempt produced a valid payload.
+
+    Function:
+        Single-candidate form of get_llm_outputs; a transport error on the last attempt is raised.
+    """
+
+    return get_llm_outputs([input_text], max_retries)[0]
+
+
+def queueLLMFields(buffer, app, openai_response) -> bool:
+
+    """
+    Args:
+        buffer (RecordBuffer): Write buffer for the Applicants table.
+        app (dict): The Applicants record that was evaluated.
+        openai_response (dict): Parsed LLM output.
+
+    Returns:
+        bool: False if the response was an error payload and nothing was queued.
+
+    Function:
+        This function queues every LLM field of the response as one batched update.
+    """
+
+    if "error" in openai_response:
+        logger.error(f"LLM evaluation failed for applicant {app['fields'].get('Applicant ID')}: "
+                     f"{openai_response['error']} - raw output: {openai_response.get('raw_output', '')[:200]!r}")
+        return False
+
+    updates = {field: openai_response[field] for field in LLM_FIELDS if field in openai_response}
+
+    # All LLM fields go out in one batched PATCH instead of one request per field
+    buffer.update(app['id'], updates)
+    logger.debug("Queued %s for applicant %s", ', '.join(updates), app['fields'].get('Applicant ID'))
+    return True
+
+
+def recordEvaluation(buffer, app, openai_response, stats, cached = False, run = None):
+
+    """
+    Args:
+        buffer (RecordBuffer): Write buffer for the Applicants table.
+        app (dict): The Applicants record that was evaluated.
+        openai_response (dict): Parsed LLM output.
+        stats (dict): Run counters, updated in place.
+        cached (bool): True if the payload came from the LLM cache.
+        run (StageRun): Optional checkpoint run; failed applicants are dropped from it so the
+                        next run retries them.
 
     Returns:
         None
 
+    Function:
+        This function counts the evaluation and queues its fields, unless the payload came from
+        the cache and the applicant's stored LLM Summary already matches it.
+    """
+
+    stats["processed"] += 1
+    if cached:
+        stats["cached"] += 1
+        if app["fields"].get("LLM Summary") == openai_response.get("LLM Summary"):
+            stats["unchanged"] += 1
+            metrics.inc("stage_records_total", stage="summaryGeneration", outcome="unchanged")
+            logger.debug("Applicant %s unchanged since last evaluation, skipping", app['fields'].get('Applicant ID'))
+            return
+
+    if not queueLLMFields(buffer, app, openai_response):
+        stats["failed"] += 1
+        metrics.inc("stage_records_total", stage="summaryGeneration", outcome="failed")
+        if run:
+            run.forget(app['id'])
+        return
+    metrics.inc("stage_records_total", stage="summaryGeneration", outcome="cached" if cached else "evaluated")
+
+
+def applicant_fields():
+    return ['Applicant ID', 'Compressed JSON', 'LLM Summary']
+
+
+def filledApplicants(source, record_ids, fields):
+
+    """
+    Args:
+        source: Where records are read from (utils.airTableHelpers or a Replica).
+        record_ids (list): Applicants record IDs, e.g. a checkpoint's retry set.
+        fields (list): Applicants fields to return.
+
+    Yields:
+        dict: The records that still exist and have Compressed JSON filled out.
+    """
+
+    for app in source.iterRecordsByIds(record_ids, os.getenv('applicants_table_name'), fields):
+        if app['fields'].get('Compressed JSON'):
+            yield app
+
+
+def changedApplicants(run = None, source = None, records = None):
+
+    """
+    Args:
+        run (StageRun): Optional checkpoint run.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
+        records (iterable): Applicants records already fetched by the caller (e.g. pipeline.py);
+                            if given, nothing is listed.
+
+    Returns:
+        iterator: Applicants records with Compressed JSON filled out. With a run, only those whose
+                  Compressed JSON was modified since the last committed run, or that an earlier
+                  run gave up on, and whose inputs (Compressed JSON, prompt and model) hash differently.
+    """
+
+    if records is None:
+        source = source or airTableHelpers
+        records = source.getAllEntries(filled = True, fields = applicant_fields(), modified_since = run.since if run else None,
+                                       modified_fields = ['Compressed JSON'])['records']
+        if run:
+            records = run.withRetries(records, lambda ids: filledApplicants(source, ids, applicant_fields()))
+    for app in records:
+        if run and not run.changed(app['id'], [app["fields"].get("Compressed JSON"), prompt_fingerprint(), MODEL]):
+            continue
+        yield app
+
+
+def preRankApplicants(records, ranker = None, run = None, stats = None):
+
+    """
+    Args:
+        records (iterable): Applicants about to be evaluated, e.g. from changedApplicants().
+        ranker (PreRanker): Local pre-ranking; None, or one without top_k and min_score, lets
+                            every applicant through unchanged.
+        run (StageRun): Optional checkpoint run; applicants that are held back are forgotten,
+                        which puts them in its retry set: every later run lists and scores
+                        them again, so lowering the cut-off evaluates them without --full.
+        stats (dict): Optional counters; 'ranked_out' counts the applicants held back.
+
+    Returns:
+        iterator: The selected applicants, best first.
+
+    Function:
+        This function collects and decodes the applicants, scores them together without any
+        network call (one TF-IDF index per run) and passes on only the top_k / min_score ones,
+        so applicants the shortlisting criteria would reject never cost an LLM call.
+    """
+
+    if ranker is None or not ranker.enabled:
+        yield from records
+        return
+
+    started = time.perf_counter()
+    applicants, data = [], []
+    for app in records:
+        applicants.append(app)
+        try:
+            decoded = decode_json(app["fields"].get("Compressed JSON"))
+        except Exception:
+            decoded = None
+        data.append(decoded if isinstance(decoded, dict) else {})
+
+    with metrics.timer("prerank_seconds"):
+        scored = ranker.score(data)
+        selected = ranker.select(scored)
+    scores = scored["score"]
+    del data
+
+    held_back = len(applicants) - len(selected)
+    metrics.inc("prerank_applicants_total", len(selected), outcome="selected")
+    metrics.inc("prerank_applicants_total", held_back, outcome="ranked_out")
+    if stats is not None:
+        stats["ranked_out"] += held_back
+    if run:
+        chosen = {int(index) for index in selected}
+        for index, app in enumerate(applicants):
+            if index not in chosen:
+                run.forget(app['id'])
+    cutoff = f", lowest selected score {scores[selected[-1]]:.3f}" if len(selected) else ""
+    logger.info(f"Pre-ranked {len(applicants)} applicants in {time.perf_counter() - started:.2f}s: "
+                f"{len(selected)} go to the LLM, {held_back} held back{cutoff}")
+
+    for index in selected:
+        yield applicants[index]
+
+
+def configuredRanker(top_k = None, min_score = None):
+
+    """
+    Args:
+        top_k (int): Overrides pre_rank.top_k of config.yaml.
+        min_score (float): Overrides pre_rank.min_score of config.yaml.
+
+    Returns:
+        PreRanker or None: The ranker from config.yaml, or None if it has no cut-off.
+    """
+
+    ranker = PreRanker(config(), top_k=top_k, min_score=min_score)
+    return ranker if ranker.enabled else None
+
+
+def finishRun(run, buffer):
+    if run and buffer.failed:
+        run.rollback(f"{buffer.failed} writes failed")
+    elif run:
+        run.commit()
+
+
+def new_stats():
+    return {"processed": 0, "cached": 0, "unchanged": 0, "failed": 0, "ranked_out": 0}
+
+
+def log_stats(stats):
+    logger.info(f"Evaluated {stats['processed']} applicants: {stats['cached']} from cache "
+                f"({stats['unchanged']} unchanged), {stats['failed']} failed, {stats['ranked_out']} ranked out")
+
+
+def updateLLMFieldsForRecords(cache = None, refresh = False, run = None, source = None, records = None, pack_size = None,
+                              ranker = None):
+
+    '''Update LLM fields for all records with Compressed JSON filled out.
+    Args:
+        cache (LLMCache): Optional evaluation cache; hits skip the LLM call.
+        refresh (bool): If True, every applicant is re-evaluated and the cache is overwritten.
+        run (StageRun): Optional checkpoint run; only changed applicants are evaluated.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
+        records (iterable): Optional applicants to evaluate instead of listing them.
+        pack_size (int): Applicants evaluated per LLM request (llm_pack_size, default 1, if None).
+        ranker (PreRanker): Optional local pre-ranking; only the applicants it selects are evaluated.
+
+    Returns:
+        dict: {'processed', 'cached', 'unchanged', 'failed', 'ranked_out'} counters.
+
     Function:
         This function retrieves all applicants, decompresses their compressed JSON data,
-        queries the LLM for summary, score, and follow-ups, and updates the respective fields'''
-    
-    applicants = getAllEntries(filled = True)
-    for app in applicants['records']:
-        compressed_data = app["fields"].get("Compressed JSON")
-        logger.info(f"Processing Applicant: {app['fields'].get('Applicant ID')}")
-        openai_response = get_llm_output(compressed_data, max_retries=3)
-        fields = ['LLM Summary', 'LLM Score', 'LLM Follow-Ups']
-        for field in fields:
-            try:
-                update_record(app['id'], os.getenv('applicants_table_name'), field, openai_response[field])
-                logger.info(f"Updated {field} for applicant {app['fields'].get('Applicant ID')}")
-
-            except KeyError:
-                logger.info(f"Field {field} not found in response for applicant {app['fields'].get('Applicant ID')}")
+        queries the LLM for summary, score, and follow-ups, and updates the respective fields.
+        Cache misses are sent pack_size at a time. Applicants whose evaluation failed are
+        counted and reported at the end.'''
+
+    pack_size = pack_size or pack_size_setting()
+    stats = new_stats()
+    pack = []
+
+    def evaluatePack():
+        started = time.perf_counter()
+        try:
+            with logContext(applicant=",".join(app['id'] for app, _ in pack)):
+                responses = get_llm_outputs([json_text(app["fields"].get("Compressed JSON")) for app, _ in pack], max_retries=3)
+        except Exception as e:
+            responses = [{"error": str(e)}] * len(pack)
+        elapsed = (time.perf_counter() - started) / len(pack)
+        for (app, key), openai_response in zip(pack, responses):
+            if "error" not in openai_response:
+                storeCache(cache, key, openai_response)
+            recordEvaluation(buffer, app, openai_response, stats, False, run)
+            metrics.observe("stage_record_seconds", elapsed, stage="summaryGeneration")
+        pack.clear()
+
+    with RecordBuffer(os.getenv('applicants_table_name')) as buffer:
+        for app in preRankApplicants(changedApplicants(run, source, records), ranker, run, stats):
+            logger.debug("Processing Applicant: %s", app['fields'].get('Applicant ID'))
+
+            key, openai_response = lookupCache(cache, app, refresh)
+            if openai_response is not None:
+                recordEvaluation(buffer, app, openai_response, stats, True, run)
+                continue
+            pack.append((app, key))
+            if len(pack) >= pack_size:
+                evaluatePack()
+        if pack:
+            evaluatePack()
+
+    # Failed writes count as failed applicants, so callers (e.g. worker.py) can retry them
+    stats["failed"] += buffer.failed
+    finishRun(run, buffer)
+    log_stats(stats)
+    return stats
+
+
+async def get_llm_outputs_async(async_client, input_texts: list, max_retries: int, timeout: float = 60) -> list:
+
+    """
+    Args:
+        async_client (AsyncOpenAI): Shared async OpenAI client.
+        input_texts (list): Candidates as JSON text, evaluated in one request.
+        max_retries (int): Maximum number of attempts.
+        timeout (float): Seconds allowed per attempt.
+
+    Returns:
+        list: Same as get_llm_outputs.
+
+    Function:
+        Async counterpart of get_llm_outputs. Each attempt is bounded by timeout and
+        backs off with asyncio.sleep, so other evaluations keep running meanwhile.
+    """
+
+    outputs = [None] * len(input_texts)
+    errors = {}
+    pending = list(range(len(input_texts)))
+    output_text = ""
+    for attempt in range(max_retries):
+        request = evaluation_request([input_texts[index] for index in pending])
+        limiter = llm_limiter()
+        try:
+            if limiter:
+                await asyncio.to_thread(limiter.acquire)
+            started = time.perf_counter()
+            response = await asyncio.wait_for(async_client.chat.completions.create(**request), timeout)
+            recordUsage(response, time.perf_counter() - started, "async", len(pending))
+            output_text = (response.choices[0].message.content or "").strip()
+
+        except Exception as e:
+            logger.error(f"LLM call failed (attempt {attempt+1}): {e!r}")
+            metrics.inc("llm_retries_total" if attempt < max_retries - 1 else "llm_errors_total", reason="request")
+            if attempt < max_retries - 1:
+                sleep_time = 2 ** attempt
+                if limiter and getattr(e, "status_code", None) == 429:
+                    limiter.block(sleep_time)
+                logger.info(f"Retrying in {sleep_time} seconds...")
+                await asyncio.sleep(sleep_time)
+                continue
+            if len(pending) == len(input_texts):
+                raise e
+            errors.update({index: repr(e) for index in pending})
+            break
+
+        absorb_outputs(output_text, pending, outputs, errors)
+        if not pending:
+            return outputs
+        logger.warning(f"{errors[pending[0]]} (attempt {attempt+1}, {len(pending)} of {len(input_texts)} candidates)")
+        metrics.inc("llm_retries_total" if attempt < max_retries - 1 else "llm_errors_total", reason="invalid_output")
+
+    for index in pending:
+        outputs[index] = {"error": errors.get(index) or "No response from model", "raw_output": output_text}
+    return outputs
+
+
+async def get_llm_output_async(async_client, input_text: str, max_retries: int, timeout: float = 60) -> dict:
+
+    """
+    Args:
+        async_client (AsyncOpenAI): Shared async OpenAI client.
+        input_text (str): Candidate text.
+        max_retries (int): Maximum number of attempts.
+        timeout (float): Seconds allowed per attempt.
+
+    Returns:
+        dict: Same as get_llm_output.
+    """
+
+    return (await get_llm_outputs_async(async_client, [input_text], max_retries, timeout))[0]
+
+
+async def evaluateApplicants(records, concurrency = 8, timeout = 60, max_retries = 3, on_result = None,
+                             cache = None, refresh = False, pack_size = None):
+
+    """
+    Args:
+        records (iterable): Applicants records with Compressed JSON filled out.
+        concurrency (int): Maximum number of LLM requests in flight.
+        timeout (float): Seconds allowed per LLM attempt.
+        max_retries (int): Maximum number of attempts per request.
+        on_result (callable): Called as on_result(app, response, cached) as soon as each
+                              evaluation completes, in completion order.
+        cache (LLMCache): Optional evaluation cache; hits never reach the model.
+        refresh (bool): If True, cached payloads are ignored and overwritten.
+        pack_size (int): Applicants evaluated per LLM request (llm_pack_size, default 1, if None).
+
+    Yields:
+        tuple: (app, response), in input order except that cache hits may overtake applicants
+               waiting for their pack to fill. response is the raised exception if every
+               attempt failed.
+
+    Function:
+        This async generator evaluates applicants concurrently, bounded by a semaphore. Records
+        are pulled from the (blocking) Airtable iterator in a worker thread and at most
+        2 * concurrency requests are held at a time, so memory stays flat on large tables.
+    """
+
+    pack_size = pack_size or pack_size_setting()
+    async_client = async_openai_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    records = iter(records)
+    window = deque()
+
+    async def evaluate(group):
+        # group: (app, cache key, cached payload or None); the misses go out as one request
+        started = time.perf_counter()
+        misses = [(app, key) for app, key, result in group if result is None]
+        outputs = []
+        if misses:
+            async with semaphore:
+                try:
+                    # Each task runs in its own copy of the context, so the field stays with this evaluation
+                    with logContext(applicant=",".join(app['id'] for app, _ in misses)):
+                        input_texts = [json_text(app["fields"].get("Compressed JSON")) for app, _ in misses]
+                        outputs = await get_llm_outputs_async(async_client, input_texts, max_retries, timeout)
+                except Exception as e:
+                    outputs = [e] * len(misses)
+            for (app, key), output in zip(misses, outputs):
+                if isinstance(output, dict) and "error" not in output:
+                    storeCache(cache, key, output)
+
+        outputs = iter(outputs)
+        done = []
+        elapsed = (time.perf_counter() - started) / len(group)
+        for app, key, result in group:
+            cached = result is not None
+            result = result if cached else next(outputs)
+            if on_result:
+                on_result(app, result, cached)
+            metrics.observe("stage_record_seconds", elapsed, stage="summaryGeneration")
+            done.append((app, result))
+        return done
+
+    try:
+        pack = []
+        while True:
+            app = await asyncio.to_thread(next, records, None)
+            if app is None:
+                break
+            key, result = lookupCache(cache, app, refresh)
+            if result is not None:
+                window.append(asyncio.create_task(evaluate([(app, key, result)])))
+            else:
+                pack.append((app, key, None))
+                if len(pack) < pack_size:
+                    continue
+                window.append(asyncio.create_task(evaluate(pack)))
+                pack = []
+            if len(window) >= 2 * concurrency:
+                for item in await window.popleft():
+                    yield item
+
+        if pack:
+            window.append(asyncio.create_task(evaluate(pack)))
+        while window:
+            for item in await window.popleft():
+                yield item
+
+    finally:
+        for task in window:
+            task.cancel()
+        await async_client.close()
+
+
+async def updateLLMFieldsForRecordsAsync(concurrency = 8, timeout = 60, cache = None, refresh = False, run = None, source = None,
+                                         records = None, pack_size = None, ranker = None):
+
+    '''
+    Args:
+        concurrency (int): Maximum number of LLM requests in flight.
+        timeout (float): Seconds allowed per LLM attempt.
+        cache (LLMCache): Optional evaluation cache; hits skip the LLM call.
+        refresh (bool): If True, every applicant is re-evaluated and the cache is overwritten.
+        run (StageRun): Optional checkpoint run; only changed applicants are evaluated.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
+        records (iterable): Optional applicants to evaluate instead of listing them.
+        pack_size (int): Applicants evaluated per LLM request (llm_pack_size, default 1, if None).
+        ranker (PreRanker): Optional local pre-ranking; only the applicants it selects are evaluated.
+
+    Returns:
+        dict: {'processed', 'cached', 'unchanged', 'failed', 'ranked_out'} counters.
+
+    Function:
+        Async counterpart of updateLLMFieldsForRecords. Wall time scales with
+        applicants / concurrency instead of the sum of all LLM latencies; each result is
+        queued for a batched Airtable write as soon as it arrives.
+    '''
+
+    stats = new_stats()
+
+    with RecordBuffer(os.getenv('applicants_table_name')) as buffer:
+
+        def on_result(app, openai_response, cached):
+            if isinstance(openai_response, Exception):
+                openai_response = {"error": str(openai_response)}
+            recordEvaluation(buffer, app, openai_response, stats, cached, run)
+
+        applicants = preRankApplicants(changedApplicants(run, source, records), ranker, run, stats)
+        async for _ in evaluateApplicants(applicants, concurrency, timeout, on_result=on_result,
+                                          cache=cache, refresh=refresh, pack_size=pack_size):
+            pass
+
+    # Failed writes count as failed applicants, so callers (e.g. worker.py) can retry them
+    stats["failed"] += buffer.failed
+    finishRun(run, buffer)
+    log_stats(stats)
+    return stats
+
+
+def updateLLMFieldsForRecordsBatch(batch_client = None, cache = None, refresh = False, run = None, source = None,
+                                   records = None, directory = "batches", batch_ids = None, poll_seconds = 60,
+                                   max_wait = None, ranker = None):
+
+    '''
+    Args:
+        batch_client: OpenAIBatchClient (default, on the shared OpenAI client) or a compatible stand-in.
+        cache (LLMCache): Optional evaluation cache; hits are written without going into the batch.
+        refresh (bool): If True, every applicant is re-evaluated and the cache is overwritten.
+        run (StageRun): Optional checkpoint run; only changed applicants are evaluated.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
+        records (iterable): Optional applicants to evaluate instead of listing them.
+        directory (str): Where the batch input, output and error files are kept.
+        batch_ids (list): Resume these already submitted batches instead of submitting new ones.
+        poll_seconds (float): Seconds between batch status checks.
+        max_wait (float): Give up waiting after this many seconds (None waits for the completion window).
+        ranker (PreRanker): Optional local pre-ranking; only the applicants it selects are submitted.
+
+    Returns:
+        dict: {'processed', 'cached', 'unchanged', 'failed', 'ranked_out'} counters.
+
+    Function:
+        Offline counterpart of updateLLMFieldsForRecords for backfills. The requests of all pending
+        applicants (built by evaluation_request, exactly as in get_llm_output) are written to JSONL files
+        and submitted to the Batch API, which is billed at a discount and not subject to the
+        per-request rate limits. When the batches are done, the result files are streamed from
+        disk, validated like interactive responses and written back through the batched buffer.
+        Applicants with an invalid or missing result count as failed and are retried on the next
+        run. If the wait times out, nothing is committed; rerun with the logged batch IDs.
+    '''
+
+    stats = new_stats()
+    batch_client = batch_client or OpenAIBatchClient(openai_client())
+    # Applicant record ID -> (Applicant ID, cache key) of everything sent to the model
+    pending = {}
+
+    with RecordBuffer(os.getenv('applicants_table_name')) as buffer:
+        with BatchWriter(directory, "summaryGeneration") as writer:
+            for app in preRankApplicants(changedApplicants(run, source, records), ranker, run, stats):
+                key, openai_response = lookupCache(cache, app, refresh)
+                if openai_response is not None:
+                    recordEvaluation(buffer, app, openai_response, stats, True, run)
+                    continue
+                pending[app['id']] = (app['fields'].get('Applicant ID'), key)
+                if not batch_ids:
+                    writer.add(app['id'], evaluation_request([json_text(app["fields"].get("Compressed JSON"))]))
+
+        if pending and not batch_ids:
+            batch_ids = [batch_client.submit(path, {"stage": "summaryGeneration"}) for path in writer.paths]
+            logger.info(f"Submitted {len(pending)} applicants in {len(batch_ids)} batches; "
+                        f"resume with --batch-id {' --batch-id '.join(batch_ids)}")
+        finished = waitForBatches(batch_client, batch_ids, poll_seconds, max_wait) if pending else {}
+
+        for batch_id, status in finished.items():
+            for kind in ("output", "error"):
+                file_id = status[f"{kind}_file_id"]
+                if not file_id:
+                    continue
+                path = batch_client.download(file_id, os.path.join(directory, f"{batch_id}-{kind}.jsonl"))
+                for record_id, body, error in iterBatchResults(path):
+                    # Results of applicants that were not selected this run (e.g. already written) are ignored
+                    if record_id not in pending:
+                        continue
+                    applicant_id, key = pending.pop(record_id)
+                    openai_response = {"error": error}
+                    if body is not None:
+                        usage = body.get("usage") or {}
+                        metrics.inc("llm_tokens_total", usage.get("prompt_tokens") or 0, model=MODEL, kind="prompt")
+                        metrics.inc("llm_tokens_total", usage.get("completion_tokens") or 0, model=MODEL, kind="completion")
+                        output_text = (((body.get("choices") or [{}])[0].get("message") or {}).get("content") or "").strip()
+                        payload, problem = parse_llm_output(output_text)
+                        openai_response = payload if payload is not None else {"error": problem, "raw_output": output_text}
+                        if payload is not None:
+                            storeCache(cache, key, payload)
+                    recordEvaluation(buffer, {"id": record_id, "fields": {"Applicant ID": applicant_id}},
+                                     openai_response, stats, False, run)
+
+        for record_id, (applicant_id, key) in pending.items():
+            recordEvaluation(buffer, {"id": record_id, "fields": {"Applicant ID": applicant_id}},
+                             {"error": "No batch result"}, stats, False, run)
+
+    # Failed writes count as failed applicants, so callers (e.g. worker.py) can retry them
+    stats["failed"] += buffer.failed
+    finishRun(run, buffer)
+    log_stats(stats)
+    return stats
+
 
 if __name__ == "__main__":
+    loadEnv()
     # Run the function to update LLM fields for all records
+    parser = argparse.ArgumentParser(description="Generate LLM summary, score and follow-ups for applicants.")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("llm_concurrency", 1)),
+                        help="LLM requests in flight; above 1 uses the asyncio pipeline")
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("llm_timeout", 60)),
+                        help="Seconds allowed per LLM attempt in async mode")
+    parser.add_argument("--pack", type=int, default=pack_size_setting(),
+                        help="Applicants evaluated per LLM request (not used in batch mode)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Evaluate offline through the Batch API and write the results when the batches finish")
+    parser.add_argument("--batch-id", action="append", dest="batch_ids",
+                        help="Resume a submitted batch instead of submitting new ones (repeatable; implies --batch)")
+    parser.add_argument("--batch-dir", default=os.getenv("llm_batch_dir", "batches"),
+                        help="Directory for the batch input, output and error files")
+    parser.add_argument("--poll", type=float, default=float(os.getenv("llm_batch_poll_seconds", 60)),
+                        help="Seconds between batch status checks")
+    parser.add_argument("--max-wait", type=float, default=None,
+                        help="Stop waiting for the batches after this many seconds (resume later with --batch-id)")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Only evaluate the K best pre-ranked applicants (overrides pre_rank.top_k in config.yaml)")
+    parser.add_argument("--min-score", type=float, default=None,
+                        help="Only evaluate applicants with at least this pre-rank score (overrides pre_rank.min_score)")
+    parser.add_argument("--no-prerank", action="store_true", help="Send every changed applicant to the LLM")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached evaluations and re-run every applicant through the LLM")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM cache")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and rescan every applicant")
+    parser.add_argument("--replica", action="store_true", help="Delta-sync the local SQLite replica and read from it")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                        help="Profile this run with cProfile and/or tracemalloc (results go to the metrics report)")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else LLMCache(os.getenv("llm_cache_path", "llm_cache.sqlite"),
+                                                max_entries=int(os.getenv("llm_cache_max_entries", 100000)),
+                                                max_age_days=float(os.getenv("llm_cache_max_age_days", 30)))
+
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
+    # --refresh re-evaluates everyone, so it also bypasses the watermark and input hashes
+    run = None if args.refresh else store.begin("summaryGeneration", full=args.full)
+    ranker = None if args.no_prerank else configuredRanker(args.top_k, args.min_score)
+
     logger.info("Starting LLM field updates...")
-    try:
-        updateLLMFieldsForRecords()
-        logger.info("LLM field updates completed successfully.")
-    except Exception as e:
-        logger.error(f"Error during LLM field updates: {e}")
\ No newline at end of file
+    with runMetrics("summaryGeneration", args.profile):
+        try:
+            source = None
+            if args.replica:
+                source = Replica(os.getenv("replica_path", "replica.sqlite"))
+                source.sync()
+            if args.batch or args.batch_ids:
+                updateLLMFieldsForRecordsBatch(None, cache, args.refresh, run, source, directory=args.batch_dir,
+                                               batch_ids=args.batch_ids, poll_seconds=args.poll, max_wait=args.max_wait,
+                                               ranker=ranker)
+            elif args.concurrency > 1:
+                asyncio.run(updateLLMFieldsForRecordsAsync(args.concurrency, args.timeout, cache, args.refresh, run, source,
+                                                           pack_size=args.pack, ranker=ranker))
+            else:
+                updateLLMFieldsForRecords(cache, args.refresh, run, source, pack_size=args.pack, ranker=ranker)
+            logger.info("LLM field updates completed successfully.")
+        except Exception as e:
+            logger.error(f"Error during LLM field updates: {e}")
+        finally:
+            store.close()
+            if cache:
+                cache.close()
+            logRequestStats()
\ No newline at end of file
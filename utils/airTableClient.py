@@ -0,0 +1,407 @@
+from loggerConfig import setup_logger
+from utils.metrics import metrics
+from utils.settings import cached, setting
+from collections import defaultdict, deque
+from urllib.parse import urlparse, unquote
+import threading
+import sqlite3
+import random
+import time
+
+
+logger = setup_logger()
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+
+    """
+    Token bucket shared by every thread that talks to the same Airtable base.
+    Airtable allows 5 requests per second per base; going over that returns 429
+    and locks the base out for 30 seconds.
+    """
+
+    def __init__(self, rate=5.0, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+
+        """
+        Args:
+            None
+
+        Returns:
+            float: Seconds spent waiting for a token.
+
+        Function:
+            This function blocks until a token is available and consumes it.
+        """
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+    def block(self, seconds):
+
+        """
+        Args:
+            seconds (float): How long no request may be sent, e.g. after a 429.
+
+        Returns:
+            None
+        """
+
+        with self.lock:
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class SharedRateLimiter:
+
+    """
+    Token bucket kept in a SQLite file, so every process (and every machine mounting the
+    file) that uses the same bucket name shares one budget. Worker processes each get their
+    own client, and with per-process buckets N workers would send N times the base's limit.
+    A 429 seen by any of them blocks the bucket for all.
+
+    The file must be on a filesystem with working locks; rollback journaling (not WAL) is used
+    so it also works on network mounts. Clocks of machines sharing it should be in sync.
+    """
+
+    def __init__(self, path, name, rate=5.0, capacity=None):
+        self.path = path
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )""")
+
+
+    def _take(self, tokens_needed=1.0, penalty=None):
+
+        """
+        Args:
+            tokens_needed (float): Tokens to consume.
+            penalty (float): If given, block the bucket for this many seconds instead.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait before trying again.
+        """
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens, updated = row if row else (self.capacity, now)
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                delay = 0.0
+                if penalty is not None:
+                    tokens = min(tokens, 1 - penalty * self.rate)
+                elif tokens >= tokens_needed:
+                    tokens -= tokens_needed
+                else:
+                    delay = (tokens_needed - tokens) / self.rate
+                self.conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                                  (self.name, tokens, now))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return delay
+
+
+    def acquire(self):
+
+        """
+        Args:
+            None
+
+        Returns:
+            float: Seconds spent waiting for a token.
+
+        Function:
+            This function blocks until a token of the shared bucket is available and consumes it.
+        """
+
+        waited = 0.0
+        while True:
+            delay = self._take()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+    def block(self, seconds):
+        self._take(penalty=seconds)
+
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def budgetLimiter(name, rate, path=None):
+
+    """
+    Args:
+        name (str): Budget name, e.g. 'airtable:<base id>' or 'openai'.
+        rate (float): Requests per second of the budget.
+        path (str): SQLite file of the shared budget (rate_budget_path if None).
+
+    Returns:
+        RateLimiter or SharedRateLimiter: A per-process bucket, or a bucket shared through the
+                                          file when rate_budget_path is set.
+    """
+
+    path = path or setting("rate_budget_path")
+    if path:
+        return SharedRateLimiter(path, name, rate)
+    return RateLimiter(rate)
+
+
+class AirTableClient:
+
+    """
+    Pooled HTTP client used by every Airtable helper. One keep-alive session is
+    reused for all calls, requests go through a shared RateLimiter, and 429/5xx
+    responses or connection errors are retried with jittered exponential backoff
+    (honouring Retry-After when the server sends it). Per-endpoint latency is
+    recorded so slow calls can be spotted in the logs.
+    """
+
+    def __init__(self, rate=5.0, max_retries=5, backoff_base=0.5, backoff_max=30.0,
+                 lockout=30.0, pool_size=10, timeout=30.0, limiter=None):
+        self.limiter = limiter or RateLimiter(rate)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lockout = lockout
+        self.timeout = timeout
+
+        # requests is only imported once a client is built, not when the helpers are imported
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+        self.errors = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        self.connect_errors = (requests.exceptions.ConnectTimeout, urllib3.exceptions.NewConnectionError)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.latencies = defaultdict(lambda: deque(maxlen=1000))
+        self.counts = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.stats_lock = threading.Lock()
+
+
+    @staticmethod
+    def endpoint(method, url):
+
+        """
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+
+        Returns:
+            str: A low-cardinality endpoint name such as 'GET Applicants/{id}'.
+
+        Function:
+            This function strips base and record IDs from the URL so latencies can be grouped.
+        """
+
+        parts = [unquote(p) for p in urlparse(url).path.split("/") if p]
+        if len(parts) > 1 and parts[1] == "meta":
+            return f"{method} meta/{'/'.join(parts[4:]) or 'base'}"
+        if len(parts) > 3 and parts[1] == "bases":
+            return f"{method} {'/'.join(parts[3:4] + ['{id}'] * (len(parts) > 4) + parts[5:])}"
+        table = parts[2] if len(parts) > 2 else ""
+        return f"{method} {table}/{{id}}" if len(parts) > 3 else f"{method} {table}"
+
+
+    def _backoff(self, attempt, response=None):
+
+        """
+        Args:
+            attempt (int): Zero-based attempt number.
+            response (requests.Response): The failed response, if any.
+
+        Returns:
+            float: Seconds to wait before the next attempt.
+
+        Function:
+            This function honours Retry-After, falls back to Airtable's 30 second lockout for
+            429s, and otherwise uses full-jitter exponential backoff.
+        """
+
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+            if response.status_code == 429:
+                return self.lockout + random.uniform(0, 1)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+    def _unsent(self, error):
+
+        """
+        Args:
+            error (Exception): A connection error or timeout raised by the session.
+
+        Returns:
+            bool: True if the request never reached Airtable (no connection could be made).
+        """
+
+        if isinstance(error, self.connect_errors):
+            return True
+        # requests wraps urllib3's errors: ConnectionError(MaxRetryError(reason=NewConnectionError))
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, self.connect_errors)
+
+
+    def _record(self, endpoint, elapsed, status):
+        with self.stats_lock:
+            self.latencies[endpoint].append(elapsed)
+            self.counts[endpoint] += 1
+        metrics.observe("airtable_request_seconds", elapsed, endpoint=endpoint)
+        metrics.inc("airtable_requests_total", endpoint=endpoint, status=status)
+
+
+    def request(self, method, url, idempotent=None, **kwargs):
+
+        """
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            idempotent (bool): Whether sending the request twice is safe; by default everything
+                               but POST, which creates records, tables and webhooks.
+            **kwargs: Passed through to requests.Session.request.
+
+        Returns:
+            requests.Response: The final response (callers still decide whether to raise_for_status).
+
+        Function:
+            This function sends a rate-limited request over the pooled session and retries
+            transient failures. A request that is not idempotent may already have been applied
+            when it times out or gets a 5xx, so it is only retried on a 429 or when no
+            connection could be made; retrying it otherwise could create duplicates.
+        """
+
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint = self.endpoint(method, url)
+        idempotent = method != "POST" if idempotent is None else idempotent
+
+        for attempt in range(self.max_retries + 1):
+            metrics.observe("airtable_rate_limit_wait_seconds", self.limiter.acquire())
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except self.errors as e:
+                self._record(endpoint, time.perf_counter() - start, "error")
+                if attempt >= self.max_retries or not (idempotent or self._unsent(e)):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{endpoint} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                self._record(endpoint, time.perf_counter() - start, str(response.status_code))
+                retry = response.status_code in RETRY_STATUSES and (idempotent or response.status_code == 429)
+                if not retry or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                if response.status_code == 429:
+                    # The lockout applies to the whole base, so every thread (and worker) sharing the limiter waits
+                    self.limiter.block(delay)
+                logger.warning(f"{endpoint} returned {response.status_code}, retrying in {delay:.2f}s")
+
+            with self.stats_lock:
+                self.retries[endpoint] += 1
+            metrics.inc("airtable_retries_total", endpoint=endpoint)
+            metrics.observe("airtable_backoff_seconds", delay, endpoint=endpoint)
+            time.sleep(delay)
+
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, idempotent=None, **kwargs):
+        return self.request("POST", url, idempotent, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+    def latencyStats(self):
+
+        """
+        Args:
+            None
+
+        Returns:
+            dict: endpoint -> {'count', 'retries', 'mean', 'p50', 'p95', 'max'} (seconds).
+
+        Function:
+            This function summarises the recorded latencies per endpoint.
+        """
+
+        stats = {}
+        with self.stats_lock:
+            for endpoint, samples in self.latencies.items():
+                ordered = sorted(samples)
+                stats[endpoint] = {
+                    "count": self.counts[endpoint],
+                    "retries": self.retries[endpoint],
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": ordered[len(ordered) // 2],
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                }
+        return stats
+
+
+    def logLatencyStats(self):
+        for endpoint, s in sorted(self.latencyStats().items()):
+            logger.info(f"{endpoint}: {s['count']} calls, {s['retries']} retries, "
+                        f"mean {s['mean']*1000:.0f}ms, p95 {s['p95']*1000:.0f}ms, max {s['max']*1000:.0f}ms")
+
+
+@cached
+def sharedClient():
+
+    """
+    Returns:
+        AirTableClient: The client shared by every Airtable helper, built on first use from the
+                        current settings (airtable_base_id, airtable_rate_limit, rate_budget_path).
+                        settings.reset() makes the next call build a new one.
+    """
+
+    return AirTableClient(limiter=budgetLimiter(f"airtable:{setting('airtable_base_id')}",
+                                                float(setting("airtable_rate_limit", 5))))
@@ -1,17 +1,63 @@
 from loggerConfig import setup_logger
-from dotenv import load_dotenv
-import requests
+from utils.airTableClient import sharedClient
+from utils.metrics import metrics, timed
+from utils.schemaCache import SchemaCache
+from utils.settings import cached, setting
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import json
 import os
-load_dotenv()
 
-airtable_token = os.getenv("airtable_token")
-base_id = os.getenv("airtable_base_id")
-headers = {'Authorization': f'Bearer {airtable_token}', 'Content-Type': 'application/json'}
+batch_limit = 10  # Airtable accepts at most 10 records per create/update request
 
 
 logger = setup_logger()
 
+
+def _url(*path):
+
+    """
+    Args:
+        *path: Path segments after the API version, e.g. (table_name, record_id).
+
+    Returns:
+        str: URL of the configured base under airtable_api_url. The settings are read on each
+             call rather than at import, so a changed environment takes effect immediately.
+    """
+
+    api_url = setting("airtable_api_url", "https://api.airtable.com").rstrip("/")
+    return "/".join([f"{api_url}/v0/{setting('airtable_base_id')}", *path])
+
+
+def _headers():
+    return {'Authorization': f'Bearer {setting("airtable_token")}', 'Content-Type': 'application/json'}
+
+
+@cached
+def schemaCache():
+
+    """
+    Returns:
+        SchemaCache: Table and field IDs of the configured base from schema_cache_path
+                     (default schema_cache.json), loaded on first use.
+    """
+
+    return SchemaCache(setting("schema_cache_path", "schema_cache.json"), setting("airtable_base_id"))
+
+
+def refreshSchema():
+
+    """
+    Returns:
+        list: The base's tables, fetched once from the meta endpoint and stored in schemaCache().
+    """
+
+    tables = getTables()
+    schemaCache().update(tables)
+    return tables
+
+
+@timed("airtable_helper_seconds")
 def createAirTable(name, description, fields):
 
     """
@@ -28,7 +74,8 @@ def createAirTable(name, description, fields):
         It uses the AirTable API to create the table and returns the response.
     """
 
-    url = f"https://api.airtable.com/v0/meta/bases/{base_id}/tables"
+    api_url = setting("airtable_api_url", "https://api.airtable.com").rstrip("/")
+    url = f"{api_url}/v0/meta/bases/{setting('airtable_base_id')}/tables"
     # logger.info(url)
     data = {
         "name": name,
@@ -36,36 +83,213 @@ def createAirTable(name, description, fields):
         "fields": fields,
         
     }
-    response = requests.post(url, headers=headers, json=data)
+    response = sharedClient().post(url, headers=_headers(), json=data)
     return response.json()
 
 
-def getAllEntries(filled = False):
+def _listParams(formula=None, fields=None, sort=None, page_size=100, by_field_id=False):
 
     """
     Args:
-        filled (bool): If True, returns only records with Compressed JSON filled out.
-                       If False, returns all records.
+        formula (str): Optional filterByFormula expression.
+        fields (list): Optional list of field names (or IDs) to return (fields[] projection).
+        sort (list): Optional list of sort specs, either field names or dicts with 'field' and 'direction'.
+        page_size (int): Number of records per page (Airtable allows at most 100).
+        by_field_id (bool): Ask for the fields keyed by field ID (returnFieldsByFieldId).
 
     Returns:
-        dict: All entries from the Applicants table.
+        list: Query parameters as (key, value) tuples, ready to be passed to requests.
 
     Function:
-        This function retrieves all entries from the Applicants table in AirTable.
-        If filled is True, it filters the records to return only those with Compressed JSON filled out.
-        If filled is False, it returns all records regardless of the Compressed JSON field.  
+        This function builds the query string for the Airtable list records endpoint.
     """
 
-    formula = '{Compressed JSON} = ""' if not filled else '{Compressed JSON} != ""'
+    params = [("pageSize", min(max(int(page_size), 1), 100))]
+    if formula:
+        params.append(("filterByFormula", formula))
+    for field in fields or []:
+        params.append(("fields[]", field))
+    for index, spec in enumerate(sort or []):
+        if isinstance(spec, str):
+            spec = {"field": spec}
+        params.append((f"sort[{index}][field]", spec["field"]))
+        params.append((f"sort[{index}][direction]", spec.get("direction", "asc")))
+    if by_field_id:
+        params.append(("returnFieldsByFieldId", "true"))
+    return params
 
-    url = f"https://api.airtable.com/v0/{base_id}/{os.getenv('applicants_table_name')}?filterByFormula={formula}"
 
-    
-    response = requests.get(url, headers=headers)
+def _listPage(table_name, params, offset=None, names=None):
+
+    """
+    Args:
+        table_name (str): The name of the table to list.
+        params (list): Query parameters built by _listParams.
+        offset (str): The offset cursor returned by the previous page, if any.
+        names (dict): Field ID -> name, to key the fields of a returnFieldsByFieldId page by name again.
+
+    Returns:
+        dict: One page of the list response ('records' and, if more pages exist, 'offset').
+
+    Function:
+        This function fetches a single page of records from a table in AirTable.
+    """
+
+    url = _url(table_name)
+    page_params = list(params)
+    if offset:
+        page_params.append(("offset", offset))
+
+    response = sharedClient().get(url, headers=_headers(), params=page_params)
+    response.raise_for_status()
+    page = response.json()
+    if names:
+        for record in page.get("records", []):
+            record["fields"] = {names.get(key, key): value for key, value in record["fields"].items()}
+    metrics.inc("airtable_records_read_total", len(page.get("records", [])), table=table_name)
+    return page
+
+
+def iterPages(table_name, formula=None, fields=None, sort=None, page_size=100, prefetch=True):
+
+    """
+    Args:
+        table_name (str): The name of the table to list.
+        formula (str): Optional filterByFormula expression.
+        fields (list): Optional list of field names to return.
+        sort (list): Optional list of sort specs (field names or {'field', 'direction'} dicts).
+        page_size (int): Number of records per page (max 100).
+        prefetch (bool): If True, the next page is requested in the background while
+                         the caller works on the current one.
+
+    Yields:
+        list: The records of each page, in order.
+
+    Function:
+        This generator follows Airtable's offset cursor until the table is exhausted, so only
+        one page (two with prefetch) is held in memory at a time.
+
+        When the table is in schemaCache(), a projection is requested by field ID
+        (returnFieldsByFieldId), so renaming a field in Airtable does not silently empty it;
+        the records still come back keyed by name. Fields the table does not have are left
+        out of the projection instead of failing the request. If the IDs are rejected, the
+        cache is refreshed and the projection is sent by name.
+    """
+
+    from requests.exceptions import HTTPError
+    known = schemaCache().fields(table_name) if fields else {}
+    if known and any(field in known for field in fields):
+        fields = [field for field in fields if field in known]
+    field_ids = [known[field] for field in fields] if known and all(field in known for field in fields) else None
+    names = dict(zip(field_ids, fields)) if field_ids else None
+    params = _listParams(formula, field_ids or fields, sort, page_size, by_field_id=bool(field_ids))
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    try:
+        try:
+            page = _listPage(table_name, params, names=names)
+        except HTTPError as e:
+            if not field_ids or e.response is None or e.response.status_code not in (404, 422):
+                raise
+            logger.warning(f"{table_name}: field IDs rejected ({e}), refreshing the schema cache")
+            refreshSchema()
+            names, params = None, _listParams(formula, fields, sort, page_size)
+            page = _listPage(table_name, params)
+        while True:
+            offset = page.get("offset")
+            pending = executor.submit(_listPage, table_name, params, offset, names) if (executor and offset) else None
+
+            yield page.get("records", [])
+
+            if not offset:
+                break
+            page = pending.result() if pending else _listPage(table_name, params, offset, names)
+
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    return response.json()
 
+def iterRecords(table_name, formula=None, fields=None, sort=None, page_size=100, prefetch=True):
 
+    """
+    Args:
+        Same as iterPages.
+
+    Yields:
+        dict: Each record of the table, one at a time.
+
+    Function:
+        This generator flattens iterPages into a stream of individual records.
+    """
+
+    for page in iterPages(table_name, formula, fields, sort, page_size, prefetch):
+        yield from page
+
+
+def modifiedSinceFormula(since, fields=None):
+
+    """
+    Args:
+        since (str): ISO 8601 timestamp (UTC).
+        fields (list): Optional field names; if given, only edits to these fields count.
+
+    Returns:
+        str: A formula matching records modified after since.
+    """
+
+    watched = ", ".join(f"{{{field}}}" for field in fields or [])
+    return f"IS_AFTER(LAST_MODIFIED_TIME({watched}), DATETIME_PARSE('{since}'))"
+
+
+def iterModified(table_name, since, fields=None, watched=None):
+
+    """
+    Args:
+        table_name (str): The name of the table to list.
+        since (str): ISO 8601 timestamp (UTC).
+        fields (list): Optional list of field names to return.
+        watched (list): Optional fields whose edits count as a modification (all fields if None).
+
+    Yields:
+        dict: Every record of the table modified after since.
+    """
+
+    return iterRecords(table_name, modifiedSinceFormula(since, watched), fields)
+
+
+def getAllEntries(filled = False, fields = None, sort = None, page_size = 100, prefetch = True,
+                  modified_since = None, modified_fields = None):
+
+    """
+    Args:
+        filled (bool): If True, returns only records with Compressed JSON filled out.
+                       If False, returns only records without Compressed JSON.
+        fields (list): Optional list of field names to return.
+        sort (list): Optional list of sort specs (field names or {'field', 'direction'} dicts).
+        page_size (int): Number of records per page (max 100).
+        prefetch (bool): If True, the next page is fetched while the current one is consumed.
+        modified_since (str): Optional ISO 8601 watermark; only records modified after it are returned.
+        modified_fields (list): Optional fields whose edits count as a modification (all fields if None).
+
+    Returns:
+        dict: {'records': iterator} over all matching entries of the Applicants table.
+
+    Function:
+        This function retrieves all entries from the Applicants table in AirTable, following
+        the offset cursor across pages. The records are streamed lazily, so existing loops over
+        applicants['records'] keep working while memory stays flat on large bases.
+    """
+
+    formula = '{Compressed JSON} = ""' if not filled else '{Compressed JSON} != ""'
+    if modified_since:
+        formula = f"AND({formula}, {modifiedSinceFormula(modified_since, modified_fields)})"
+
+    records = iterRecords(os.getenv('applicants_table_name'), formula, fields, sort, page_size, prefetch)
+    return {"records": records}
+
+
+@timed("airtable_helper_seconds")
 def getRecordsById(record_id, table_name):
 
     """
@@ -81,12 +305,78 @@ def getRecordsById(record_id, table_name):
         It uses the AirTable API to get the record and returns the response.
     """
 
-    url = f"https://api.airtable.com/v0/{base_id}/{table_name}/{record_id}"
-    response = requests.get(url, headers=headers)
+    url = _url(table_name, record_id)
+    response = sharedClient().get(url, headers=_headers())
     
     return response.json()
 
 
+def _chunks(items, size=batch_limit):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@timed("airtable_helper_seconds")
+def getRecordsByIds(record_ids, table_name, fields=None, chunk_size=50):
+
+    """
+    Args:
+        record_ids (iterable): The IDs of the records to retrieve.
+        table_name (str): The name of the table to retrieve the records from.
+        fields (list): Optional list of field names to return.
+        chunk_size (int): Number of IDs per OR(RECORD_ID()=...) formula, kept small enough for the URL.
+
+    Returns:
+        dict: Record ID -> fields for every record that was found.
+
+    Function:
+        This function fetches many records of one table with a handful of list requests instead
+        of one GET per record.
+    """
+
+    ids = list(dict.fromkeys(record_ids))
+    index = {}
+    for chunk in _chunks(ids, chunk_size):
+        formula = "OR(" + ",".join(f"RECORD_ID()='{record_id}'" for record_id in chunk) + ")"
+        for record in iterRecords(table_name, formula, fields, prefetch=False):
+            index[record['id']] = record['fields']
+    return index
+
+
+def iterRecordsByIds(record_ids, table_name, fields=None, chunk_size=50):
+
+    """
+    Args:
+        Same as getRecordsByIds.
+
+    Yields:
+        dict: Each record found, fetched chunk by chunk so only one chunk is held in memory.
+    """
+
+    for chunk in _chunks(list(dict.fromkeys(record_ids)), chunk_size):
+        for record_id, record_fields in getRecordsByIds(chunk, table_name, fields, chunk_size).items():
+            yield {"id": record_id, "fields": record_fields}
+
+
+@timed("airtable_helper_seconds")
+def getTableIndex(table_name, fields=None):
+
+    """
+    Args:
+        table_name (str): The name of the table to index.
+        fields (list): Optional list of field names to return.
+
+    Returns:
+        dict: Record ID -> fields for every record of the table.
+
+    Function:
+        This function lists a whole table once and indexes it by record ID.
+    """
+
+    return {record['id']: record['fields'] for record in iterRecords(table_name, fields=fields)}
+
+
+@timed("airtable_helper_seconds")
 def update_record(record_id, table_name, field, value):
 
     """
@@ -104,7 +394,7 @@ def update_record(record_id, table_name, field, value):
         It uses the AirTable API to update the record and returns the updated record.
     """
 
-    url = f"https://api.airtable.com/v0/{base_id}/{table_name}/{record_id}"
+    url = _url(table_name, record_id)
 
     if not (isinstance(value, str) or isinstance(value, int)):
         value = json.dumps(value) 
@@ -115,11 +405,12 @@ def update_record(record_id, table_name, field, value):
         }
     }
     
-    response = requests.patch(url, headers=headers, json=data)
+    response = sharedClient().patch(url, headers=_headers(), json=data)
     response.raise_for_status()
     return response.json()
 
 
+@timed("airtable_helper_seconds")
 def add_record(table_name, value):
 
     """
@@ -134,19 +425,347 @@ def add_record(table_name, value):
         This function adds a new record to a specified table in AirTable.
         It uses the AirTable API to create the record and returns the response.
     """
+    from requests.exceptions import RequestException
     try:
-        url = f"https://api.airtable.com/v0/{base_id}/{table_name}"        
-        response = requests.post(url, headers=headers, json={"fields" : value})
+        url = _url(table_name)
+        response = sharedClient().post(url, headers=_headers(), json={"fields" : value})
         response.raise_for_status()
         return response.json()
     
-    except requests.exceptions.RequestException as e:
+    except RequestException as e:
         logger.info(f"Error adding record to {table_name}: {e}")
         return None
 
 
+@timed("airtable_helper_seconds")
+def update_records(table_name, updates):
+
+    """
+    Args:
+        table_name (str): The name of the table containing the records.
+        updates (list): List of (record_id, fields) tuples. Several entries for the same
+                        record are merged into one update.
+
+    Returns:
+        list: The updated records returned by the AirTable API.
+
+    Function:
+        This function updates many fields on many records with one PATCH per 10 records.
+        Values that are not str/int/float/bool are serialized with json.dumps, as in update_record.
+    """
+
+    url = _url(table_name)
+
+    merged = {}
+    for record_id, fields in updates:
+        merged.setdefault(record_id, {}).update(fields)
+
+    records = []
+    for record_id, fields in merged.items():
+        for field, value in fields.items():
+            if not (value is None or isinstance(value, (str, int, float))):
+                fields[field] = json.dumps(value)
+        records.append({"id": record_id, "fields": fields})
+
+    updated = []
+    for chunk in _chunks(records):
+        response = sharedClient().patch(url, headers=_headers(), json={"records": chunk})
+        response.raise_for_status()
+        updated.extend(response.json().get("records", []))
+    return updated
+
+
+@timed("airtable_helper_seconds")
+def add_records(table_name, values):
+
+    """
+    Args:
+        table_name (str): The name of the table to add the records to.
+        values (list): List of field dictionaries, one per new record.
+
+    Returns:
+        list: The records created by the AirTable API. Chunks that fail are logged and skipped.
+
+    Function:
+        This function creates many records with one POST per 10 records.
+    """
+
+    from requests.exceptions import RequestException
+    url = _url(table_name)
+
+    created = []
+    for chunk in _chunks(list(values)):
+        try:
+            response = sharedClient().post(url, headers=_headers(), json={"records": [{"fields": value} for value in chunk]})
+            response.raise_for_status()
+            created.extend(response.json().get("records", []))
+
+        except RequestException as e:
+            logger.info(f"Error adding {len(chunk)} records to {table_name}: {e}")
+    return created
+
+
+@timed("airtable_helper_seconds")
+def upsert_records(table_name, values, merge_on):
+
+    """
+    Args:
+        table_name (str): The name of the table to upsert into.
+        values (list): List of field dictionaries, one per record.
+        merge_on (list): Field names (at most 3) that identify a record.
+
+    Returns:
+        list: The created or updated records returned by the AirTable API.
+
+    Function:
+        This function sends one PATCH with performUpsert per 10 records. Airtable updates the
+        record whose merge fields match and creates one otherwise, so repeating the call does
+        not create duplicates.
+    """
+
+    url = _url(table_name)
+
+    upserted = []
+    for chunk in _chunks(list(values)):
+        response = sharedClient().patch(url, headers=_headers(), json={"performUpsert": {"fieldsToMergeOn": list(merge_on)},
+                                                            "records": [{"fields": value} for value in chunk]})
+        response.raise_for_status()
+        upserted.extend(response.json().get("records", []))
+    return upserted
+
+
+class RecordBuffer:
+
+    """
+    Write-behind buffer for one table. update() and add() only queue the change;
+    full batches of 10 are sent by a background thread (in order) while the caller
+    keeps working, and the rest is sent on flush()/close(). Updates queued for the
+    same record before a flush are coalesced into a single record in the batch, and so
+    are upserts with the same merge field values.
+
+    Usage:
+        with RecordBuffer(os.getenv('applicants_table_name')) as buffer:
+            buffer.update(record_id, {"LLM Score": 8, "LLM Summary": "..."})
+
+        with RecordBuffer(os.getenv('personal_details_table_name'), merge_on=["Email"]) as buffer:
+            buffer.upsert({"Email": "...", "Full Name": "..."})
+    """
+
+    def __init__(self, table_name, batch_size=batch_limit, background=True, merge_on=None):
+        self.table_name = table_name
+        self.batch_size = min(batch_size, batch_limit)
+        self.merge_on = list(merge_on or [])
+        self.executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self.lock = threading.Lock()
+        self.pending_updates = {}
+        self.pending_upserts = {}
+        self.pending_adds = []
+        self.futures = []
+        self.written = 0
+        self.failed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+    def update(self, record_id, fields):
+        batch = None
+        with self.lock:
+            # A full batch is only sent once a new record arrives, so further
+            # fields for the records already queued still coalesce into it
+            if record_id not in self.pending_updates and len(self.pending_updates) >= self.batch_size:
+                batch, self.pending_updates = list(self.pending_updates.items()), {}
+            self.pending_updates.setdefault(record_id, {}).update(fields)
+        if batch:
+            self._submit(update_records, batch)
+
+
+    def add(self, fields):
+        with self.lock:
+            self.pending_adds.append(fields)
+            if len(self.pending_adds) < self.batch_size:
+                return
+            batch, self.pending_adds = self.pending_adds, []
+        self._submit(add_records, batch)
+
+
+    def upsert(self, fields):
+        if not self.merge_on:
+            raise ValueError(f"RecordBuffer for {self.table_name} has no merge_on fields to upsert on")
+        key = tuple(json.dumps(fields.get(field), sort_keys=True) for field in self.merge_on)
+        batch = None
+        with self.lock:
+            if key not in self.pending_upserts and len(self.pending_upserts) >= self.batch_size:
+                batch, self.pending_upserts = list(self.pending_upserts.values()), {}
+            self.pending_upserts.setdefault(key, {}).update(fields)
+        if batch:
+            self._submit(self._upsert_records, batch)
+
+
+    def _upsert_records(self, table_name, values):
+        return upsert_records(table_name, values, self.merge_on)
+
+
+    def _write(self, writer, batch):
+        try:
+            written = len(writer(self.table_name, batch))
+            self.written += written
+            self.failed += len(batch) - written
+            metrics.inc("airtable_records_written_total", written, table=self.table_name)
+            metrics.inc("airtable_records_failed_total", len(batch) - written, table=self.table_name)
+        except Exception as e:
+            self.failed += len(batch)
+            metrics.inc("airtable_records_failed_total", len(batch), table=self.table_name)
+            logger.error(f"Batched write of {len(batch)} records to {self.table_name} failed: {e}")
+
+
+    def _submit(self, writer, batch):
+        if self.executor is None:
+            self._write(writer, batch)
+            return
+        self.futures = [f for f in self.futures if not f.done()]
+        self.futures.append(self.executor.submit(self._write, writer, batch))
+
+
+    def flush(self):
+
+        """
+        Args:
+            None
+
+        Returns:
+            None
+
+        Function:
+            This function sends everything still queued and waits for in-flight batches to finish.
+        """
+
+        with self.lock:
+            updates, self.pending_updates = list(self.pending_updates.items()), {}
+            upserts, self.pending_upserts = list(self.pending_upserts.values()), {}
+            adds, self.pending_adds = self.pending_adds, []
+        if updates:
+            self._submit(update_records, updates)
+        if upserts:
+            self._submit(self._upsert_records, upserts)
+        if adds:
+            self._submit(add_records, adds)
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+
+    def close(self):
+        self.flush()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        logger.info(f"{self.table_name}: {self.written} records written, {self.failed} failed")
+
+
+def _webhookUrl(*path):
+    api_url = setting("airtable_api_url", "https://api.airtable.com").rstrip("/")
+    return "/".join([f"{api_url}/v0/bases/{setting('airtable_base_id')}/webhooks", *path])
+
+
+@timed("airtable_helper_seconds")
+def getTables():
+
+    """
+    Returns:
+        list: Every table of the base with its 'id', 'name' and 'fields' (each with its 'id'),
+              from the meta tables endpoint.
+    """
+
+    api_url = setting("airtable_api_url", "https://api.airtable.com").rstrip("/")
+    response = sharedClient().get(f"{api_url}/v0/meta/bases/{setting('airtable_base_id')}/tables", headers=_headers())
+    response.raise_for_status()
+    return response.json().get("tables", [])
+
+
+@timed("airtable_helper_seconds")
+def createWebhook(notification_url, from_sources=None):
+
+    """
+    Args:
+        notification_url (str): Public URL Airtable pings when the base changes.
+        from_sources (list): Only report changes made from these sources, e.g. ['client',
+                             'formSubmission']; None reports every source.
+
+    Returns:
+        dict: The webhook's 'id', 'macSecretBase64' (to verify the pings) and 'expirationTime'.
+
+    Function:
+        This function registers a webhook for record changes in the base. recordChangeScope only
+        takes a single table, and the applicants' child tables matter too, so none is set and the
+        receiver picks the tables it cares about from each payload.
+    """
+
+    filters = {"dataTypes": ["tableData"]}
+    if from_sources:
+        filters["fromSources"] = list(from_sources)
+    data = {"notificationUrl": notification_url, "specification": {"options": {"filters": filters}}}
+    response = sharedClient().post(_webhookUrl(), headers=_headers(), json=data)
+    response.raise_for_status()
+    return response.json()
+
+
+@timed("airtable_helper_seconds")
+def listWebhookPayloads(webhook_id, cursor=None, limit=50):
+
+    """
+    Args:
+        webhook_id (str): Webhook ID.
+        cursor (int): Number of the first payload to return (the cursor of the previous call).
+        limit (int): Payloads per call (Airtable returns at most 50).
+
+    Returns:
+        dict: 'payloads', the 'cursor' to continue from and 'mightHaveMore'.
+    """
+
+    params = [("limit", limit)]
+    if cursor:
+        params.append(("cursor", cursor))
+    response = sharedClient().get(_webhookUrl(webhook_id, "payloads"), headers=_headers(), params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+@timed("airtable_helper_seconds")
+def refreshWebhook(webhook_id):
+
+    """
+    Args:
+        webhook_id (str): Webhook ID.
+
+    Returns:
+        dict: The new 'expirationTime'. Webhooks expire 7 days after creation or their last refresh.
+    """
+
+    response = sharedClient().post(_webhookUrl(webhook_id, "refresh"), idempotent=True, headers=_headers())
+    response.raise_for_status()
+    return response.json()
+
+
+@timed("airtable_helper_seconds")
+def deleteWebhook(webhook_id):
+    response = sharedClient().delete(_webhookUrl(webhook_id), headers=_headers())
+    response.raise_for_status()
 
 
+def logRequestStats():
 
+    """
+    Args:
+        None
 
+    Returns:
+        None
+
+    Function:
+        This function logs per-endpoint call counts, retries and latencies of the shared Airtable client.
+    """
 
+    sharedClient().logLatencyStats()
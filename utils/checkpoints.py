@@ -0,0 +1,309 @@
+from loggerConfig import setup_logger
+from utils.settings import setting
+from datetime import datetime, timedelta, timezone
+import threading
+import hashlib
+import sqlite3
+import json
+
+
+logger = setup_logger()
+
+
+class CheckpointStore:
+
+    """
+    Local SQLite store of per-stage watermarks and per-record input hashes. A stage asks for
+    its watermark to only list records modified since the last successful run, and checks each
+    record's input hash to skip records whose inputs did not change.
+
+    Usage:
+        store = CheckpointStore()
+        run = store.begin("shortlist", full=False)
+        for app in getAllEntries(filled=True, modified_since=run.since)['records']:
+            if not run.changed(app['id'], app['fields'].get('Compressed JSON')):
+                continue
+            ...
+        run.commit()
+
+    WAL is used unless sqlite_journal_mode says otherwise. WAL does not work on network
+    filesystems, so set sqlite_journal_mode=delete when checkpoint_path is on a shared mount.
+    """
+
+    def __init__(self, path="checkpoints.sqlite", journal_mode=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode or setting('sqlite_journal_mode', 'WAL')}")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS watermarks (stage TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS record_hashes (
+                stage TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (stage, record_id)
+            )""")
+        # Records a run had to give up on; the next run lists them again whatever the watermark
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS retry_records (
+                stage TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                PRIMARY KEY (stage, record_id)
+            )""")
+        self.conn.commit()
+
+
+    @staticmethod
+    def digest(value):
+
+        """
+        Args:
+            value: Any JSON-serializable input of a stage.
+
+        Returns:
+            str: SHA-256 hex digest of its canonical JSON.
+        """
+
+        canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+    def watermark(self, stage):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM watermarks WHERE stage = ?", (stage,)).fetchone()
+        return row[0] if row else None
+
+
+    def storedDigest(self, stage, record_id):
+        with self.lock:
+            row = self.conn.execute("SELECT digest FROM record_hashes WHERE stage = ? AND record_id = ?",
+                                    (stage, record_id)).fetchone()
+        return row[0] if row else None
+
+
+    def retryIds(self, stage):
+        with self.lock:
+            rows = self.conn.execute("SELECT record_id FROM retry_records WHERE stage = ?", (stage,)).fetchall()
+        return [row[0] for row in rows]
+
+
+    def save(self, stage, digests, watermark=None, forgotten=(), resolved=()):
+
+        """
+        Args:
+            stage (str): Stage name.
+            digests (dict): record_id -> digest to persist.
+            watermark (str): New watermark (ISO 8601), or None to keep the current one.
+            forgotten (iterable): Record IDs to list again next run, whatever the watermark.
+            resolved (iterable): Record IDs processed since, dropped from that retry set.
+
+        Returns:
+            None
+        """
+
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO record_hashes (stage, record_id, digest) VALUES (?, ?, ?)",
+                                  [(stage, record_id, digest) for record_id, digest in digests.items()])
+            self.conn.executemany("DELETE FROM retry_records WHERE stage = ? AND record_id = ?",
+                                  [(stage, record_id) for record_id in resolved])
+            self.conn.executemany("INSERT OR IGNORE INTO retry_records (stage, record_id) VALUES (?, ?)",
+                                  [(stage, record_id) for record_id in forgotten])
+            if watermark:
+                self.conn.execute("INSERT OR REPLACE INTO watermarks (stage, value) VALUES (?, ?)", (stage, watermark))
+            self.conn.commit()
+
+
+    def begin(self, stage, full=False, skew_seconds=60, watermark=True):
+
+        """
+        Args:
+            stage (str): Stage name, e.g. 'compress' or 'shortlist'.
+            full (bool): If True, the watermark is ignored and every record is listed again
+                         (input hashes still apply).
+            skew_seconds (int): Overlap subtracted from the run start, to absorb clock skew
+                                between this machine and Airtable.
+            watermark (bool): If False, commit() only saves input hashes and never moves the
+                              watermark; for queue workers, whose batches are not whole scans.
+
+        Returns:
+            StageRun: Tracks the run until commit().
+        """
+
+        run = StageRun(self, stage, None if full else self.watermark(stage), skew_seconds)
+        run.retry = self.retryIds(stage)
+        if not watermark:
+            run.started = None
+        return run
+
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class StageRun:
+
+    """
+    One run of a stage. changed() records the new input hashes in memory; they and the new
+    watermark are only persisted by commit(), so a failed run is simply repeated next time.
+    Records dropped with forget() go to the store's retry set, which withRetries() adds to
+    the next run's listing, since the watermark moves past them.
+    A StageRun without a store (store=None) treats every record as changed.
+    """
+
+    def __init__(self, store, stage, since=None, skew_seconds=60):
+        self.store = store
+        self.stage = stage
+        self.since = since
+        started = datetime.now(timezone.utc) - timedelta(seconds=skew_seconds)
+        self.started = started.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        self.pending = {}
+        self.retry = []
+        self.seen = set()
+        self.forgotten = set()
+        self.saved = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+
+    def changed(self, record_id, value):
+
+        """
+        Args:
+            record_id (str): Airtable record ID.
+            value: The record's inputs for this stage.
+
+        Returns:
+            bool: False if the inputs hash the same as in the last committed run.
+        """
+
+        if self.store is None:
+            return True
+
+        digest = self.store.digest(value)
+        with self.lock:
+            self.seen.add(record_id)
+            self.forgotten.discard(record_id)
+        if self.store.storedDigest(self.stage, record_id) == digest:
+            self.skipped += 1
+            return False
+        with self.lock:
+            self.pending[record_id] = digest
+        return True
+
+
+    def expect(self, record_id, value):
+
+        """
+        Args:
+            record_id (str): Airtable record ID.
+            value: The inputs the record will have once this run's writes have landed.
+
+        Returns:
+            None
+
+        Function:
+            For stages whose writes change their own inputs (decompress links child rows back
+            to the applicant), this replaces the pending hash so the next run sees no change.
+        """
+
+        if self.store is None:
+            return
+        with self.lock:
+            self.pending[record_id] = self.store.digest(value)
+
+
+    def forget(self, record_id):
+
+        """
+        Args:
+            record_id (str): Airtable record ID whose processing failed.
+
+        Returns:
+            None
+
+        Function:
+            This function drops the pending hash and puts the record in the retry set, so the
+            next run lists it again even though the watermark moves past it.
+        """
+
+        with self.lock:
+            self.pending.pop(record_id, None)
+            self.seen.discard(record_id)
+            self.forgotten.add(record_id)
+
+
+    def withRetries(self, records, fetch):
+
+        """
+        Args:
+            records (iterable): The records listed since the watermark.
+            fetch (callable): Record IDs -> iterable of records, e.g. a wrapped iterRecordsByIds.
+
+        Yields:
+            dict: The listed records, then the retry set's records that were not among them.
+                  A full scan already lists every record, so nothing is fetched then.
+        """
+
+        listed = set()
+        for record in records:
+            listed.add(record['id'])
+            yield record
+        missing = [record_id for record_id in self.retry if record_id not in listed]
+        if self.since is None or not missing:
+            return
+        logger.info(f"{self.stage}: retrying {len(missing)} records from earlier runs")
+        found = set()
+        for record in fetch(missing):
+            found.add(record['id'])
+            yield record
+        # Records deleted since they failed are dropped from the retry set
+        with self.lock:
+            self.seen.update(record_id for record_id in missing if record_id not in found)
+
+
+    def _flush(self, watermark=None):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            forgotten, self.forgotten = self.forgotten, set()
+            resolved, self.seen = self.seen, set()
+        self.store.save(self.stage, pending, watermark, forgotten, resolved)
+        return pending, forgotten
+
+
+    def checkpoint(self):
+
+        """
+        Args:
+            None
+
+        Returns:
+            None
+
+        Function:
+            This function persists the hashes recorded so far without moving the watermark.
+            Call it once the writes for those records are known to have succeeded; a run that
+            crashes later then resumes without redoing them.
+        """
+
+        if self.store is None:
+            return
+        pending, _ = self._flush()
+        with self.lock:
+            self.saved += len(pending)
+
+
+    def commit(self):
+        if self.store is None:
+            return
+        pending, forgotten = self._flush(self.started)
+        logger.info(f"{self.stage}: checkpoint saved ({self.saved + len(pending)} records changed, {self.skipped} unchanged, "
+                    f"{len(forgotten)} to retry)")
+
+
+    def rollback(self, reason):
+        with self.lock:
+            self.pending = {}
+            self.seen = set()
+            self.forgotten = set()
+        logger.warning(f"{self.stage}: checkpoint not saved ({reason}); the next run will retry")
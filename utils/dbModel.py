@@ -1,9 +1,7 @@
-from utils.airTableHelpers import createAirTable
+from utils.airTableHelpers import createAirTable, refreshSchema
 from loggerConfig import setup_logger
-import os
-
-from dotenv import load_dotenv
-load_dotenv()
+from utils.settings import setting
+from concurrent.futures import ThreadPoolExecutor
 
 
 logger = setup_logger()
@@ -11,8 +9,8 @@ logger = setup_logger()
 
 class Applicants:
 
-    def __init__(self):
-        self.name = os.getenv("applicants_table_name", "Applicants")
+    def __init__(self, create=True):
+        self.name = setting("applicants_table_name", "Applicants")
         self.description = "Table for applicants"
         self.fields = [
             {"name": "Applicant ID", "type": "email"},  
@@ -25,16 +23,18 @@ class Applicants:
             {"name": "LLM Score", "type": "number", "options": {"precision": 2}},
             {"name": "LLM Follow-Ups", "type": "multilineText"}
         ]
-        returned = createAirTable(self.name, self.description, self.fields)
-        logger.info(returned)
-        logger.info(returned.get('primaryFieldId', None))
-        self.parent_id = returned.get('id', None)
+        self.parent_id = None
+        if create:
+            returned = createAirTable(self.name, self.description, self.fields)
+            logger.info(returned)
+            logger.info(returned.get('primaryFieldId', None))
+            self.parent_id = returned.get('id', None)
 
 
 class PersonalDetails:
 
-    def __init__(self, parent_id):
-        self.name = os.getenv("personal_details_table_name", "Personal Details")
+    def __init__(self, parent_id=None, create=True):
+        self.name = setting("personal_details_table_name", "Personal Details")
         self.description = "Table for personal details"
         self.fields = [
             {"name": "Full Name", "type": "singleLineText"},
@@ -43,13 +43,14 @@ class PersonalDetails:
             {"name": "Location", "type": "multilineText"},
             {"name": "LinkedIn Profile", "type": "url"}
         ]
-        returned = createAirTable(self.name, self.description, self.fields)
-        logger.info(returned)
+        if create:
+            returned = createAirTable(self.name, self.description, self.fields)
+            logger.info(returned)
 
 class WorkExperience:
 
-    def __init__(self, parent_id):
-        self.name = os.getenv("work_experience_table_name", "Work Experience")
+    def __init__(self, parent_id=None, create=True):
+        self.name = setting("work_experience_table_name", "Work Experience")
         self.description = "Table for work experience"
         self.fields = [
             {"name": "Experience ID", "type": "number", "options": {"precision": 0}},
@@ -60,13 +61,14 @@ class WorkExperience:
             {"name": "End", "type": "date", "options": {"dateFormat": {"name": "local"} }},
             {"name": "Technologies", "type": "multilineText"}
         ]
-        returned = createAirTable(self.name, self.description, self.fields)
-        logger.info(returned)
+        if create:
+            returned = createAirTable(self.name, self.description, self.fields)
+            logger.info(returned)
 
 class SalaryPreferences:
 
-    def __init__(self, parent_id):
-        self.name = os.getenv("salary_preferences_table_name", "Salary Preferences")
+    def __init__(self, parent_id=None, create=True):
+        self.name = setting("salary_preferences_table_name", "Salary Preferences")
         self.description = "Table for salary preferences"
         self.fields = [
             {"name": "Salary Preference ID", "type": "number", "options": {"precision": 0}},
@@ -76,14 +78,15 @@ class SalaryPreferences:
             {"name": "Currency", "type": "singleLineText"},
             {"name": "Availability", "type": "singleLineText"}
         ]
-        returned = createAirTable(self.name, self.description, self.fields)
-        logger.info(returned)
+        if create:
+            returned = createAirTable(self.name, self.description, self.fields)
+            logger.info(returned)
 
 
 class ShortlistedLeads:
 
-    def __init__(self, parent_id):
-        self.name = os.getenv("shortlisted_leads_table_name", "Shortlisted Leads")
+    def __init__(self, parent_id=None, create=True):
+        self.name = setting("shortlisted_leads_table_name", "Shortlisted Leads")
         self.description = "Table for shortlisted leads"
         self.fields = [
             {"name": "Lead ID", "type": "number", "options": {"precision": 0}},
@@ -92,5 +95,66 @@ class ShortlistedLeads:
             {"name": "Score Reason", "type": "multilineText"},
             {"name": "Created At", "type": "dateTime", "options": {"timeZone" : "America/Toronto","dateFormat": {"name" : "local"}, "timeFormat": {"name" : "12hour"}}}  
         ]
-        returned = createAirTable(self.name, self.description, self.fields)
-        logger.info(returned)
\ No newline at end of file
+        if create:
+            returned = createAirTable(self.name, self.description, self.fields)
+            logger.info(returned)
+
+
+def table_models(parent_id=None):
+
+    """
+    Args:
+        parent_id (str): ID of the Applicants table, which the other tables link to.
+
+    Returns:
+        list: Definitions of every table (without creating anything in Airtable), for code that
+              needs the schema locally, e.g. the SQLite replica.
+    """
+
+    return [Applicants(create=False), PersonalDetails(parent_id, create=False), WorkExperience(parent_id, create=False),
+            SalaryPreferences(parent_id, create=False), ShortlistedLeads(parent_id, create=False)]
+
+
+def createMissingTables(concurrency=4):
+
+    """
+    Args:
+        concurrency (int): Tables created at the same time.
+
+    Returns:
+        dict: Table name -> ID of every table of table_models() that exists afterwards.
+
+    Function:
+        This function reads the base schema once and only creates the tables that are missing:
+        Applicants first, since the others link to it, then the rest concurrently. The schema is
+        read again at the end, with the inverse link fields Airtable added to Applicants, and
+        kept in the local table/field-ID cache (utils/schemaCache.py) for the helpers.
+    """
+
+    existing = {table["name"]: table["id"] for table in refreshSchema()}
+    created = []
+    applicants = Applicants(create=False)
+    if applicants.name not in existing:
+        returned = createAirTable(applicants.name, applicants.description, applicants.fields)
+        if "id" not in returned:
+            raise RuntimeError(f"Could not create {applicants.name}: {returned.get('error', returned)}")
+        existing[applicants.name] = returned["id"]
+        created.append(applicants.name)
+        logger.info(f"Created {applicants.name} table with ID: {returned['id']}")
+
+    missing = [model for model in table_models(existing[applicants.name])[1:] if model.name not in existing]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(lambda model: createAirTable(model.name, model.description, model.fields), missing))
+    for model, returned in zip(missing, results):
+        if "id" in returned:
+            existing[model.name] = returned["id"]
+            created.append(model.name)
+            logger.info(f"Created {model.name} table with ID: {returned['id']}")
+        else:
+            logger.error(f"Could not create {model.name}: {returned.get('error', returned)}")
+
+    if created:
+        refreshSchema()
+    names = [model.name for model in table_models()]
+    logger.info(f"Tables present: {', '.join(name for name in names if name in existing)}")
+    return {name: existing[name] for name in names if name in existing}
@@ -0,0 +1,135 @@
+from datetime import date
+from functools import lru_cache
+from utils.metrics import timed
+import numpy as np
+
+
+@lru_cache(maxsize=1)
+def run_today():
+
+    """
+    Returns:
+        datetime.date: Today's date, computed once per process so open-ended roles in one run all
+                       end on the same day.
+    """
+
+    return date.today()
+
+
+@lru_cache(maxsize=65536)
+def parse_date(value):
+
+    """
+    Args:
+        value (str): An ISO 8601 date such as '2021-03-01' (a trailing time part is ignored).
+
+    Returns:
+        datetime.date: The parsed date, or None if value is empty or not a date. Results are cached,
+                       since the same start/end dates repeat across applicants.
+    """
+
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _intervals(work_experiences, today):
+    for exp in work_experiences or []:
+        start = parse_date(exp.get("Start"))
+        end = parse_date(exp.get("End")) or today
+        if start and end > start:
+            yield start.toordinal(), end.toordinal()
+
+
+def merge_intervals(intervals):
+
+    """
+    Args:
+        intervals (iterable): (start, end) pairs of comparable values.
+
+    Returns:
+        list: The union of the intervals as sorted, non-overlapping (start, end) pairs.
+    """
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+@timed("experience_seconds")
+def calculate_experience(work_experiences, today = None):
+
+    """
+    Args:
+        work_experiences (list): List of work experience dictionaries.
+        today (datetime.date): End date used for open-ended roles (defaults to run_today()).
+
+    Returns:
+        float: Total years of experience rounded to 2 decimal places.
+
+    Function:
+        This function calculates the total years of experience from a list of work experience entries.
+        Overlapping or concurrent roles are merged first, so each day is only counted once.
+    """
+
+    today = today or run_today()
+    total_days = sum(end - start for start, end in merge_intervals(_intervals(work_experiences, today)))
+    return round(total_days / 365, 2)
+
+
+@timed("experience_seconds")
+def batch_experience(work_experience_lists, today = None):
+
+    """
+    Args:
+        work_experience_lists (list): One list of work experience dictionaries per applicant.
+        today (datetime.date): End date used for open-ended roles (defaults to run_today()).
+
+    Returns:
+        numpy.ndarray: Total years of experience per applicant, rounded to 2 decimal places.
+
+    Function:
+        Vectorized calculate_experience for many applicants. All intervals are flattened into
+        NumPy arrays, offset per applicant so that a single sort and running maximum merge the
+        overlaps of every applicant at once.
+    """
+
+    today = today or run_today()
+    owners, starts, ends = [], [], []
+    for owner, work_experiences in enumerate(work_experience_lists):
+        for start, end in _intervals(work_experiences, today):
+            owners.append(owner)
+            starts.append(start)
+            ends.append(end)
+
+    count = len(work_experience_lists)
+    if not owners:
+        return np.zeros(count)
+
+    owners = np.asarray(owners, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+
+    # Shift every applicant onto its own stretch of the number line, so a running maximum
+    # over all intervals never carries one applicant's end date into the next applicant
+    span = int(ends.max() - starts.min()) + 1
+    offset = owners * span - int(starts.min())
+    starts = starts + offset
+    ends = ends + offset
+
+    order = np.lexsort((starts, owners))
+    starts, ends, owners = starts[order], ends[order], owners[order]
+
+    covered_until = np.maximum.accumulate(ends)
+    previous = np.concatenate(([starts[0]], covered_until[:-1]))
+    days = np.clip(ends - np.maximum(starts, previous), 0, None)
+
+    return np.round(np.bincount(owners, weights=days, minlength=count) / 365, 2)
@@ -0,0 +1,126 @@
+import binascii
+import base64
+import zlib
+import json
+import os
+import re
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library json is used without it
+    orjson = None
+
+
+# Preset zlib dictionary of version 1: the field names and punctuation every applicant repeats,
+# so even a single record compresses well. Never edit it; a new dictionary needs a new version.
+ZDICT_V1 = "".join([
+    '"Technologies":"', '"Title":"', '"Company":"', '"Start":"', '"End":"', '"Experience ID":',
+    '"Work Experience":[{', '"Currency":"USD"', '"Availability":"', '"Minimum Rate":', '"Preferred Rate":',
+    '"Salary Preferences":{', '"LinkedIn Profile":"https://www.linkedin.com/in/', '"Location":"',
+    '"Email":"', '"Full Name":"', '"Personal Details":{', '"Applicant ID":["rec', '"Applicant ID":"',
+    'Python, JavaScript, TypeScript, React, Node.js, AWS, SQL, ', '@gmail.com"', '"},{', '"}],', '"},"',
+]).encode("utf-8")
+
+FORMATS = {0: "plain JSON", 1: "zlib with a preset key dictionary, base64"}
+PREFIX = re.compile(r"^z(\d+):")
+
+
+def default_version():
+
+    """
+    Returns:
+        int: The format new values are written in (compressed_json_format, default 1).
+    """
+
+    return int(os.getenv("compressed_json_format", 1))
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def format_version(text):
+
+    """
+    Args:
+        text (str): A stored Compressed JSON value.
+
+    Returns:
+        int: Its format version; 0 for plain JSON, which is what values written before the codec are.
+    """
+
+    match = PREFIX.match(text or "")
+    return int(match.group(1)) if match else 0
+
+
+def encode_json(value, version=None):
+
+    """
+    Args:
+        value: JSON-serializable applicant data.
+        version (int): Format to write (default_version() if None).
+
+    Returns:
+        str: The encoded value. Version 1 falls back to plain JSON when that is shorter,
+             which happens for very small values.
+    """
+
+    plain = dumps(value)
+    version = default_version() if version is None else version
+    if version == 0:
+        return plain
+    if version != 1:
+        raise ValueError(f"Unknown Compressed JSON format {version}; known formats: {FORMATS}")
+
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, ZDICT_V1)
+    packed = compressor.compress(plain.encode("utf-8")) + compressor.flush()
+    encoded = "z1:" + base64.b64encode(packed).decode("ascii")
+    return encoded if len(encoded) < len(plain) else plain
+
+
+def decode_json(text):
+
+    """
+    Args:
+        text (str): A stored Compressed JSON value in any known format.
+
+    Returns:
+        The decoded applicant data.
+
+    Raises:
+        ValueError: If the value is not valid in its format.
+    """
+
+    version = format_version(text)
+    if version == 0:
+        return loads(text)
+    if version != 1:
+        raise ValueError(f"Unknown Compressed JSON format {version}; known formats: {FORMATS}")
+
+    try:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, ZDICT_V1)
+        packed = base64.b64decode(text[3:], validate=True)
+        return loads(decompressor.decompress(packed) + decompressor.flush())
+    except (zlib.error, binascii.Error) as e:
+        raise ValueError(f"Corrupt Compressed JSON: {e}") from e
+
+
+def json_text(text):
+
+    """
+    Args:
+        text (str): A stored Compressed JSON value in any known format.
+
+    Returns:
+        str: The value as JSON text, e.g. for a prompt. Plain JSON is returned unchanged.
+    """
+
+    return text if format_version(text) == 0 else dumps(decode_json(text))
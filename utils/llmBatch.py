@@ -0,0 +1,224 @@
+from loggerConfig import setup_logger
+import time
+import json
+import os
+
+
+logger = setup_logger()
+
+# Batch statuses after which nothing changes any more; 'expired' and 'cancelled' batches still
+# return the results of the requests that finished
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class OpenAIBatchClient:
+
+    """
+    Batch API adapter used by summaryGeneration.py --batch. Any object with the same four
+    methods can be passed instead, e.g. to run against a local stand-in; the fake server in
+    benchmarks/ also implements the OpenAI file and batch endpoints, so this adapter works
+    against it with openai_base_url pointing there.
+
+    Usage:
+        batches = OpenAIBatchClient(OpenAI())
+        batch_id = batches.submit("batches/summaryGeneration-0.jsonl")
+        status = batches.status(batch_id)
+        batches.download(status["output_file_id"], "batches/output.jsonl")
+    """
+
+    def __init__(self, client, endpoint="/v1/chat/completions", completion_window="24h"):
+        self.client = client
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+
+
+    def submit(self, path, metadata=None):
+
+        """
+        Args:
+            path (str): JSONL batch file written by BatchWriter.
+            metadata (dict): Optional metadata stored with the batch.
+
+        Returns:
+            str: ID of the created batch.
+        """
+
+        with open(path, "rb") as handle:
+            uploaded = self.client.files.create(file=handle, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=self.endpoint,
+                                           completion_window=self.completion_window, metadata=metadata)
+        return batch.id
+
+
+    def status(self, batch_id):
+
+        """
+        Args:
+            batch_id (str): Batch ID.
+
+        Returns:
+            dict: {'status', 'output_file_id', 'error_file_id', 'completed', 'failed', 'total'}.
+        """
+
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {"status": batch.status, "output_file_id": batch.output_file_id, "error_file_id": batch.error_file_id,
+                "completed": counts.completed if counts else 0, "failed": counts.failed if counts else 0,
+                "total": counts.total if counts else 0}
+
+
+    def download(self, file_id, path):
+
+        """
+        Args:
+            file_id (str): Output or error file ID.
+            path (str): Where the file is written; it is streamed to disk, not held in memory.
+
+        Returns:
+            str: path
+        """
+
+        with self.client.files.with_streaming_response.content(file_id) as response:
+            response.stream_to_file(path)
+        return path
+
+
+    def cancel(self, batch_id):
+        self.client.batches.cancel(batch_id)
+
+
+class BatchWriter:
+
+    """
+    Writes batch requests to JSONL files of at most max_requests lines (and max_bytes), starting
+    a new file when either limit would be exceeded. The OpenAI Batch API accepts up to 50,000
+    requests and 200 MB per file.
+
+    Usage:
+        with BatchWriter("batches", "summaryGeneration") as writer:
+            writer.add(app["id"], request)
+        paths = writer.paths
+    """
+
+    def __init__(self, directory, prefix, url="/v1/chat/completions", max_requests=50000, max_bytes=190 * 1024 * 1024):
+        self.directory = directory
+        self.prefix = prefix
+        self.url = url
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.handle = None
+        self.requests = 0
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+
+
+    def add(self, custom_id, body):
+
+        """
+        Args:
+            custom_id (str): ID the result is matched back with (the applicant record ID).
+            body (dict): Request body, e.g. the chat.completions.create arguments.
+
+        Returns:
+            None
+        """
+
+        line = (json.dumps({"custom_id": custom_id, "method": "POST", "url": self.url, "body": body},
+                           ensure_ascii=False) + "\n").encode("utf-8")
+        if self.handle is None or self.requests >= self.max_requests or self.size + len(line) > self.max_bytes:
+            self._next()
+        self.handle.write(line)
+        self.requests += 1
+        self.size += len(line)
+
+
+    def _next(self):
+        self.close()
+        path = os.path.join(self.directory, f"{self.prefix}-{time.strftime('%Y%m%dT%H%M%S')}-{len(self.paths)}.jsonl")
+        self.handle = open(path, "wb")
+        self.paths.append(path)
+        self.requests = self.size = 0
+
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def waitForBatches(batch_client, batch_ids, poll_seconds=60, max_wait=None):
+
+    """
+    Args:
+        batch_client: OpenAIBatchClient or a compatible stand-in.
+        batch_ids (list): Batches to wait for.
+        poll_seconds (float): Seconds between status checks.
+        max_wait (float): Give up after this many seconds (None waits for the completion window).
+
+    Returns:
+        dict: batch ID -> final status dict from batch_client.status().
+
+    Function:
+        This function polls every unfinished batch until all of them reached a final status,
+        logging progress whenever the completed count changes.
+
+    Raises:
+        TimeoutError: If max_wait passes first; the batches keep running and can be resumed with
+                      their IDs.
+    """
+
+    deadline = time.monotonic() + max_wait if max_wait else None
+    pending, finished, progress = list(batch_ids), {}, {}
+    while True:
+        for batch_id in list(pending):
+            status = batch_client.status(batch_id)
+            if progress.get(batch_id) != (status["status"], status["completed"]):
+                progress[batch_id] = (status["status"], status["completed"])
+                logger.info(f"Batch {batch_id}: {status['status']}, {status['completed']}/{status['total']} done, "
+                            f"{status['failed']} failed")
+            if status["status"] in FINAL_STATUSES:
+                finished[batch_id] = status
+                pending.remove(batch_id)
+        if not pending:
+            return finished
+        if deadline and time.monotonic() + poll_seconds > deadline:
+            raise TimeoutError(f"Batches still running after {max_wait}s: {', '.join(pending)}")
+        time.sleep(poll_seconds)
+
+
+def iterBatchResults(path):
+
+    """
+    Args:
+        path (str): Output or error file of a batch.
+
+    Yields:
+        tuple: (custom_id, body, error). body is the response body (e.g. a chat completion as a
+               dict) when the request succeeded with HTTP 200, otherwise None with error set.
+
+    Function:
+        This function reads the file line by line, so result files of any size use little memory.
+    """
+
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                logger.warning(f"{path}:{number}: unreadable batch result line")
+                continue
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                error = result.get("error") or (response.get("body") or {}).get("error") or f"HTTP {response.get('status_code')}"
+                yield result.get("custom_id"), None, error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            else:
+                yield result.get("custom_id"), response.get("body") or {}, None
@@ -0,0 +1,163 @@
+from loggerConfig import setup_logger
+from utils.settings import setting
+from utils.jsonCodec import decode_json
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+
+
+logger = setup_logger()
+
+
+class LLMCache:
+
+    """
+    Content-addressed SQLite cache of LLM evaluations. Entries are keyed by a hash of the
+    normalized Compressed JSON, the prompt template and the model name, so an applicant is
+    only sent to the model again when one of those changes. Entries older than max_age_days
+    are dropped and the least recently used entries are evicted beyond max_entries.
+
+    Usage:
+        cache = LLMCache("llm_cache.sqlite")
+        key = cache.key(compressed_json, prompt_template, "gpt-4o-mini")
+        payload = cache.get(key)
+        if payload is None:
+            payload = ...
+            cache.put(key, payload)
+
+    WAL is used unless sqlite_journal_mode says otherwise. WAL does not work on network
+    filesystems, so set sqlite_journal_mode=delete when llm_cache_path is on a shared mount.
+    """
+
+    def __init__(self, path="llm_cache.sqlite", max_entries=100000, max_age_days=30, journal_mode=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Several stage runs may share the file; writers wait for each other instead of failing
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode or setting('sqlite_journal_mode', 'WAL')}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS evaluations (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS evaluations_used_at ON evaluations (used_at)")
+        self.conn.commit()
+        self.evict()
+
+
+    @staticmethod
+    def normalize(input_text):
+
+        """
+        Args:
+            input_text (str): Compressed JSON of an applicant.
+
+        Returns:
+            str: Canonical JSON (sorted keys, no whitespace) or the stripped text if it is not JSON.
+                 Encoded values are decoded first, so re-encoding an applicant keeps its entry.
+        """
+
+        try:
+            return json.dumps(decode_json(input_text), sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return (input_text or "").strip()
+
+
+    @classmethod
+    def key(cls, input_text, prompt_template, model):
+
+        """
+        Args:
+            input_text (str): Compressed JSON of an applicant.
+            prompt_template (str): Everything in the request that does not depend on the applicant.
+            model (str): Model name.
+
+        Returns:
+            str: SHA-256 hex digest identifying the evaluation.
+        """
+
+        digest = hashlib.sha256()
+        for part in (model, prompt_template, cls.normalize(input_text)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+
+    def get(self, key):
+
+        """
+        Args:
+            key (str): Cache key from LLMCache.key.
+
+        Returns:
+            dict: The cached payload, or None on a miss or expired entry.
+        """
+
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT payload, created_at FROM evaluations WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            # Committed right away: an open transaction would hold the write lock against other instances
+            self.conn.execute("UPDATE evaluations SET used_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+
+    def put(self, key, payload):
+
+        """
+        Args:
+            key (str): Cache key from LLMCache.key.
+            payload (dict): A validated LLM payload.
+
+        Returns:
+            None
+        """
+
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO evaluations (key, payload, created_at, used_at) VALUES (?, ?, ?, ?)",
+                              (key, json.dumps(payload), now, now))
+            self.conn.commit()
+
+
+    def evict(self):
+
+        """
+        Args:
+            None
+
+        Returns:
+            int: Number of entries removed.
+
+        Function:
+            This function drops expired entries, then the least recently used ones beyond max_entries.
+        """
+
+        with self.lock:
+            removed = self.conn.execute("DELETE FROM evaluations WHERE created_at < ?", (time.time() - self.max_age,)).rowcount
+            removed += self.conn.execute("""
+                DELETE FROM evaluations WHERE key IN (
+                    SELECT key FROM evaluations ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,)).rowcount
+            self.conn.commit()
+        return removed
+
+
+    def close(self):
+        removed = self.evict()
+        with self.lock:
+            self.conn.close()
+        logger.info(f"LLM cache: {self.hits} hits, {self.misses} misses, {removed} entries evicted")
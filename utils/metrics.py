@@ -0,0 +1,342 @@
+from loggerConfig import setup_logger
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+import tracemalloc
+import threading
+import resource
+import cProfile
+import pstats
+import json
+import time
+import sys
+import io
+import os
+
+
+logger = setup_logger()
+
+PREFIX = "hireeasy_"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+
+    """
+    Latency (or size) distribution of one series. count, sum and max are exact; quantiles are
+    computed from the most recent max_samples observations, which keeps memory flat on long runs.
+    """
+
+    def __init__(self, max_samples=10000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class Metrics:
+
+    """
+    In-process registry of counters and histograms, keyed by name and labels. Every stage records
+    into the shared `metrics` instance below; runMetrics() writes it out as a Prometheus text file
+    and a JSON run report when the script ends.
+
+    Usage:
+        metrics.inc("llm_tokens_total", 812, kind="prompt")
+        with metrics.timer("json_decode_seconds"):
+            ...
+
+        @timed("experience_seconds")
+        def calculate_experience(...):
+            ...
+    """
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        with self.lock:
+            self.counters = defaultdict(float)
+            self.histograms = {}
+            self.started = time.time()
+
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] += value
+
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.max_samples)
+            histogram.observe(value)
+
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+
+    def timed(self, name, **labels):
+
+        """
+        Args:
+            name (str): Histogram name, e.g. 'airtable_helper_seconds'.
+            **labels: Extra labels; the function's name is added as 'function'.
+
+        Returns:
+            Decorator that records the duration of every call, including calls that raise.
+        """
+
+        def decorator(function):
+            series = dict(labels, function=function.__name__)
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **series):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+    def report(self):
+
+        """
+        Returns:
+            dict: The run's counters and histogram summaries (count, sum, mean, p50, p95, p99, max),
+                  plus wall time and peak RSS, ready for json.dump.
+        """
+
+        with self.lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                quantiles = histogram.quantiles()
+                histograms.append({"name": name, "labels": dict(labels), "count": histogram.count,
+                                   "sum": histogram.total, "mean": histogram.total / histogram.count,
+                                   "p50": quantiles[0.5], "p95": quantiles[0.95], "p99": quantiles[0.99],
+                                   "max": histogram.max})
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return {"started": self.started, "wall_seconds": time.time() - self.started,
+                "peak_rss_mb": round(peak_rss, 1), "counters": counters, "histograms": histograms}
+
+
+    def prometheus(self, **const_labels):
+
+        """
+        Args:
+            **const_labels: Labels added to every series, e.g. run='shortlist'.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format. Histograms are exported as
+                 summaries (p50/p95/p99 quantiles, _sum and _count), so they can be read without
+                 configuring buckets, e.g. by node_exporter's textfile collector.
+        """
+
+        def series(name, labels, suffix="", **extra):
+            merged = dict(const_labels, **labels, **extra)
+            rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in sorted(merged.items()))
+            return f"{PREFIX}{name}{suffix}{{{rendered}}}" if rendered else f"{PREFIX}{name}{suffix}"
+
+        report = self.report()
+        lines, typed = [], set()
+        for counter in report["counters"]:
+            if counter["name"] not in typed:
+                typed.add(counter["name"])
+                lines.append(f"# TYPE {PREFIX}{counter['name']} counter")
+            lines.append(f"{series(counter['name'], counter['labels'])} {counter['value']:g}")
+        for histogram in report["histograms"]:
+            name, labels = histogram["name"], histogram["labels"]
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} summary")
+            for q in QUANTILES:
+                lines.append(f"{series(name, labels, quantile=q)} {histogram[f'p{int(q * 100)}']:.6g}")
+            lines.append(f"{series(name, labels, '_sum')} {histogram['sum']:.6g}")
+            lines.append(f"{series(name, labels, '_count')} {histogram['count']}")
+        lines.append(f"# TYPE {PREFIX}run_wall_seconds gauge")
+        lines.append(f"{series('run_wall_seconds', {})} {report['wall_seconds']:.3f}")
+        lines.append(f"# TYPE {PREFIX}run_peak_rss_megabytes gauge")
+        lines.append(f"{series('run_peak_rss_megabytes', {})} {report['peak_rss_mb']}")
+        return "\n".join(lines) + "\n"
+
+
+    def writeReports(self, stage, directory, extra=None):
+
+        """
+        Args:
+            stage (str): Run name, used for the file names and as the 'run' label.
+            directory (str): Output directory; created if missing.
+            extra (dict): Additional sections for the JSON report (e.g. profiling results).
+
+        Returns:
+            tuple: Paths of the Prometheus text file and the JSON report.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        prom_path = os.path.join(directory, f"{stage}.prom")
+        json_path = os.path.join(directory, f"{stage}.json")
+        report = dict(self.report(), run=stage, pid=os.getpid(), **(extra or {}))
+        # Write-then-rename, so a collector never reads a half-written file
+        for path, content in ((prom_path, self.prometheus(run=stage)), (json_path, json.dumps(report, indent=2))):
+            with open(path + ".tmp", "w") as handle:
+                handle.write(content)
+            os.replace(path + ".tmp", path)
+        return prom_path, json_path
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+# cProfile only sees the thread it was enabled in; profiled() threads add their own profiles here
+_thread_profiles = None
+
+
+def timed(name, **labels):
+    return metrics.timed(name, **labels)
+
+
+def profiled(function):
+
+    """
+    Args:
+        function: A thread's target.
+
+    Returns:
+        The target, wrapped so that it is profiled too while runMetrics() has cProfile on.
+    """
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profiles = _thread_profiles
+        if profiles is None:
+            return function(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profiles.append(profiler)
+    return wrapper
+
+
+@contextmanager
+def runMetrics(stage, profile=None, directory=None):
+
+    """
+    Args:
+        stage (str): Run name, e.g. 'shortlist'.
+        profile (str): 'cprofile', 'tracemalloc' or 'all' to profile this run (metrics_profile if None).
+        directory (str): Where reports are written (metrics_dir, default 'metrics'; empty disables them).
+
+    Yields:
+        Metrics: The shared registry.
+
+    Function:
+        This function wraps a script's run. At the end it logs the slowest histograms and writes
+        <directory>/<stage>.prom and <stage>.json. With cProfile on, the profile is saved as
+        <stage>.pstats (merged with the profiles of threads started with profiled()) and its top
+        functions are logged; with tracemalloc on, peak traced memory and
+        the top allocation sites go into the JSON report. Both slow the run down noticeably.
+    """
+
+    directory = os.getenv("metrics_dir", "metrics") if directory is None else directory
+    profile = (os.getenv("metrics_profile", "") if profile is None else profile).lower()
+    modes = {"cprofile", "tracemalloc"} if profile == "all" else {mode.strip() for mode in profile.split(",") if mode.strip()}
+
+    global _thread_profiles
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    if "tracemalloc" in modes:
+        tracemalloc.start(10)
+    if profiler:
+        _thread_profiles = []
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        extra = {}
+        if profiler:
+            profiler.disable()
+            output = io.StringIO()
+            stats = pstats.Stats(profiler, stream=output)
+            for thread_profile in _thread_profiles:
+                stats.add(thread_profile)
+            _thread_profiles = None
+            stats.sort_stats("cumulative").print_stats(20)
+            logger.info(f"cProfile, top functions by cumulative time:\n{output.getvalue()}")
+            extra["cprofile"] = {"pstats": None}
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                extra["cprofile"]["pstats"] = os.path.join(directory, f"{stage}.pstats")
+                stats.dump_stats(extra["cprofile"]["pstats"])
+        if "tracemalloc" in modes:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:20]
+            tracemalloc.stop()
+            extra["tracemalloc"] = {"current_mb": round(current / 2**20, 2), "peak_mb": round(peak / 2**20, 2),
+                                    "top": [{"where": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1),
+                                             "count": stat.count} for stat in top]}
+            logger.info(f"tracemalloc: peak {extra['tracemalloc']['peak_mb']} MB traced")
+
+        logSummary()
+        if directory:
+            try:
+                prom_path, json_path = metrics.writeReports(stage, directory, extra)
+                logger.info(f"Metrics written to {prom_path} and {json_path}")
+            except OSError as e:
+                logger.error(f"Writing metrics to {directory} failed: {e}")
+
+
+def logSummary(limit=10):
+
+    """
+    Args:
+        limit (int): Number of histograms to log.
+
+    Returns:
+        None
+
+    Function:
+        This function logs the histograms with the largest total time, i.e. where the run spent
+        its time, together with their p50/p95/p99.
+    """
+
+    histograms = sorted(metrics.report()["histograms"], key=lambda h: h["sum"], reverse=True)[:limit]
+    for h in histograms:
+        labels = ",".join(f"{key}={value}" for key, value in h["labels"].items())
+        logger.info(f"{h['name']}{{{labels}}}: {h['count']} x, total {h['sum']:.2f}s, p50 {h['p50']*1000:.1f}ms, "
+                    f"p95 {h['p95']*1000:.1f}ms, p99 {h['p99']*1000:.1f}ms")
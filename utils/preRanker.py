@@ -0,0 +1,196 @@
+from utils.rulesEngine import RulesEngine
+from utils.experience import batch_experience
+from utils.settings import setting
+import numpy as np
+import re
+
+# Lower-case terms; 'c++', 'c#' and 'node.js' stay single tokens
+TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+DEFAULTS = {
+    "role_profile": "",
+    "weights": {"criteria": 0.5, "experience": 0.2, "match": 0.3},
+    "experience_cap_years": 10,
+    "top_k": None,
+    "min_score": None,
+}
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text or "").casefold())
+
+
+def default_table_names():
+    return {
+        "work_experience": setting('work_experience_table_name', 'Work Experience'),
+        "salary_preferences": setting('salary_preferences_table_name', 'Salary Preferences'),
+        "personal_details": setting('personal_details_table_name', 'Personal Details'),
+    }
+
+
+class TermIndex:
+
+    """
+    TF-IDF index of a batch of documents, built once with NumPy. Term weights are kept as
+    sparse (document, term, weight) triplets, so scoring a query is one gather and one bincount
+    however large the vocabulary is.
+
+    Usage:
+        index = TermIndex([tokenize(text) for text in texts])
+        similarity = index.similarity(tokenize("python react aws"))
+    """
+
+    def __init__(self, documents):
+        self.size = len(documents)
+        self.vocabulary = {}
+        rows, terms = [], []
+        for row, tokens in enumerate(documents):
+            for token in tokens:
+                rows.append(row)
+                terms.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+
+        width = max(len(self.vocabulary), 1)
+        # One key per (document, term) pair; np.unique sorts them by document and counts repeats
+        keys, counts = np.unique(np.asarray(rows, dtype=np.int64) * width + np.asarray(terms, dtype=np.int64),
+                                 return_counts=True)
+        self.rows = keys // width
+        self.terms = keys % width
+
+        frequency = np.bincount(self.terms, minlength=width)
+        self.idf = np.log((1 + self.size) / (1 + frequency)) + 1
+        weights = (1 + np.log(counts)) * self.idf[self.terms]
+        norms = np.sqrt(np.bincount(self.rows, weights ** 2, minlength=self.size))
+        self.weights = weights / np.where(norms > 0, norms, 1)[self.rows]
+
+
+    def similarity(self, tokens):
+
+        """
+        Args:
+            tokens (list): Query terms, e.g. the tokenized role profile.
+
+        Returns:
+            numpy.ndarray: Cosine similarity (0..1) of every document to the query. Query terms
+                           no document contains are ignored.
+        """
+
+        query = np.zeros(len(self.idf))
+        for token in tokens:
+            term = self.vocabulary.get(token)
+            if term is not None:
+                query[term] += 1
+        present = query > 0
+        query[present] = (1 + np.log(query[present])) * self.idf[present]
+        norm = np.sqrt((query ** 2).sum())
+        if not norm:
+            return np.zeros(self.size)
+        return np.bincount(self.rows, self.weights * (query / norm)[self.terms], minlength=self.size)
+
+
+class PreRanker:
+
+    """
+    Local score that decides which applicants are worth an LLM call. It combines three parts,
+    each between 0 and 1, weighted by the `pre_rank:` section of config.yaml:
+
+        pre_rank:
+          role_profile: "Backend engineer: Python, Go, PostgreSQL, AWS, Kubernetes"
+          weights: {criteria: 0.5, experience: 0.2, match: 0.3}
+          experience_cap_years: 10
+          top_k: 1000        # at most this many applicants per run go to the LLM
+          min_score: 0.7     # and only those whose criteria/experience mix reaches this
+
+    criteria is the share of the shortlisting rules (utils/rulesEngine.py) an applicant passes,
+    experience is the merged years of experience over experience_cap_years, and match is the
+    TF-IDF cosine similarity of their Work Experience titles and technologies to role_profile.
+    The index is built once over all applicants ranked together. Nothing here uses the network.
+
+    The term weights of match come from the pool being ranked, so the same applicant can match
+    differently in another batch. min_score is therefore only compared with the mix of criteria
+    and experience ('absolute'), which does not depend on the pool; match only orders the
+    applicants, so top_k is the one relative cut-off.
+    """
+
+    def __init__(self, config, table_names=None, top_k=None, min_score=None):
+        options = {**DEFAULTS, **(config.get("pre_rank") or {})}
+        self.tables = table_names or default_table_names()
+        self.engine = RulesEngine(config, self.tables)
+        self.profile = tokenize(options["role_profile"])
+        self.weights = {**DEFAULTS["weights"], **(options.get("weights") or {})}
+        self.experience_cap = float(options["experience_cap_years"])
+        self.top_k = top_k if top_k is not None else options["top_k"]
+        self.min_score = min_score if min_score is not None else options["min_score"]
+
+
+    @property
+    def enabled(self):
+        # Without a cut-off every applicant would be selected, so ranking is skipped altogether
+        return bool(self.top_k) or self.min_score is not None
+
+
+    def document(self, data):
+
+        """
+        Args:
+            data (dict): Decompressed JSON of one applicant.
+
+        Returns:
+            list: Terms of the applicant's Work Experience titles and technologies.
+        """
+
+        tokens = []
+        for job in data.get(self.tables["work_experience"]) or []:
+            tokens += tokenize(job.get("Title"))
+            tokens += tokenize(job.get("Technologies"))
+        return tokens
+
+
+    def score(self, applicants):
+
+        """
+        Args:
+            applicants (list): Decompressed JSON of the applicants to rank together.
+
+        Returns:
+            dict: 'score' and its parts 'criteria', 'experience' and 'match', plus 'absolute' (the
+                  weighted mix of criteria and experience only), each a NumPy array in the order
+                  of applicants.
+        """
+
+        if not applicants:
+            empty = np.zeros(0)
+            return {"score": empty, "absolute": empty, "criteria": empty, "experience": empty, "match": empty}
+
+        years = batch_experience([data.get(self.tables["work_experience"]) or [] for data in applicants])
+        rows = [self.engine.extract(data, years[index]) for index, data in enumerate(applicants)]
+        _, rule_masks = self.engine.evaluate(self.engine.columns(rows))
+        criteria = np.mean(np.vstack(list(rule_masks.values())), axis=0) if rule_masks else np.ones(len(applicants))
+        experience = np.clip(years / self.experience_cap, 0, 1) if self.experience_cap > 0 else np.zeros(len(applicants))
+        match = TermIndex([self.document(data) for data in applicants]).similarity(self.profile)
+
+        parts = {"criteria": criteria, "experience": experience, "match": match}
+        return {"score": self.mix(parts, parts), "absolute": self.mix(parts, ["criteria", "experience"]), **parts}
+
+
+    def mix(self, parts, names):
+        total = sum(self.weights[name] for name in names) or 1
+        return sum(self.weights[name] * parts[name] for name in names) / total
+
+
+    def select(self, scored):
+
+        """
+        Args:
+            scored (dict): Result of score().
+
+        Returns:
+            numpy.ndarray: Indexes of the selected applicants, best first: those whose 'absolute'
+                           score is at least min_score, cut to the top_k highest 'score'.
+        """
+
+        order = np.argsort(-scored["score"], kind="stable")
+        if self.min_score is not None:
+            order = order[scored["absolute"][order] >= float(self.min_score)]
+        if self.top_k:
+            order = order[:int(self.top_k)]
+        return order
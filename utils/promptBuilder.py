@@ -0,0 +1,189 @@
+from utils.experience import calculate_experience
+from functools import lru_cache
+import json
+import os
+
+
+# Static part of every request. It goes first and never changes between candidates, so providers
+# that cache prompt prefixes (OpenAI does from 1024 tokens) can reuse it across requests.
+INSTRUCTIONS = """You evaluate applicants for remote contract engineering work and output only JSON.
+
+Each candidate is a compact JSON object:
+{"loc": location, "pay": [preferred hourly rate, minimum hourly rate, currency], "hrs": hours per week available,
+ "yrs": total years of experience (overlaps merged), "exp": [[company, title, start YYYY-MM, end YYYY-MM or "" if current, technologies], ...]}
+Missing values are null or left out.
+
+For each candidate produce:
+- "LLM Summary": a one-line summary, e.g. "Full-stack SWE with 5 yrs experience at Google and Meta".
+- "LLM Score": an integer from 1 to 10 for overall fit.
+- "LLM Follow-Ups": 2-3 short follow-up questions, e.g. to confirm availability or missing details."""
+
+SINGLE_OUTPUT = "Return a JSON object with exactly these three fields."
+
+PACKED_OUTPUT = """The input holds several candidates, one per line as "<id>: <candidate>".
+Return {"results": [...]} with one object per candidate, each with its "id" and the three fields."""
+
+EVALUATION_SCHEMA = {
+    "LLM Summary": {"type": "string"},
+    "LLM Score": {"type": "integer"},
+    "LLM Follow-Ups": {"type": "array", "items": {"type": "string"}},
+}
+
+
+def _month(value):
+    return value[:7] if isinstance(value, str) else value
+
+
+def project_candidate(data):
+
+    """
+    Args:
+        data (dict): Decoded Compressed JSON of an applicant.
+
+    Returns:
+        dict: The fields relevant to scoring, under short keys (see INSTRUCTIONS). Names, emails,
+              LinkedIn URLs and record IDs are left out; dates are cut to months.
+    """
+
+    personal = data.get(os.getenv('personal_details_table_name', 'Personal Details')) or {}
+    salary = data.get(os.getenv('salary_preferences_table_name', 'Salary Preferences')) or {}
+    experience = data.get(os.getenv('work_experience_table_name', 'Work Experience')) or []
+
+    candidate = {
+        "loc": personal.get("Location"),
+        "pay": [salary.get("Preferred Rate"), salary.get("Minimum Rate"), salary.get("Currency")],
+        "hrs": salary.get("Availability"),
+        "yrs": calculate_experience(experience) if experience else 0,
+        "exp": [[job.get("Company"), job.get("Title"), _month(job.get("Start")), _month(job.get("End")) or "",
+                 job.get("Technologies") or ""] for job in experience],
+    }
+    if not any(candidate["pay"]):
+        candidate.pop("pay")
+    return {key: value for key, value in candidate.items() if value is not None}
+
+
+def compact_candidate(input_text):
+
+    """
+    Args:
+        input_text (str): Candidate as JSON text (see utils.jsonCodec.json_text).
+
+    Returns:
+        str: project_candidate() as canonical JSON without whitespace. Text that is not a JSON
+             object is returned unchanged.
+    """
+
+    try:
+        data = json.loads(input_text)
+    except (TypeError, ValueError):
+        return input_text
+    if not isinstance(data, dict):
+        return input_text
+    return json.dumps(project_candidate(data), separators=(",", ":"), ensure_ascii=False)
+
+
+def build_messages(input_texts):
+
+    """
+    Args:
+        input_texts (list): One or more candidates as JSON text.
+
+    Returns:
+        list: Chat messages. The system message is the same for every request of the same size
+              class (single or packed); only the user message holds the candidates. Packed
+              candidates are numbered from 1 and must be answered under those IDs.
+    """
+
+    if len(input_texts) == 1:
+        return [{"role": "system", "content": f"{INSTRUCTIONS}\n\n{SINGLE_OUTPUT}"},
+                {"role": "user", "content": compact_candidate(input_texts[0])}]
+    lines = [f"{number}: {compact_candidate(text)}" for number, text in enumerate(input_texts, start=1)]
+    return [{"role": "system", "content": f"{INSTRUCTIONS}\n\n{PACKED_OUTPUT}"},
+            {"role": "user", "content": "\n".join(lines)}]
+
+
+def response_format(count):
+
+    """
+    Args:
+        count (int): Candidates in the request.
+
+    Returns:
+        dict: Structured output schema; a keyed {"results": [...]} array when count > 1.
+    """
+
+    evaluation = {"type": "object", "properties": dict(EVALUATION_SCHEMA),
+                  "required": list(EVALUATION_SCHEMA), "additionalProperties": False}
+    if count == 1:
+        return {"type": "json_schema", "json_schema": {"name": "candidate_evaluation", "strict": True, "schema": evaluation}}
+
+    keyed = dict(evaluation, properties={"id": {"type": "string"}, **evaluation["properties"]},
+                 required=["id"] + evaluation["required"])
+    return {"type": "json_schema", "json_schema": {"name": "candidate_evaluations", "strict": True, "schema": {
+        "type": "object", "properties": {"results": {"type": "array", "items": keyed}},
+        "required": ["results"], "additionalProperties": False}}}
+
+
+def split_results(output_text, count):
+
+    """
+    Args:
+        output_text (str): Raw message content of a packed request.
+        count (int): Candidates in the request.
+
+    Returns:
+        list: One entry per candidate, in request order: the result object without its 'id', or
+              None if the model left the candidate out. Raises ValueError on unreadable output.
+    """
+
+    results = json.loads(output_text).get("results")
+    if not isinstance(results, list):
+        raise ValueError("'results' is not a list")
+    by_id = {}
+    for result in results:
+        if isinstance(result, dict):
+            by_id.setdefault(str(result.get("id", "")).strip(), {k: v for k, v in result.items() if k != "id"})
+    return [by_id.get(str(number)) for number in range(1, count + 1)]
+
+
+@lru_cache(maxsize=1)
+def load_tiktoken():
+
+    """
+    Returns:
+        module: tiktoken, or None if it is not installed (token counts are estimated then). It is
+                imported on first use, since loading it is slower than the rest of this module.
+    """
+
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+
+    """
+    Args:
+        text (str): Text to count.
+        model (str): Model whose tokenizer is used.
+
+    Returns:
+        int: Number of tokens with tiktoken if it is installed, otherwise an estimate of four
+             characters per token.
+    """
+
+    tiktoken = load_tiktoken()
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages, model="gpt-4o-mini"):
+    # About 4 tokens of framing per message on the chat formats
+    return sum(count_tokens(message["content"], model) + 4 for message in messages)
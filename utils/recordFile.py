@@ -0,0 +1,87 @@
+from loggerConfig import setup_logger
+import gzip
+import json
+import os
+
+
+logger = setup_logger()
+
+
+def _open(path, mode, compressed=None):
+    compressed = str(path).endswith(".gz") if compressed is None else compressed
+    return gzip.open(path, mode, encoding="utf-8") if compressed else open(path, mode, encoding="utf-8")
+
+
+class RecordWriter:
+
+    """
+    Writes Airtable records as JSON lines, one record per line with the table it belongs to:
+
+        {"table": "Applicants", "id": "rec...", "createdTime": "...", "fields": {...}}
+
+    Paths ending in .gz are gzip-compressed. Lines go to a temporary file that only replaces
+    `path` on a clean close(), so an interrupted export never leaves a truncated file behind.
+
+    Usage:
+        with RecordWriter("backup.jsonl.gz") as writer:
+            for record in iterRecords("Applicants"):
+                writer.write("Applicants", record)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.temporary = f"{path}.tmp"
+        self.handle = _open(self.temporary, "wt", compressed=str(path).endswith(".gz"))
+        self.counts = {}
+
+
+    def write(self, table_name, record):
+        line = {"table": table_name, "id": record["id"], "createdTime": record.get("createdTime"),
+                "fields": record.get("fields", {})}
+        self.handle.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self.counts[table_name] = self.counts.get(table_name, 0) + 1
+
+
+    def close(self, keep=True):
+        if self.handle is None:
+            return
+        self.handle.close()
+        self.handle = None
+        if keep:
+            os.replace(self.temporary, self.path)
+        else:
+            os.remove(self.temporary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(keep=exc_type is None)
+
+
+def iterRecordFile(path):
+
+    """
+    Args:
+        path (str): File written by RecordWriter (.jsonl or .jsonl.gz).
+
+    Yields:
+        tuple: (table name, record) for every line, in file order. The file is read line by
+               line, so files of any size use little memory; unreadable lines are logged and
+               skipped.
+    """
+
+    with _open(path, "rt") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                table_name, record = entry["table"], {"id": entry["id"], "createdTime": entry.get("createdTime"),
+                                                      "fields": entry.get("fields") or {}}
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"{path}:{number}: unreadable record line")
+                continue
+            yield table_name, record
@@ -0,0 +1,472 @@
+from loggerConfig import setup_logger
+from utils.airTableHelpers import iterPages, modifiedSinceFormula
+from utils.dbModel import table_models
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import threading
+import sqlite3
+import uuid
+import json
+import os
+
+
+logger = setup_logger()
+
+SQL_TYPES = {"number": "REAL", "currency": "REAL", "percent": "REAL", "checkbox": "INTEGER"}
+
+
+def _utcnow(skew_seconds=0):
+    return (datetime.now(timezone.utc) - timedelta(seconds=skew_seconds)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _is_link(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(v, str) and v.startswith("rec") for v in value)
+
+
+class Replica:
+
+    """
+    Local SQLite mirror of the Airtable base. The tables and their columns come from the
+    table classes in utils/dbModel.py; each row also keeps the full Airtable `fields` JSON, so
+    fields created by Airtable itself (inverse links, Created By, ...) are preserved. Linked
+    record IDs are indexed in both directions in the `links` table.
+
+    sync() pulls only records modified since the previous sync of each table. Reads then use
+    the same function names and return shapes as utils/airTableHelpers (getAllEntries,
+    iterRecords, getRecordsById, getRecordsByIds, ...), so a stage can take either as its
+    `source`. Writes still go to Airtable and come back with the next sync.
+
+    A replica can also be filled from a file exported by bulkTransfer.py (loadRecords) instead
+    of from Airtable; offline runs then write to it through a ReplicaBuffer.
+
+    Usage:
+        replica = Replica("replica.sqlite")
+        replica.sync()
+        shortlist_applicants(source=replica)
+    """
+
+    def __init__(self, path="replica.sqlite"):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.models = {model.name: model for model in table_models()}
+        self.columns = {}
+        self._create_schema()
+
+
+    def _create_schema(self):
+        with self.lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS sync_state (table_name TEXT PRIMARY KEY, watermark TEXT NOT NULL)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS links (
+                    table_name TEXT NOT NULL,
+                    record_id TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    linked_id TEXT NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS links_source ON links (table_name, record_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS links_target ON links (linked_id)")
+
+            for name, model in self.models.items():
+                columns = {f["name"]: SQL_TYPES.get(f["type"], "TEXT") for f in model.fields}
+                self.columns[name] = list(columns)
+                self.conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {_quote(name)} (
+                        id TEXT PRIMARY KEY,
+                        created_time TEXT,
+                        synced_at TEXT NOT NULL,
+                        fields TEXT NOT NULL
+                    )""")
+                existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({_quote(name)})")}
+                for column, sql_type in columns.items():
+                    if column not in existing:
+                        self.conn.execute(f"ALTER TABLE {_quote(name)} ADD COLUMN {_quote(column)} {sql_type}")
+            self.conn.commit()
+
+
+    def _upsert(self, table_name, records, synced_at):
+
+        """
+        Args:
+            table_name (str): Table name.
+            records (list): Airtable records of one page.
+            synced_at (str): Timestamp stored on rows whose fields actually changed.
+
+        Returns:
+            int: Number of rows that were new or changed.
+        """
+
+        columns = self.columns[table_name]
+        placeholders = ", ".join("?" for _ in range(len(columns) + 4))
+        column_list = ", ".join(["id", "created_time", "synced_at", "fields"] + [_quote(c) for c in columns])
+        # An upsert rather than INSERT OR REPLACE keeps the rowid, so _rows() paging by rowid does
+        # not meet a row again after it was rewritten underneath it
+        assignments = ", ".join(f"{column} = excluded.{column}"
+                                for column in ["created_time", "synced_at", "fields"] + [_quote(c) for c in columns])
+        changed = 0
+
+        with self.lock:
+            for record in records:
+                fields = record.get("fields", {})
+                # Airtable's field order is kept: compress.py builds the Compressed JSON in that order,
+                # so sorting here would make it differ from a run reading Airtable directly
+                encoded = json.dumps(fields)
+                row = self.conn.execute(f"SELECT fields FROM {_quote(table_name)} WHERE id = ?", (record["id"],)).fetchone()
+                if row and row[0] == encoded:
+                    continue
+                changed += 1
+
+                values = [record["id"], record.get("createdTime"), synced_at, encoded]
+                for column in columns:
+                    value = fields.get(column)
+                    values.append(json.dumps(value) if isinstance(value, (list, dict)) else value)
+                self.conn.execute(f"INSERT INTO {_quote(table_name)} ({column_list}) VALUES ({placeholders}) "
+                                  f"ON CONFLICT(id) DO UPDATE SET {assignments}", values)
+
+                self.conn.execute("DELETE FROM links WHERE table_name = ? AND record_id = ?", (table_name, record["id"]))
+                self.conn.executemany("INSERT INTO links (table_name, record_id, field, linked_id) VALUES (?, ?, ?, ?)",
+                                      [(table_name, record["id"], field, linked_id)
+                                       for field, value in fields.items() if _is_link(value) for linked_id in value])
+            self.conn.commit()
+        return changed
+
+
+    def syncTable(self, table_name, full=False, skew_seconds=60):
+
+        """
+        Args:
+            table_name (str): Table to pull.
+            full (bool): If True, every record is pulled and rows that no longer exist in Airtable
+                         are deleted; otherwise only records modified since the last sync are pulled.
+            skew_seconds (int): Overlap subtracted from the new watermark to absorb clock skew.
+
+        Returns:
+            int: Number of rows that were new or changed.
+        """
+
+        with self.lock:
+            row = self.conn.execute("SELECT watermark FROM sync_state WHERE table_name = ?", (table_name,)).fetchone()
+        since = None if (full or row is None) else row[0]
+        watermark = _utcnow(skew_seconds)
+        synced_at = _utcnow()
+
+        formula = modifiedSinceFormula(since) if since else None
+        changed = 0
+        seen = set()
+        for page in iterPages(table_name, formula):
+            seen.update(record["id"] for record in page)
+            changed += self._upsert(table_name, page, synced_at)
+
+        with self.lock:
+            if since is None:
+                stale = [r[0] for r in self.conn.execute(f"SELECT id FROM {_quote(table_name)}") if r[0] not in seen]
+                self.conn.executemany(f"DELETE FROM {_quote(table_name)} WHERE id = ?", [(i,) for i in stale])
+                self.conn.executemany("DELETE FROM links WHERE table_name = ? AND record_id = ?", [(table_name, i) for i in stale])
+                if stale:
+                    logger.info(f"Replica {table_name}: removed {len(stale)} deleted records")
+            self.conn.execute("INSERT OR REPLACE INTO sync_state (table_name, watermark) VALUES (?, ?)", (table_name, watermark))
+            self.conn.commit()
+
+        logger.info(f"Replica {table_name}: {changed} records new or changed" + (f" since {since}" if since else " (full sync)"))
+        return changed
+
+
+    def sync(self, tables=None, full=False):
+
+        """
+        Args:
+            tables (list): Table names to pull (all tables of the model by default).
+            full (bool): Full pull instead of a delta pull.
+
+        Returns:
+            dict: Table name -> number of rows that were new or changed.
+
+        Function:
+            This function pulls the tables concurrently; the shared Airtable client keeps the
+            combined request rate under the per-base limit.
+        """
+
+        tables = tables or list(self.models)
+        with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+            counts = executor.map(lambda table: self.syncTable(table, full), tables)
+            return dict(zip(tables, counts))
+
+
+    def loadRecords(self, records, page_size=500):
+
+        """
+        Args:
+            records (iterable): (table name, record) pairs, e.g. from utils/recordFile.iterRecordFile.
+            page_size (int): Rows written per transaction.
+
+        Returns:
+            dict: Table name -> number of rows that were new or changed. Records of tables the
+                  model does not know are skipped.
+
+        Function:
+            This function stores the records as they are, IDs included, so a replica can be
+            filled from an exported file without Airtable. Only page_size records are held at
+            a time.
+        """
+
+        synced_at = _utcnow()
+        counts, pages, skipped = {}, {}, {}
+
+        def write(table_name):
+            counts[table_name] = counts.get(table_name, 0) + self._upsert(table_name, pages.pop(table_name), synced_at)
+
+        for table_name, record in records:
+            if table_name not in self.columns:
+                skipped[table_name] = skipped.get(table_name, 0) + 1
+                continue
+            pages.setdefault(table_name, []).append(record)
+            if len(pages[table_name]) >= page_size:
+                write(table_name)
+        for table_name in list(pages):
+            write(table_name)
+
+        for table_name, count in skipped.items():
+            logger.warning(f"Replica: skipped {count} records of unknown table {table_name}")
+        return counts
+
+
+    def writeRecords(self, table_name, records):
+
+        """
+        Args:
+            table_name (str): Table name.
+            records (list): Records ({'id', 'fields'} and optionally 'createdTime') to store as they are.
+
+        Returns:
+            int: Number of rows that were new or changed.
+        """
+
+        return self._upsert(table_name, records, _utcnow())
+
+
+    def updateRecords(self, table_name, updates):
+
+        """
+        Args:
+            table_name (str): Table name.
+            updates (dict): Record ID -> fields to set on it. Unknown records are ignored.
+
+        Returns:
+            int: Number of rows that changed.
+        """
+
+        ids = list(updates)
+        records = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            condition = f"id IN ({', '.join('?' for _ in chunk)})"
+            for record in self._rows(table_name, (condition,), tuple(chunk)):
+                record["fields"].update(updates[record["id"]])
+                records.append(record)
+        return self.writeRecords(table_name, records)
+
+
+    def findRecord(self, table_name, fields):
+
+        """
+        Args:
+            table_name (str): Table name.
+            fields (dict): Column -> value that the record must match, e.g. merge fields of an upsert.
+
+        Returns:
+            str: ID of the first matching record, or None.
+        """
+
+        conditions = tuple(f"{_quote(field)} IS ?" for field in fields)
+        params = tuple(json.dumps(value) if isinstance(value, (list, dict)) else value for value in fields.values())
+        for record in self._rows(table_name, conditions, params, page_size=1):
+            return record["id"]
+        return None
+
+
+    # Read API, mirroring utils/airTableHelpers
+
+    def _rows(self, table_name, conditions=(), params=(), fields=None, page_size=1000):
+
+        """
+        Args:
+            table_name (str): Table to read.
+            conditions (tuple): SQL conditions joined with AND.
+            params (tuple): Parameters of the conditions.
+            fields (list): Optional projection of the returned fields.
+            page_size (int): Rows read per query.
+
+        Yields:
+            dict: Records shaped like Airtable list results. Rows are paged by rowid so memory
+                  stays flat and the lock is not held while the caller works.
+        """
+
+        last_rowid = 0
+        while True:
+            where = " AND ".join(("rowid > ?",) + tuple(conditions))
+            with self.lock:
+                rows = self.conn.execute(f"SELECT rowid, id, created_time, fields FROM {_quote(table_name)} "
+                                         f"WHERE {where} ORDER BY rowid LIMIT ?", (last_rowid,) + tuple(params) + (page_size,)).fetchall()
+            if not rows:
+                return
+            for rowid, record_id, created_time, encoded in rows:
+                record_fields = json.loads(encoded)
+                if fields is not None:
+                    record_fields = {k: v for k, v in record_fields.items() if k in fields}
+                yield {"id": record_id, "createdTime": created_time, "fields": record_fields}
+            last_rowid = rows[-1][0]
+
+
+    def iterRecords(self, table_name, formula=None, fields=None, sort=None, page_size=100, prefetch=True):
+        if formula:
+            raise ValueError("The replica does not evaluate Airtable formulas; use iterModified or getAllEntries")
+        return self._rows(table_name, fields=fields)
+
+
+    def iterModified(self, table_name, since, fields=None, watched=None):
+        # The replica only tracks when a row changed, not which field, so watched is not applied
+        return self._rows(table_name, ("synced_at > ?",), (since,), fields)
+
+
+    def getAllEntries(self, filled=False, fields=None, sort=None, page_size=100, prefetch=True,
+                      modified_since=None, modified_fields=None):
+        column = _quote("Compressed JSON")
+        conditions = (f"COALESCE({column}, '') != ''",) if filled else (f"COALESCE({column}, '') = ''",)
+        params = ()
+        if modified_since:
+            # Rows only get a new synced_at when their fields changed, which stands in for LAST_MODIFIED_TIME()
+            conditions += ("synced_at > ?",)
+            params = (modified_since,)
+        return {"records": self._rows(os.getenv('applicants_table_name'), conditions, params, fields)}
+
+
+    def getRecordsById(self, record_id, table_name):
+        for record in self._rows(table_name, ("id = ?",), (record_id,)):
+            return record
+        return {"error": "NOT_FOUND"}
+
+
+    def getRecordsByIds(self, record_ids, table_name, fields=None, chunk_size=500):
+        index = {}
+        ids = list(dict.fromkeys(record_ids))
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            condition = f"id IN ({', '.join('?' for _ in chunk)})"
+            for record in self._rows(table_name, (condition,), tuple(chunk), fields):
+                index[record["id"]] = record["fields"]
+        return index
+
+
+    def iterRecordsByIds(self, record_ids, table_name, fields=None, chunk_size=500):
+        for record_id, record_fields in self.getRecordsByIds(record_ids, table_name, fields, chunk_size).items():
+            yield {"id": record_id, "fields": record_fields}
+
+
+    def getTableIndex(self, table_name, fields=None):
+        return {record["id"]: record["fields"] for record in self._rows(table_name, fields=fields)}
+
+
+    def linkedFrom(self, linked_id, table_name=None):
+
+        """
+        Args:
+            linked_id (str): A record ID.
+            table_name (str): Optionally restrict to records of this table.
+
+        Returns:
+            list: (table_name, record_id, field) of every record linking to linked_id.
+        """
+
+        query = "SELECT table_name, record_id, field FROM links WHERE linked_id = ?"
+        params = (linked_id,)
+        if table_name:
+            query += " AND table_name = ?"
+            params += (table_name,)
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class ReplicaBuffer:
+
+    """
+    Stand-in for utils.airTableHelpers.RecordBuffer that writes to a Replica instead of Airtable,
+    so a stage can run offline on an exported file. update(), add() and upsert() queue the change
+    like RecordBuffer does and every batch_size records are written in one transaction. New
+    records get an Airtable-like 'rec' ID; inverse links are not maintained.
+
+    Usage:
+        with ReplicaBuffer(replica, os.getenv('shortlisted_leads_table_name')) as leads:
+            shortlistBatch(batch, engine, existingLeads(replica), leads)
+    """
+
+    def __init__(self, replica, table_name, batch_size=500, merge_on=None):
+        self.replica = replica
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.merge_on = list(merge_on or [])
+        self.lock = threading.Lock()
+        self.pending_updates = {}
+        self.pending_adds = []
+        self.written = 0
+        self.failed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+    def update(self, record_id, fields):
+        with self.lock:
+            self.pending_updates.setdefault(record_id, {}).update(fields)
+            full = len(self.pending_updates) >= self.batch_size
+        if full:
+            self.flush()
+
+
+    def add(self, fields):
+        with self.lock:
+            self.pending_adds.append({"id": "rec" + uuid.uuid4().hex[:14], "createdTime": _utcnow(), "fields": dict(fields)})
+            full = len(self.pending_adds) >= self.batch_size
+        if full:
+            self.flush()
+
+
+    def upsert(self, fields):
+        if not self.merge_on:
+            raise ValueError(f"ReplicaBuffer for {self.table_name} has no merge_on fields to upsert on")
+        # Queued changes have to land first, or an earlier upsert with the same merge values would be missed
+        self.flush()
+        record_id = self.replica.findRecord(self.table_name, {field: fields.get(field) for field in self.merge_on})
+        if record_id:
+            self.update(record_id, fields)
+        else:
+            self.add(fields)
+
+
+    def flush(self):
+        with self.lock:
+            updates, self.pending_updates = self.pending_updates, {}
+            adds, self.pending_adds = self.pending_adds, []
+        if updates:
+            self.replica.updateRecords(self.table_name, updates)
+        if adds:
+            self.replica.writeRecords(self.table_name, adds)
+        self.written += len(updates) + len(adds)
+
+
+    def close(self):
+        self.flush()
+        logger.info(f"{self.table_name} (replica): {self.written} records written")
@@ -0,0 +1,252 @@
+import numpy as np
+import operator
+import re
+
+COMPARISONS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+COMPANY_SUFFIXES = re.compile(r"[,.]?\s+(inc|llc|ltd|corp|corporation|co|plc|gmbh)\.?$")
+
+
+def normalize_key(value):
+
+    """
+    Args:
+        value: A company or location name.
+
+    Returns:
+        str: Case-folded name with collapsed whitespace, '&' spelled out and legal suffixes removed.
+    """
+
+    key = " ".join(str(value or "").replace("&", " and ").split()).casefold()
+    return COMPANY_SUFFIXES.sub("", key)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def default_rules(config):
+
+    """
+    Args:
+        config (dict): Parsed config.yaml.
+
+    Returns:
+        list: The original shortlisting criteria expressed as rule definitions:
+              (experience OR tier-one company) AND rate AND availability AND location.
+    """
+
+    return [
+        {"name": "Experience", "any": [
+            {"feature": "years", "op": ">=", "value": config["min_experience_years"]},
+            {"feature": "tier_one", "op": "==", "value": True},
+        ]},
+        {"name": "Preferred Rate", "feature": "preferred_rate", "op": "<=", "value": config["max_preferred_rate"]},
+        {"name": "Availability", "feature": "availability", "op": ">=", "value": config["min_hours_available"]},
+        {"name": "Location", "feature": "location", "op": "in", "value": config["location"]},
+    ]
+
+
+class RulesEngine:
+
+    """
+    Shortlisting rules compiled once from config.yaml and evaluated on columnar batches.
+
+    The legacy keys (min_experience_years, max_preferred_rate, min_hours_available, location,
+    tier_one_companies) become the default rules. A `rules:` list in config.yaml replaces them;
+    each rule is either a predicate or an `any:`/`all:` group of predicates:
+
+        rules:
+          - name: Experience
+            any:
+              - {feature: years, op: ">=", value: 4}
+              - {feature: tier_one, op: "==", value: true}
+          - {name: Currency, feature: "Salary Preferences.Currency", op: in, value: [USD, CAD]}
+
+    Rule names must be unique; a rule without one is named after its first feature.
+    Built-in features are years, tier_one, preferred_rate, minimum_rate, availability and
+    location. Any other feature is read from the decompressed JSON as 'Table.Field'.
+    Comparison ops (>=, <=, >, <, ==, !=) work on numbers; in/not_in work on normalized strings.
+    """
+
+    def __init__(self, config, table_names):
+        self.config = config
+        self.tables = table_names
+        self.tier_one = frozenset(normalize_key(c) for c in config.get("tier_one_companies", []))
+        self.vocabulary = {}
+        self.rules = [self._compile(rule) for rule in config.get("rules") or default_rules(config)]
+        # Rule masks and explanations are keyed by name, so two rules may not share one
+        names = [rule["name"] for rule in self.rules]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate rule names {duplicates}; give each rule in config.yaml a unique name")
+        self.features = sorted({p["feature"] for rule in self.rules for p in rule["predicates"]})
+
+
+    def _compile(self, rule):
+        if "any" in rule or "all" in rule:
+            mode = "any" if "any" in rule else "all"
+            predicates = [self._predicate(p) for p in rule[mode]]
+        else:
+            mode = "all"
+            predicates = [self._predicate(rule)]
+        return {"name": rule.get("name") or predicates[0]["feature"], "mode": mode, "predicates": predicates}
+
+
+    def _predicate(self, spec):
+        op = spec["op"]
+        feature = spec["feature"]
+        if op in ("in", "not_in"):
+            values = spec["value"] if isinstance(spec["value"], list) else [spec["value"]]
+            # Categorical features share one vocabulary so each column is encoded once
+            vocabulary = self.vocabulary.setdefault(feature, {})
+            codes = [vocabulary.setdefault(normalize_key(v), len(vocabulary)) for v in values]
+            return {"feature": feature, "op": op, "value": values, "codes": np.array(codes), "categorical": True}
+        if op not in COMPARISONS:
+            raise ValueError(f"Unknown operator {op!r} in rule {spec}")
+        return {"feature": feature, "op": op, "value": spec["value"], "categorical": False}
+
+
+    def extract(self, data, years):
+
+        """
+        Args:
+            data (dict): Decompressed JSON of one applicant.
+            years (float): Total years of experience.
+
+        Returns:
+            dict: feature -> raw value for every feature used by the compiled rules, plus
+                  'companies' for the explanation.
+        """
+
+        work = data.get(self.tables["work_experience"]) or []
+        salary = data.get(self.tables["salary_preferences"]) or {}
+        personal = data.get(self.tables["personal_details"]) or {}
+        companies = [we.get("Company") for we in work]
+
+        row = {"companies": companies}
+        for feature in self.features:
+            if feature == "years":
+                row[feature] = years
+            elif feature == "tier_one":
+                row[feature] = any(normalize_key(c) in self.tier_one for c in companies)
+            elif feature == "preferred_rate":
+                row[feature] = salary.get("Preferred Rate")
+            elif feature == "minimum_rate":
+                row[feature] = salary.get("Minimum Rate")
+            elif feature == "availability":
+                row[feature] = salary.get("Availability")
+            elif feature == "location":
+                row[feature] = personal.get("Location")
+            elif feature != "companies":
+                table, _, field = feature.partition(".")
+                section = data.get(table) or {}
+                row[feature] = section.get(field) if isinstance(section, dict) else None
+        return row
+
+
+    def encode(self, feature, values):
+
+        """
+        Args:
+            feature (str): A categorical feature.
+            values (iterable): Raw values.
+
+        Returns:
+            numpy.ndarray: Integer codes in the feature's vocabulary, -1 for values no rule mentions.
+        """
+
+        vocabulary = self.vocabulary[feature]
+        return np.fromiter((vocabulary.get(normalize_key(v), -1) for v in values), dtype=np.int64)
+
+
+    def columns(self, rows):
+
+        """
+        Args:
+            rows (list): Feature rows from extract().
+
+        Returns:
+            dict: feature -> NumPy array. Categorical features are integer codes, tier_one is
+                  boolean and everything else is float (NaN when missing, so it fails comparisons).
+        """
+
+        columns = {}
+        for feature in self.features:
+            values = [row.get(feature) for row in rows]
+            if feature in self.vocabulary:
+                columns[feature] = self.encode(feature, values)
+            elif feature == "tier_one":
+                columns[feature] = np.array(values, dtype=bool)
+            else:
+                columns[feature] = np.array([_number(v) for v in values], dtype=float)
+        return columns
+
+
+    def _mask(self, predicate, column):
+        if predicate["categorical"]:
+            matched = np.isin(column, predicate["codes"])
+            return matched if predicate["op"] == "in" else ~matched
+        value = bool(predicate["value"]) if column.dtype == bool else float(predicate["value"])
+        return COMPARISONS[predicate["op"]](column, value)
+
+
+    def evaluate(self, columns):
+
+        """
+        Args:
+            columns (dict): feature -> NumPy array of equal length, from columns() or built
+                            directly (categorical features as codes from encode()).
+
+        Returns:
+            tuple: (passed, rule_masks). passed is a boolean array, rule_masks maps rule name to
+                   the boolean array of that rule.
+        """
+
+        length = len(next(iter(columns.values()))) if columns else 0
+        passed = np.ones(length, dtype=bool)
+        rule_masks = {}
+        for rule in self.rules:
+            masks = [self._mask(p, columns[p["feature"]]) for p in rule["predicates"]]
+            mask = np.logical_or.reduce(masks) if rule["mode"] == "any" else np.logical_and.reduce(masks)
+            rule_masks[rule["name"]] = mask
+            passed &= mask
+        return passed, rule_masks
+
+
+    @staticmethod
+    def _describe(predicate, row):
+        if predicate["feature"] == "tier_one":
+            return f"companies {row.get('companies')} include a tier one company"
+        return f"{predicate['feature']} {row.get(predicate['feature'])} {predicate['op']} {predicate['value']}"
+
+
+    def explain(self, row, rule_masks, index):
+
+        """
+        Args:
+            row (dict): Feature row of one applicant.
+            rule_masks (dict): Rule masks from evaluate().
+            index (int): Position of the applicant in the batch.
+
+        Returns:
+            list: One 'Rule: check [or|and check] (pass|fail)' line per rule.
+        """
+
+        lines = []
+        for rule in self.rules:
+            joiner = " or " if rule["mode"] == "any" else " and "
+            checks = joiner.join(self._describe(p, row) for p in rule["predicates"])
+            verdict = "pass" if rule_masks[rule["name"]][index] else "fail"
+            lines.append(f"{rule['name']}: {checks} ({verdict})")
+        return lines
@@ -0,0 +1,81 @@
+import threading
+import json
+import os
+
+
+class SchemaCache:
+
+    """
+    Table and field IDs of the base, kept in a local JSON file so that no run has to ask the
+    meta endpoint for them. It is written by setupAirTables.py (and refreshed whenever a request
+    addressed by ID fails); a missing file or one of another base just means nothing is known
+    and the helpers fall back to names.
+
+    Usage:
+        cache = SchemaCache("schema_cache.json", "appXXXXXXXXXXXXXX")
+        cache.update(getTables())
+        cache.fields("Applicants")["Compressed JSON"]  # 'fld...'
+    """
+
+    def __init__(self, path="schema_cache.json", base_id=None):
+        self.path = path
+        self.base_id = base_id
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.load()
+
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                cached = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if cached.get("base_id") == self.base_id:
+            with self.lock:
+                self.tables = cached.get("tables", {})
+
+
+    def update(self, tables):
+
+        """
+        Args:
+            tables (list): Tables from the meta tables endpoint (each with 'id', 'name' and 'fields').
+
+        Returns:
+            None
+
+        Function:
+            This function replaces the cached IDs and writes them to the file (through a
+            temporary file, so a crash never leaves half a cache behind).
+        """
+
+        schema = {table["name"]: {"id": table["id"], "fields": {field["name"]: field["id"] for field in table.get("fields", [])}}
+                  for table in tables}
+        with self.lock:
+            self.tables = schema
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as handle:
+                json.dump({"base_id": self.base_id, "tables": schema}, handle, indent=1)
+            os.replace(temporary, self.path)
+
+
+    def tableId(self, table_name):
+        with self.lock:
+            return (self.tables.get(table_name) or {}).get("id")
+
+
+    def fields(self, table_name):
+
+        """
+        Args:
+            table_name (str): Table name.
+
+        Returns:
+            dict: Field name -> field ID of the table (empty if the table is unknown).
+        """
+
+        with self.lock:
+            return dict((self.tables.get(table_name) or {}).get("fields", {}))
@@ -0,0 +1,122 @@
+from functools import lru_cache, wraps
+import threading
+import os
+
+
+_loaded = False
+_load_lock = threading.Lock()
+_cached = []
+
+
+def loadEnv():
+
+    """
+    Returns:
+        None
+
+    Function:
+        This function loads .env into the environment the first time it is called. Nothing is
+        read at import time anymore; settings(), the clients and the logger call this on first use.
+    """
+
+    global _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
+
+
+def setting(name, default=None):
+
+    """
+    Args:
+        name (str): Environment variable, e.g. 'airtable_base_id'.
+        default: Value if it is not set.
+
+    Returns:
+        str: The variable from the environment or .env.
+    """
+
+    loadEnv()
+    return os.getenv(name, default)
+
+
+def cached(function):
+
+    """
+    Args:
+        function: Zero-argument factory of a client or other expensive object.
+
+    Returns:
+        The factory, building the object on first call and returning the same one afterwards.
+        reset() drops it, so it is built again from the current settings.
+    """
+
+    function = lru_cache(maxsize=None)(function)
+    _cached.append(function)
+
+    @wraps(function)
+    def wrapper(*args):
+        loadEnv()
+        return function(*args)
+    wrapper.cache_clear = function.cache_clear
+    return wrapper
+
+
+def reset():
+
+    """
+    Returns:
+        None
+
+    Function:
+        This function drops every cached client and config, e.g. after the environment was
+        changed (worker.py pointing the rate limiters at the shared budget file, or tests).
+    """
+
+    for function in _cached:
+        function.cache_clear()
+
+
+@cached
+def config(path="config.yaml"):
+
+    """
+    Args:
+        path (str): Shortlisting criteria file.
+
+    Returns:
+        dict: The parsed file; yaml is only imported here.
+    """
+
+    import yaml
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+
+@cached
+def openai_client():
+
+    """
+    Returns:
+        OpenAI: Client shared by the sync LLM calls and batch mode. The openai package (the
+                slowest import of the project) is only imported here.
+    """
+
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("openai_api_key"), base_url=os.getenv("openai_base_url"))
+
+
+def async_openai_client():
+
+    """
+    Returns:
+        AsyncOpenAI: A new async client; one per event loop, so it is not cached.
+    """
+
+    loadEnv()
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("openai_api_key"), base_url=os.getenv("openai_base_url"))
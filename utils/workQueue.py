@@ -0,0 +1,373 @@
+from loggerConfig import setup_logger
+import threading
+import hashlib
+import sqlite3
+import time
+
+
+logger = setup_logger()
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+def shard_of(record_id, shards):
+
+    """
+    Args:
+        record_id (str): Airtable record ID.
+        shards (int): Number of shards of the queue.
+
+    Returns:
+        int: The record's shard; stable across processes and machines (unlike hash()).
+    """
+
+    return int.from_bytes(hashlib.sha1(record_id.encode("utf-8")).digest()[:4], "big") % shards
+
+
+class WorkQueue:
+
+    """
+    Lease queue of applicant record IDs per stage, kept in a SQLite file (no broker). Records are
+    sharded by a hash of their ID. A worker claims a batch, which leases it for lease_seconds;
+    it renews the lease while it works and marks the batch done or failed at the end. If a worker
+    crashes its leases expire and another worker claims the records again.
+
+    A task can carry the stages that follow it (then), e.g. compress -> shortlist -> summaryGeneration;
+    completing it enqueues the record for the next stage in the same transaction.
+
+    The file must be on a filesystem with working locks to be shared between machines; rollback
+    journaling (not WAL) is used so that it also works on network mounts. Lease expiry uses the
+    local clock, so clocks of machines sharing the queue should be in sync.
+
+    Usage:
+        queue = WorkQueue("work_queue.sqlite")
+        queue.enqueue("compress", record_ids, then=["shortlist", "summaryGeneration"])
+        ids = queue.claim("compress", owner="host-1234", limit=100)
+        ...
+        queue.complete("compress", "host-1234", ids)
+    """
+
+    def __init__(self, path="work_queue.sqlite", shards=16):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                stage TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                requeue INTEGER NOT NULL DEFAULT 0,
+                next_stages TEXT NOT NULL DEFAULT '',
+                error TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (stage, record_id)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (stage, status, shard)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # The shard count is fixed when the queue is created; every worker must agree on it
+        with self._transaction():
+            self.conn.execute("INSERT OR IGNORE INTO settings (name, value) VALUES ('shards', ?)", (str(shards),))
+        self.shards = int(self.conn.execute("SELECT value FROM settings WHERE name = 'shards'").fetchone()[0])
+
+
+    def _transaction(self):
+        return _Transaction(self)
+
+
+    def enqueue(self, stage, record_ids, then=None):
+
+        """
+        Args:
+            stage (str): Stage the records should be processed by.
+            record_ids (iterable): Applicants record IDs.
+            then (list): Stages to enqueue each record for, in order, once this one completes.
+
+        Returns:
+            int: Number of records that were queued (again).
+
+        Function:
+            This function adds new tasks as pending and puts done or failed ones back to pending.
+            A record that is leased right now is marked to be requeued when its lease completes,
+            since the worker may already have read its old inputs.
+        """
+
+        with self._transaction():
+            return self._insert(stage, list(record_ids), then or [], time.time())
+
+
+    def _insert(self, stage, record_ids, then, now):
+        before = self.conn.total_changes
+        self.conn.executemany("""
+            INSERT INTO tasks (stage, record_id, shard, status, next_stages, updated) VALUES (?, ?, ?, 'pending', ?, ?)
+            ON CONFLICT (stage, record_id) DO UPDATE SET
+                next_stages = excluded.next_stages,
+                updated = excluded.updated,
+                attempts = CASE WHEN status = 'leased' THEN attempts ELSE 0 END,
+                requeue = CASE WHEN status = 'leased' THEN 1 ELSE 0 END,
+                status = CASE WHEN status = 'leased' THEN status ELSE 'pending' END
+            WHERE status != 'pending'""",
+            [(stage, record_id, shard_of(record_id, self.shards), ",".join(then), now) for record_id in record_ids])
+        return self.conn.total_changes - before
+
+
+    def claim(self, stage, owner, limit=100, lease_seconds=300, shards=None, max_attempts=5):
+
+        """
+        Args:
+            stage (str): Stage to claim work for.
+            owner (str): Unique worker name, e.g. '<host>-<pid>'.
+            limit (int): Maximum number of records to claim.
+            lease_seconds (float): How long the lease lasts unless renewed.
+            shards (list): Only claim records of these shards (all if None).
+            max_attempts (int): Records whose lease expired after this many attempts (e.g. they
+                                crash their worker every time) are parked as failed instead.
+
+        Returns:
+            list: The claimed record IDs; pending records first, then records whose lease expired.
+        """
+
+        now = time.time()
+        shard_filter, params = "", [stage, now]
+        if shards is not None:
+            shard_filter = f" AND shard IN ({','.join('?' * len(shards))})"
+            params += list(shards)
+        with self._transaction():
+            self.conn.execute(f"""
+                UPDATE tasks SET status = '{FAILED}', owner = NULL, lease_until = NULL,
+                    error = 'lease expired ' || attempts || ' times', updated = ?
+                WHERE stage = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?{shard_filter}""",
+                [now] + params[:2] + [max_attempts] + params[2:])
+            rows = self.conn.execute(f"""
+                SELECT rowid, record_id FROM tasks
+                WHERE stage = ? AND (status = 'pending' OR (status = 'leased' AND lease_until < ?)){shard_filter}
+                ORDER BY status = 'leased', updated
+                LIMIT ?""", params + [limit]).fetchall()
+            self.conn.executemany("UPDATE tasks SET status = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1, "
+                                  "requeue = 0, updated = ? WHERE rowid = ?",
+                                  [(owner, now + lease_seconds, now, rowid) for rowid, _ in rows])
+        return [record_id for _, record_id in rows]
+
+
+    def renew(self, stage, owner, record_ids, lease_seconds=300):
+
+        """
+        Args:
+            stage (str): Stage of the lease.
+            owner (str): The worker holding it.
+            record_ids (list): Leased record IDs.
+            lease_seconds (float): New lease duration from now.
+
+        Returns:
+            list: The record IDs that are no longer leased by this owner (their lease was lost).
+        """
+
+        now = time.time()
+        with self._transaction():
+            self.conn.executemany("UPDATE tasks SET lease_until = ? WHERE stage = ? AND record_id = ? AND owner = ? AND status = 'leased'",
+                                  [(now + lease_seconds, stage, record_id, owner) for record_id in record_ids])
+            return self._lost(stage, owner, record_ids)
+
+
+    def _lost(self, stage, owner, record_ids):
+        held = set()
+        for start in range(0, len(record_ids), 500):
+            chunk = record_ids[start:start + 500]
+            held.update(row[0] for row in self.conn.execute(
+                f"SELECT record_id FROM tasks WHERE stage = ? AND owner = ? AND status = 'leased' "
+                f"AND record_id IN ({','.join('?' * len(chunk))})", [stage, owner] + chunk))
+        return [record_id for record_id in record_ids if record_id not in held]
+
+
+    def complete(self, stage, owner, record_ids):
+
+        """
+        Args:
+            stage (str): Stage of the lease.
+            owner (str): The worker holding it.
+            record_ids (list): Record IDs that were processed successfully.
+
+        Returns:
+            int: Number of records completed; leases that were lost to another worker are left alone.
+
+        Function:
+            This function marks the records done and enqueues each of them for its next stage.
+            Records that were enqueued again while leased go back to pending instead.
+        """
+
+        now = time.time()
+        with self._transaction():
+            lost = set(self._lost(stage, owner, record_ids))
+            held = [record_id for record_id in record_ids if record_id not in lost]
+            rows = {}
+            for start in range(0, len(held), 500):
+                chunk = held[start:start + 500]
+                for record_id, next_stages, requeue in self.conn.execute(
+                        f"SELECT record_id, next_stages, requeue FROM tasks WHERE stage = ? "
+                        f"AND record_id IN ({','.join('?' * len(chunk))})", [stage] + chunk):
+                    rows[record_id] = (next_stages, requeue)
+
+            self.conn.executemany("UPDATE tasks SET status = CASE WHEN requeue THEN 'pending' ELSE 'done' END, "
+                                  "attempts = CASE WHEN requeue THEN 0 ELSE attempts END, "
+                                  "owner = NULL, lease_until = NULL, requeue = 0, error = NULL, updated = ? "
+                                  "WHERE stage = ? AND record_id = ?", [(now, stage, record_id) for record_id in rows])
+
+            # Requeued records run this stage again first; they are chained when that run completes
+            chained = {}
+            for record_id, (next_stages, requeue) in rows.items():
+                if next_stages and not requeue:
+                    chained.setdefault(next_stages, []).append(record_id)
+            for next_stages, ids in chained.items():
+                next_stage, *then = next_stages.split(",")
+                self._insert(next_stage, ids, then, now)
+        return len(rows)
+
+
+    def fail(self, stage, owner, record_ids, error, max_attempts=5):
+
+        """
+        Args:
+            stage (str): Stage of the lease.
+            owner (str): The worker holding it.
+            record_ids (list): Record IDs whose processing failed.
+            error (str): Reason, kept for `status` and debugging.
+            max_attempts (int): Records that failed this many times are parked as failed
+                                instead of being retried.
+
+        Returns:
+            None
+        """
+
+        now = time.time()
+        with self._transaction():
+            self.conn.executemany(f"""
+                UPDATE tasks SET status = CASE WHEN attempts >= ? THEN '{FAILED}' ELSE '{PENDING}' END,
+                    owner = NULL, lease_until = NULL, error = ?, updated = ?
+                WHERE stage = ? AND record_id = ? AND owner = ? AND status = 'leased'""",
+                [(max_attempts, str(error)[:1000], now, stage, record_id, owner) for record_id in record_ids])
+
+
+    def release(self, owner):
+
+        """
+        Args:
+            owner (str): A worker that is shutting down.
+
+        Returns:
+            int: Number of leases handed back as pending, without counting them as attempts.
+        """
+
+        with self._transaction():
+            cursor = self.conn.execute("UPDATE tasks SET status = 'pending', owner = NULL, lease_until = NULL, "
+                                       "attempts = MAX(attempts - 1, 0), updated = ? WHERE owner = ? AND status = 'leased'",
+                                       (time.time(), owner))
+            return cursor.rowcount
+
+
+    def retryFailed(self, stage=None):
+
+        """
+        Args:
+            stage (str): Only retry this stage (all stages if None).
+
+        Returns:
+            int: Number of parked failed records put back to pending.
+        """
+
+        with self._transaction():
+            cursor = self.conn.execute("UPDATE tasks SET status = 'pending', attempts = 0, updated = ? "
+                                       "WHERE status = 'failed' AND (? IS NULL OR stage = ?)", (time.time(), stage, stage))
+            return cursor.rowcount
+
+
+    def counts(self):
+
+        """
+        Returns:
+            dict: stage -> {status -> records}; expired leases are reported as 'expired'.
+        """
+
+        now = time.time()
+        counts = {}
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT stage, CASE WHEN status = 'leased' AND lease_until < ? THEN 'expired' ELSE status END, COUNT(*)
+                FROM tasks GROUP BY 1, 2""", (now,)).fetchall()
+        for stage, status, count in rows:
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+
+    """
+    BEGIN IMMEDIATE ... COMMIT around a block, holding the queue's thread lock. IMMEDIATE takes
+    the write lock up front, so two workers can never claim the same rows.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __enter__(self):
+        self.queue.lock.acquire()
+        try:
+            self.queue.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.queue.lock.release()
+            raise
+        return self.queue.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.queue.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.queue.lock.release()
+
+
+class LeaseKeeper:
+
+    """
+    Background thread that renews a batch's lease every lease_seconds / 3 while it is processed.
+
+    Usage:
+        with LeaseKeeper(queue, "compress", owner, ids, lease_seconds=300) as lease:
+            ...
+        lease.lost  # record IDs another worker took over, e.g. after a long pause
+    """
+
+    def __init__(self, queue, stage, owner, record_ids, lease_seconds=300):
+        self.queue = queue
+        self.stage = stage
+        self.owner = owner
+        self.record_ids = list(record_ids)
+        self.lease_seconds = lease_seconds
+        self.lost = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"lease-{stage}", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                lost = self.queue.renew(self.stage, self.owner, self.record_ids, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Renewing the {self.stage} lease of {len(self.record_ids)} records failed: {e}")
+                continue
+            if lost:
+                logger.warning(f"{self.stage}: lost the lease of {len(lost)} records to another worker")
+                self.lost = lost
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stopped.set()
+        self.thread.join()
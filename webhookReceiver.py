@@ -0,0 +1,529 @@
+from utils.airTableHelpers import logRequestStats
+from utils.checkpoints import CheckpointStore
+from utils.llmCache import LLMCache
+from utils.metrics import metrics, runMetrics
+import utils.airTableHelpers as airTableHelpers
+import utils.settings as settings
+from loggerConfig import setup_logger, logContext
+from pipeline import STAGES, applicantFields, stageWorkers
+from worker import processBatch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+import threading
+import argparse
+import hashlib
+import base64
+import hmac
+import json
+import time
+import os
+
+logger = setup_logger()
+
+# Changes made through the REST API are the pipeline's own writes (Compressed JSON, leads, LLM fields)
+OWN_SOURCES = ["publicApi"]
+# Everything else that can change a record: the Airtable UI, forms, automations and syncs
+WATCHED_SOURCES = ["client", "formSubmission", "formPageSubmission", "automation", "system", "sync",
+                   "anonymousUser", "unknown"]
+
+
+def cursor_name(webhook_id):
+    return f"webhook:{webhook_id}"
+
+
+class MicroBatcher:
+
+    """
+    Applicant IDs waiting to be processed. A batch is released as soon as max_batch IDs are
+    pending or the oldest of them has waited `window` seconds, so a burst of changes becomes a
+    few full batches and a single change waits at most `window` seconds.
+
+    Every ID remembers the payload cursor it was read from; cursor() is the cursor to resume
+    from so that no pending or in-flight change is lost if the receiver stops.
+    """
+
+    def __init__(self, window=2.0, max_batch=25):
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = OrderedDict()
+        self.inflight = {}
+        self.read_cursor = None
+        self.condition = threading.Condition()
+
+
+    def add(self, changes, cursor, next_cursor):
+
+        """
+        Args:
+            changes (dict): Applicant record ID -> time of its change (epoch seconds).
+            cursor (int): Cursor the changes were read from.
+            next_cursor (int): Cursor after the payloads that were read.
+
+        Returns:
+            int: Number of applicants that were not pending yet.
+        """
+
+        added = 0
+        with self.condition:
+            for record_id, changed in changes.items():
+                if record_id in self.pending:
+                    continue
+                self.pending[record_id] = {"since": time.monotonic(), "changed": changed, "cursor": cursor, "attempts": 0}
+                added += 1
+            self.read_cursor = next_cursor
+            self.condition.notify_all()
+        return added
+
+
+    def take(self, stop):
+
+        """
+        Args:
+            stop (threading.Event): Returns an empty batch once it is set.
+
+        Returns:
+            dict: Up to max_batch record IDs -> their entries, oldest first. They stay in flight
+                  until done() is called.
+        """
+
+        with self.condition:
+            while not stop.is_set():
+                wait = 1.0
+                if self.pending:
+                    oldest = next(iter(self.pending.values()))["since"]
+                    wait = oldest + self.window - time.monotonic()
+                    if len(self.pending) >= self.max_batch or wait <= 0:
+                        batch = {record_id: self.pending.pop(record_id) for record_id in list(islice(self.pending, self.max_batch))}
+                        self.inflight.update(batch)
+                        return batch
+                self.condition.wait(min(wait, 1.0))
+            return {}
+
+
+    def done(self, batch, ok, max_attempts=5):
+
+        """
+        Args:
+            batch (dict): From take().
+            ok (bool): Whether the batch was processed.
+            max_attempts (int): Attempts before a failed applicant is given up on.
+
+        Returns:
+            list: IDs that were given up on; the next full run (pipeline.py or worker.py) picks them up.
+        """
+
+        dropped = []
+        with self.condition:
+            for record_id, entry in batch.items():
+                self.inflight.pop(record_id, None)
+                if ok or record_id in self.pending:
+                    continue
+                entry["attempts"] += 1
+                if entry["attempts"] >= max_attempts:
+                    dropped.append(record_id)
+                    continue
+                # Retried after another window, which also backs off from a failing dependency
+                entry["since"] = time.monotonic()
+                self.pending[record_id] = entry
+            self.condition.notify_all()
+        return dropped
+
+
+    def cursor(self):
+        with self.condition:
+            cursors = [entry["cursor"] for entry in (*self.pending.values(), *self.inflight.values())]
+            return min(cursors) if cursors else self.read_cursor
+
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+
+class ChangeFeed:
+
+    """
+    Reads the webhook's payloads from the stored cursor and turns them into applicant IDs.
+    Records created or changed in the Applicants table count directly; records of the child
+    tables count for the applicants they link to. Created records carry their link in the
+    payload; for changed ones the links are looked up, in one request per table.
+    Payloads from ignored sources (the pipeline's own API writes) are skipped. Table and field
+    IDs come from the schema cache, which is only refreshed if it does not know the base yet.
+    """
+
+    def __init__(self, webhook_id, store, batcher, ignore_sources=OWN_SOURCES):
+        self.webhook_id = webhook_id
+        self.store = store
+        self.batcher = batcher
+        self.ignore_sources = set(ignore_sources)
+        child_tables = [os.getenv('personal_details_table_name'), os.getenv('salary_preferences_table_name'),
+                        os.getenv('work_experience_table_name')]
+        schema = airTableHelpers.schemaCache()
+        if not schema.tableId(os.getenv('applicants_table_name')):
+            airTableHelpers.refreshSchema()
+        self.applicants_id = schema.tableId(os.getenv('applicants_table_name'))
+        self.children = {schema.tableId(table): (table, schema.fields(table).get('Applicant ID'))
+                         for table in child_tables if schema.tableId(table)}
+        self.lock = threading.Lock()
+
+
+    def saveCursor(self):
+        cursor = self.batcher.cursor()
+        if cursor:
+            self.store.save(cursor_name(self.webhook_id), {}, str(cursor))
+
+
+    @staticmethod
+    def links(value):
+        # Linked records are [{'id': ..., 'name': ...}] in webhook payloads
+        return [item["id"] if isinstance(item, dict) else item for item in value or []]
+
+
+    def changes(self, payloads):
+
+        """
+        Args:
+            payloads (list): Webhook payloads.
+
+        Returns:
+            dict: Applicant record ID -> time of its earliest change in the payloads (epoch seconds).
+        """
+
+        changes, lookups = {}, {}
+        for payload in payloads:
+            source = (payload.get("actionMetadata") or {}).get("source", "unknown")
+            metrics.inc("webhook_payloads_total", source=source)
+            if source in self.ignore_sources:
+                continue
+            changed = datetime.fromisoformat(payload["timestamp"].replace("Z", "+00:00")).timestamp()
+            for table_id, change in (payload.get("changedTablesById") or {}).items():
+                created = change.get("createdRecordsById") or {}
+                updated = change.get("changedRecordsById") or {}
+                if table_id == self.applicants_id:
+                    for record_id in [*created, *updated]:
+                        changes.setdefault(record_id, changed)
+                elif table_id in self.children:
+                    table, link = self.children[table_id]
+                    for record in created.values():
+                        for applicant_id in self.links((record.get("cellValuesByFieldId") or {}).get(link)):
+                            changes.setdefault(applicant_id, changed)
+                    for record_id in updated:
+                        lookups.setdefault(table, {}).setdefault(record_id, changed)
+
+        for table, records in lookups.items():
+            for record_id, fields in airTableHelpers.getRecordsByIds(list(records), table, fields=['Applicant ID']).items():
+                for applicant_id in fields.get('Applicant ID', []):
+                    changes.setdefault(applicant_id, records[record_id])
+        return changes
+
+
+    def read(self):
+
+        """
+        Returns:
+            int: Applicants queued by this read.
+
+        Function:
+            This function pages through the payloads after the last cursor until Airtable has no
+            more and hands the applicants to the batcher. Reads are serialized, so the payloads
+            are consumed in order.
+        """
+
+        with self.lock:
+            cursor = self.batcher.read_cursor or int(self.store.watermark(cursor_name(self.webhook_id)) or 1)
+            queued = 0
+            while True:
+                page = airTableHelpers.listWebhookPayloads(self.webhook_id, cursor)
+                queued += self.batcher.add(self.changes(page.get("payloads", [])), cursor, page.get("cursor", cursor))
+                cursor = page.get("cursor", cursor)
+                if not page.get("mightHaveMore"):
+                    break
+            self.saveCursor()
+            return queued
+
+
+class NotificationServer(ThreadingHTTPServer):
+
+    """
+    Receives Airtable's webhook pings. A ping only says that the base changed, so the handler
+    verifies its X-Airtable-Content-MAC, sets `notified` and answers at once; the changes are
+    read from the payloads endpoint by the feed thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, webhook_id, secret=None):
+        super().__init__(address, NotificationHandler)
+        self.webhook_id = webhook_id
+        self.secret = secret
+        self.notified = threading.Event()
+
+
+class NotificationHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if server.secret:
+            expected = "hmac-sha256=" + hmac.new(server.secret, body, hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(self.headers.get("X-Airtable-Content-MAC", ""), expected):
+                metrics.inc("webhook_notifications_total", outcome="rejected")
+                return self._reply(401)
+        try:
+            webhook_id = (json.loads(body or b"{}").get("webhook") or {}).get("id")
+        except ValueError:
+            webhook_id = None
+        if webhook_id != server.webhook_id:
+            metrics.inc("webhook_notifications_total", outcome="ignored")
+            return self._reply(200)
+        metrics.inc("webhook_notifications_total", outcome="accepted")
+        server.notified.set()
+        self._reply(200)
+
+
+def followChanges(feed, notified, stop, poll = 60.0, interval = 1.0):
+
+    """
+    Args:
+        feed (ChangeFeed): Reads the payloads.
+        notified (threading.Event): Set by the notification server on every ping.
+        stop (threading.Event): Ends the loop.
+        poll (float): Seconds after which the payloads are read even without a ping, in case
+                      one was lost (Airtable does not retry pings).
+        interval (float): Minimum seconds between reads. Pings arriving meanwhile are served by
+                          one read, so a burst of changes does not eat the Airtable budget the
+                          batches need.
+
+    Returns:
+        None
+    """
+
+    while not stop.is_set():
+        notified.wait(poll)
+        notified.clear()
+        if stop.is_set():
+            break
+        try:
+            queued = feed.read()
+            if queued:
+                logger.info(f"Queued {queued} changed applicants")
+        except Exception as e:
+            logger.error(f"Reading webhook payloads failed: {e}")
+            stop.wait(max(interval, 5.0))
+        stop.wait(interval)
+
+
+def processApplicants(ids, stages, workers, runs):
+
+    """
+    Args:
+        ids (list): Applicants record IDs.
+        stages (list): Stages to run, in pipeline order.
+        workers (dict): From pipeline.stageWorkers.
+        runs (dict): Stage name -> StageRun.
+
+    Returns:
+        bool: True if every stage processed and wrote the whole batch.
+
+    Function:
+        This function runs the batch through the stages one after the other, fetching the
+        applicants by ID before each one so a stage sees what the previous stage just wrote.
+        Deleted applicants are simply not found.
+    """
+
+    for stage in stages:
+        with logContext(stage=stage):
+            records = airTableHelpers.getRecordsByIds(ids, os.getenv('applicants_table_name'), applicantFields([stage]))
+            batch = [{"id": record_id, "fields": records[record_id]} for record_id in ids if record_id in records]
+            if not batch:
+                return True
+            if not processBatch(stage, batch, workers, runs):
+                logger.error(f"{stage} failed for a batch of {len(batch)} applicants")
+                return False
+    return True
+
+
+def serve(webhook_id, secret = None, host = "0.0.0.0", port = 8080, stages = None, window = 2.0, max_batch = 25,
+          poll = 60.0, max_attempts = 5, concurrency = 1, timeout = 60, no_cache = False, refresh_hours = 24.0):
+
+    """
+    Args:
+        webhook_id (str): Webhook registered with `register`.
+        secret (bytes): The webhook's MAC secret; pings are not verified without it.
+        host (str): Interface the notification server listens on.
+        port (int): Its port.
+        stages (list): Stages each batch goes through.
+        window (float): Seconds a change waits for others to join its batch.
+        max_batch (int): Applicants per batch.
+        poll (float): Seconds between payload reads when no ping arrives.
+        max_attempts (int): Attempts before a failing applicant is left to the next full run.
+        concurrency (int): LLM requests in flight for summaryGeneration.
+        timeout (float): Seconds allowed per LLM attempt in async mode.
+        no_cache (bool): Disable the on-disk LLM cache.
+        refresh_hours (float): Hours between webhook refreshes (webhooks expire after 7 days).
+
+    Returns:
+        dict: Applicants 'processed' and 'dropped'.
+
+    Function:
+        This function listens for pings, reads the changed applicants from the payloads and
+        runs them through the stages in micro-batches, so an applicant is scored seconds after
+        they apply and the work done is proportional to what changed. The cursor of the oldest
+        change not yet processed is kept in the checkpoint store, so after a restart the
+        receiver picks up where it left off.
+    """
+
+    stages = [stage for stage in STAGES if stage in (stages or ["compress", "shortlist", "summaryGeneration"])]
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
+    cache = None
+    if "summaryGeneration" in stages and not no_cache:
+        cache = LLMCache(os.getenv("llm_cache_path", "llm_cache.sqlite"),
+                         max_entries=int(os.getenv("llm_cache_max_entries", 100000)),
+                         max_age_days=float(os.getenv("llm_cache_max_age_days", 30)))
+    # Batches are not whole scans, so only input hashes are saved and no watermark moves
+    runs = {stage: store.begin(stage, watermark=False) for stage in stages}
+    workers = stageWorkers(stages, runs, None, concurrency, timeout, cache)
+
+    batcher = MicroBatcher(window, max_batch)
+    feed = ChangeFeed(webhook_id, store, batcher)
+    server = NotificationServer((host, port), webhook_id, secret)
+    stop = threading.Event()
+    threads = [threading.Thread(target=server.serve_forever, name="notifications", daemon=True),
+               threading.Thread(target=followChanges, args=(feed, server.notified, stop, poll, min(window / 2, 1.0)),
+                                name="changes", daemon=True)]
+    for thread in threads:
+        thread.start()
+    if not secret:
+        logger.warning("airtable_webhook_secret is not set: pings are not verified")
+    logger.info(f"Listening for webhook {webhook_id} on {host}:{server.server_address[1]} for {' -> '.join(stages)}")
+
+    # Read whatever changed while the receiver was down
+    server.notified.set()
+    totals = {"processed": 0, "dropped": 0}
+    refreshed = time.monotonic()
+    try:
+        while True:
+            if refresh_hours and time.monotonic() - refreshed >= refresh_hours * 3600:
+                try:
+                    logger.info(f"Webhook refreshed until {airTableHelpers.refreshWebhook(webhook_id).get('expirationTime')}")
+                    refreshed = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Refreshing the webhook failed: {e}")
+
+            batch = batcher.take(stop)
+            if not batch:
+                continue
+            metrics.observe("webhook_batch_size", len(batch))
+            try:
+                ok = processApplicants(list(batch), stages, workers, runs)
+            except Exception as e:
+                ok = False
+                logger.error(f"Batch of {len(batch)} applicants failed: {e}")
+
+            dropped = batcher.done(batch, ok, max_attempts)
+            feed.saveCursor()
+            if ok:
+                finished = time.time()
+                for entry in batch.values():
+                    metrics.observe("webhook_latency_seconds", finished - entry["changed"])
+                metrics.inc("webhook_applicants_total", len(batch), outcome="processed")
+                totals["processed"] += len(batch)
+                slowest = finished - min(entry["changed"] for entry in batch.values())
+                logger.info(f"Processed {len(batch)} applicants, {slowest:.1f}s after the oldest change "
+                            f"({totals['processed']} so far)")
+            else:
+                metrics.inc("webhook_applicants_total", len(batch) - len(dropped), outcome="retried")
+            if dropped:
+                metrics.inc("webhook_applicants_total", len(dropped), outcome="dropped")
+                totals["dropped"] += len(dropped)
+                logger.error(f"Gave up on {len(dropped)} applicants after {max_attempts} attempts: {', '.join(dropped)}")
+    except KeyboardInterrupt:
+        logger.info("Stopping the webhook receiver")
+    finally:
+        stop.set()
+        batcher.wake()
+        server.shutdown()
+        server.server_close()
+        feed.saveCursor()
+        for stage in stages:
+            if stage != "summaryGeneration":
+                for buffer in workers[stage][1]:
+                    buffer.close()
+        store.close()
+        if cache:
+            cache.close()
+        logger.info(f"Webhook receiver finished: {totals}")
+        logRequestStats()
+    return totals
+
+
+def webhook_secret():
+    secret = os.getenv("airtable_webhook_secret")
+    return base64.b64decode(secret) if secret else None
+
+
+if __name__ == "__main__":
+
+    settings.loadEnv()
+    parser = argparse.ArgumentParser(description="Process applicants as they change, from Airtable webhook notifications.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    register = commands.add_parser("register", help="Create the webhook and print its ID and secret for .env")
+    register.add_argument("--url", required=True, help="Public URL of the receiver, e.g. https://hooks.example.com/airtable")
+    register.add_argument("--sources", nargs="+", default=WATCHED_SOURCES,
+                          help="Change sources to be notified of (the pipeline's own API writes are left out)")
+
+    listen = commands.add_parser("serve", help="Receive notifications and process the changed applicants")
+    listen.add_argument("--host", default=os.getenv("webhook_host", "0.0.0.0"))
+    listen.add_argument("--port", type=int, default=int(os.getenv("webhook_port", 8080)))
+    listen.add_argument("--stages", nargs="+", choices=STAGES, default=["compress", "shortlist", "summaryGeneration"],
+                        help="Stages every batch goes through (always in pipeline order)")
+    listen.add_argument("--window", type=float, default=float(os.getenv("webhook_window", 2.0)),
+                        help="Seconds a change waits for others to join its batch")
+    listen.add_argument("--max-batch", type=int, default=int(os.getenv("webhook_max_batch", 25)),
+                        help="Applicants per batch; a full batch is processed at once")
+    listen.add_argument("--poll", type=float, default=60.0, help="Seconds between payload reads without a ping")
+    listen.add_argument("--max-attempts", type=int, default=5, help="Attempts before an applicant is left to the next full run")
+    listen.add_argument("--concurrency", type=int, default=int(os.getenv("llm_concurrency", 1)),
+                        help="LLM requests in flight; above 1 uses the asyncio evaluator")
+    listen.add_argument("--timeout", type=float, default=float(os.getenv("llm_timeout", 60)),
+                        help="Seconds allowed per LLM attempt in async mode")
+    listen.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM cache")
+    listen.add_argument("--refresh-hours", type=float, default=24.0, help="Hours between webhook refreshes (0 = never)")
+    listen.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                        help="Profile the receiver with cProfile and/or tracemalloc")
+
+    commands.add_parser("refresh", help="Extend the webhook by 7 days")
+    commands.add_parser("delete", help="Delete the webhook")
+    args = parser.parse_args()
+
+    webhook_id = os.getenv("airtable_webhook_id")
+    if args.command != "register" and not webhook_id:
+        parser.error("airtable_webhook_id is not set; run `register` first")
+
+    if args.command == "register":
+        webhook = airTableHelpers.createWebhook(args.url, [source for source in args.sources if source not in OWN_SOURCES])
+        logger.info(f"Created webhook {webhook['id']}, expires {webhook.get('expirationTime')}")
+        print(f"airtable_webhook_id={webhook['id']}\nairtable_webhook_secret={webhook['macSecretBase64']}")
+
+    elif args.command == "serve":
+        with runMetrics("webhookReceiver", args.profile):
+            serve(webhook_id, webhook_secret(), args.host, args.port, args.stages, args.window, args.max_batch,
+                  args.poll, args.max_attempts, args.concurrency, args.timeout, args.no_cache, args.refresh_hours)
+
+    elif args.command == "refresh":
+        logger.info(f"Webhook {webhook_id} refreshed until {airTableHelpers.refreshWebhook(webhook_id).get('expirationTime')}")
+
+    elif args.command == "delete":
+        airTableHelpers.deleteWebhook(webhook_id)
+        logger.info(f"Deleted webhook {webhook_id}")
@@ -0,0 +1,317 @@
+from utils.airTableHelpers import logRequestStats
+from utils.checkpoints import CheckpointStore
+from utils.llmCache import LLMCache
+from utils.replica import Replica
+from utils.workQueue import WorkQueue, LeaseKeeper
+from utils.metrics import runMetrics
+import utils.airTableHelpers as airTableHelpers
+import utils.settings as settings
+from loggerConfig import setup_logger, logContext
+from pipeline import STAGES, applicantFields, listApplicants, stageWorkers
+import multiprocessing
+import argparse
+import socket
+import time
+import os
+
+logger = setup_logger()
+
+
+def queue_path():
+    return os.getenv("work_queue_path", "work_queue.sqlite")
+
+
+def shareBudgets(path):
+
+    """
+    Args:
+        path (str): SQLite file of the shared rate budgets.
+
+    Returns:
+        None
+
+    Function:
+        This function points rate_budget_path at the file and drops the cached clients, so the
+        Airtable (and, if llm_rate_limit is set, OpenAI) rate limiters built next keep their
+        buckets in it and all workers using it share one budget.
+    """
+
+    os.environ["rate_budget_path"] = path
+    settings.reset()
+
+
+def enqueueChanged(queue, store, stages, source = None, full = False, chunk_size = 500):
+
+    """
+    Args:
+        queue (WorkQueue): The work queue.
+        store (CheckpointStore): Holds the 'queue' watermark of the last enqueue.
+        stages (list): Stages the records should go through, in pipeline order.
+        source: Where applicants are read from (utils.airTableHelpers or a Replica).
+        full (bool): Ignore the watermark and enqueue every applicant.
+        chunk_size (int): Records enqueued per transaction.
+
+    Returns:
+        int: Number of records queued for the first stage.
+
+    Function:
+        This function lists the applicants changed since the last enqueue and queues them for the
+        first stage; completing a stage queues the record for the next one. Workers skip records
+        whose inputs did not change, so listing a few too many is cheap.
+    """
+
+    run = store.begin("queue", full=full)
+    queued, chunk = 0, []
+    for app in listApplicants({stage: run for stage in stages}, source):
+        chunk.append(app['id'])
+        if len(chunk) >= chunk_size:
+            queued += queue.enqueue(stages[0], chunk, then=stages[1:])
+            chunk = []
+    if chunk:
+        queued += queue.enqueue(stages[0], chunk, then=stages[1:])
+    run.commit()
+    logger.info(f"Queued {queued} applicants for {' -> '.join(stages)}")
+    return queued
+
+
+def processBatch(stage, batch, workers, runs):
+
+    """
+    Args:
+        stage (str): Stage name.
+        batch (list): Applicants records.
+        workers (dict): From pipeline.stageWorkers.
+        runs (dict): Stage name -> StageRun (or None).
+
+    Returns:
+        bool: True if every record of the batch was processed and written.
+    """
+
+    if stage == "summaryGeneration":
+        return workers[stage](batch)["failed"] == 0
+
+    work, buffers = workers[stage]
+    failed = sum(buffer.failed for buffer in buffers)
+    work(batch)
+    for buffer in buffers:
+        buffer.flush()
+    ok = sum(buffer.failed for buffer in buffers) == failed
+    if runs[stage] and ok:
+        runs[stage].checkpoint()
+    elif runs[stage]:
+        runs[stage].rollback("writes failed")
+    return ok
+
+
+def runWorker(stages, batch_size = 50, lease_seconds = 300, shards = None, exit_when_idle = False, poll = 5.0,
+              max_attempts = 5, concurrency = 1, timeout = 60, refresh = False, no_cache = False, budget_path = None):
+
+    """
+    Args:
+        stages (list): Stages this worker processes.
+        batch_size (int): Records claimed at a time.
+        lease_seconds (float): Lease duration; renewed every third of it while a batch is processed.
+        shards (list): Only claim these shards (all if None).
+        exit_when_idle (bool): Stop once none of the stages has pending or leased records, instead of polling.
+        poll (float): Seconds to sleep when there is no work.
+        max_attempts (int): Attempts before a record is parked as failed.
+        concurrency (int): LLM requests in flight for summaryGeneration.
+        timeout (float): Seconds allowed per LLM attempt in async mode.
+        refresh (bool): Ignore cached LLM evaluations.
+        no_cache (bool): Disable the on-disk LLM cache.
+        budget_path (str): SQLite file of the shared rate budgets, or None to keep per-process limits.
+
+    Returns:
+        dict: Stage -> records completed.
+
+    Function:
+        This function claims batches of record IDs from the queue, downstream stages first so
+        work in progress finishes before new work starts, fetches the applicants by ID and runs
+        the stage on them. Successful batches are completed (and queued for their next stage),
+        failed ones go back to pending until max_attempts. On exit its leases are released.
+    """
+
+    if budget_path:
+        shareBudgets(budget_path)
+    owner = f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_path(), int(os.getenv("work_queue_shards", 16)))
+    store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
+    cache = None
+    if "summaryGeneration" in stages and not no_cache:
+        cache = LLMCache(os.getenv("llm_cache_path", "llm_cache.sqlite"),
+                         max_entries=int(os.getenv("llm_cache_max_entries", 100000)),
+                         max_age_days=float(os.getenv("llm_cache_max_age_days", 30)))
+    # Records are always read from Airtable: a stage must see what the previous stage just wrote
+    source = None
+
+    stages = [stage for stage in STAGES if stage in stages]
+    # Batches are not whole scans, so workers only save input hashes and never move a watermark
+    runs = {stage: None if (stage == "summaryGeneration" and refresh) else store.begin(stage, watermark=False)
+            for stage in stages}
+    workers = stageWorkers(stages, runs, source, concurrency, timeout, cache, refresh)
+    completed = {stage: 0 for stage in stages}
+    logger.info(f"Worker {owner} started for {', '.join(stages)}")
+
+    try:
+        while True:
+            stage, ids = None, []
+            for candidate in reversed(stages):
+                ids = queue.claim(candidate, owner, batch_size, lease_seconds, shards, max_attempts)
+                if ids:
+                    stage = candidate
+                    break
+            if not ids:
+                # Records other workers still hold may be queued for one of our stages when they complete
+                counts = queue.counts()
+                if exit_when_idle and not any(counts.get(candidate, {}).get(status) for candidate in stages
+                                              for status in ("pending", "leased", "expired")):
+                    break
+                time.sleep(poll)
+                continue
+
+            with LeaseKeeper(queue, stage, owner, ids, lease_seconds) as lease, logContext(stage=stage, worker=owner):
+                try:
+                    records = airTableHelpers.getRecordsByIds(ids, os.getenv('applicants_table_name'), applicantFields([stage]))
+                    batch = [{"id": record_id, "fields": records[record_id]} for record_id in ids if record_id in records]
+                    ok, error = processBatch(stage, batch, workers, runs), "writes or evaluations failed"
+                except Exception as e:
+                    ok, error = False, str(e)
+                    logger.error(f"{stage} batch of {len(ids)} records failed: {e}")
+
+            if ok:
+                # Deleted applicants are missing from records and are completed too
+                completed[stage] += queue.complete(stage, owner, ids)
+            else:
+                queue.fail(stage, owner, ids, error, max_attempts)
+            if lease.lost:
+                logger.warning(f"{stage}: {len(lease.lost)} records were taken over by another worker while processing")
+            logger.info(f"{stage}: {'completed' if ok else 'failed'} {len(ids)} records ({completed[stage]} so far)")
+    finally:
+        released = queue.release(owner)
+        if released:
+            logger.info(f"Released {released} leases")
+        for stage in stages:
+            if stage != "summaryGeneration":
+                for buffer in workers[stage][1]:
+                    buffer.close()
+        queue.close()
+        store.close()
+        if cache:
+            cache.close()
+        logger.info(f"Worker {owner} finished: {completed}")
+        logRequestStats()
+    return completed
+
+
+def workerProcess(profile = None, **options):
+
+    """
+    Args:
+        profile (str): Optional profiler for this process ('cprofile', 'tracemalloc' or 'all').
+        **options: Passed to runWorker.
+
+    Returns:
+        dict: From runWorker.
+
+    Function:
+        This function runs one worker with its own metrics report (worker-<host>-<pid>),
+        since every worker process has its own counters.
+    """
+
+    settings.loadEnv()
+    with runMetrics(f"worker-{socket.gethostname()}-{os.getpid()}", profile):
+        return runWorker(**options)
+
+
+def logStatus(queue):
+    counts = queue.counts()
+    if not counts:
+        logger.info("The work queue is empty")
+    for stage in sorted(counts, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES)):
+        logger.info(f"{stage}: " + ", ".join(f"{count} {status}" for status, count in sorted(counts[stage].items())))
+
+
+if __name__ == "__main__":
+
+    settings.loadEnv()
+    parser = argparse.ArgumentParser(description="Distribute applicant processing over worker processes through a shared lease queue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue the applicants changed since the last enqueue")
+    enqueue.add_argument("--stages", nargs="+", choices=STAGES, default=["compress", "shortlist", "summaryGeneration"],
+                         help="Stages the applicants go through (always in pipeline order)")
+    enqueue.add_argument("--full", action="store_true", help="Ignore the watermark and queue every applicant")
+    enqueue.add_argument("--replica", action="store_true", help="Delta-sync the local SQLite replica and list from it")
+
+    work = commands.add_parser("run", help="Run workers that claim and process queued applicants")
+    work.add_argument("--stages", nargs="+", choices=STAGES, default=["compress", "shortlist", "summaryGeneration"],
+                      help="Stages this worker claims work for")
+    work.add_argument("--processes", type=int, default=1, help="Worker processes on this machine")
+    work.add_argument("--batch-size", type=int, default=50, help="Records claimed at a time")
+    work.add_argument("--lease", type=float, default=300, help="Lease duration in seconds")
+    work.add_argument("--shards", type=int, nargs="+", help="Only claim these shards (default: all)")
+    work.add_argument("--exit-when-idle", action="store_true", help="Stop when there is no work instead of polling")
+    work.add_argument("--poll", type=float, default=5.0, help="Seconds between polls when idle")
+    work.add_argument("--max-attempts", type=int, default=5, help="Attempts before a record is parked as failed")
+    work.add_argument("--concurrency", type=int, default=int(os.getenv("llm_concurrency", 1)),
+                      help="LLM requests in flight per worker; above 1 uses the asyncio evaluator")
+    work.add_argument("--timeout", type=float, default=float(os.getenv("llm_timeout", 60)),
+                      help="Seconds allowed per LLM attempt in async mode")
+    work.add_argument("--refresh", action="store_true", help="Ignore cached LLM evaluations")
+    work.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM cache")
+    work.add_argument("--profile", choices=["cprofile", "tracemalloc", "all"], default=os.getenv("metrics_profile") or None,
+                      help="Profile every worker process with cProfile and/or tracemalloc")
+
+    commands.add_parser("status", help="Show queued, leased, done and failed records per stage")
+    retry = commands.add_parser("retry-failed", help="Put records parked as failed back to pending")
+    retry.add_argument("--stage", choices=STAGES, help="Only this stage")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        queue = WorkQueue(queue_path(), int(os.getenv("work_queue_shards", 16)))
+        store = CheckpointStore(os.getenv("checkpoint_path", "checkpoints.sqlite"))
+        try:
+            source = None
+            if args.replica:
+                source = Replica(os.getenv("replica_path", "replica.sqlite"))
+                source.sync()
+            enqueueChanged(queue, store, [stage for stage in STAGES if stage in args.stages], source, args.full)
+            logStatus(queue)
+        except Exception as e:
+            logger.error(f"Error while queueing applicants: {e}")
+        finally:
+            store.close()
+            queue.close()
+            logRequestStats()
+
+    elif args.command == "run":
+        # Every worker must share one Airtable budget, wherever it runs; by default it lives next to the queue
+        budget_path = os.getenv("rate_budget_path") or os.path.join(os.path.dirname(os.path.abspath(queue_path())),
+                                                                     "rate_budget.sqlite")
+        options = dict(stages=args.stages, batch_size=args.batch_size, lease_seconds=args.lease, shards=args.shards,
+                       exit_when_idle=args.exit_when_idle, poll=args.poll, max_attempts=args.max_attempts,
+                       concurrency=args.concurrency, timeout=args.timeout, refresh=args.refresh,
+                       no_cache=args.no_cache, budget_path=budget_path, profile=args.profile)
+        if args.processes == 1:
+            workerProcess(**options)
+        else:
+            context = multiprocessing.get_context("spawn")
+            processes = [context.Process(target=workerProcess, kwargs=options, name=f"worker-{n}") for n in range(args.processes)]
+            for process in processes:
+                process.start()
+            try:
+                for process in processes:
+                    process.join()
+            except KeyboardInterrupt:
+                for process in processes:
+                    process.join()
+
+    elif args.command == "status":
+        queue = WorkQueue(queue_path(), int(os.getenv("work_queue_shards", 16)))
+        logStatus(queue)
+        queue.close()
+
+    elif args.command == "retry-failed":
+        queue = WorkQueue(queue_path(), int(os.getenv("work_queue_shards", 16)))
+        logger.info(f"Put {queue.retryFailed(args.stage)} failed records back to pending")
+        queue.close()